@@ -1,4 +1,12 @@
 # -*- coding: utf-8 -*-
 """ Contains all the necessary classes to create a radar and do scan. """
 
-from .models import Radar
+__all__ = ['Radar']
+
+
+def __getattr__(name):
+    # the models are imported on first use, so the command line help does not import numpy
+    if name == 'Radar':
+        from .models import Radar
+        return Radar
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
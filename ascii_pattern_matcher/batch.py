@@ -0,0 +1,155 @@
+import glob
+import os
+import time
+from typing import Dict, List, Tuple
+
+from ascii_pattern_matcher.models import Radar
+from ascii_pattern_matcher.parallel import create_worker_pool, get_worker_radar
+from ascii_pattern_matcher.utils import DetectionHandler, FileHandler
+
+
+def _scan_file(radar: Radar, file_path: str, output_file_path: str, output_format: str = None) -> Dict:
+    """
+    Scans the radar sample of the file with the known invaders of the radar and writes its cleaned map, or its
+    detections in the output format if one is given.
+    A file that cannot be scanned gets its error in its entry instead of stopping the batch.
+    """
+    start_time = time.perf_counter()
+    file = {'file_path': file_path, 'output_file_path': output_file_path, 'cell_num': 0, 'detection_num': 0}
+    try:
+        file_radar = radar.create_sub_radar()
+        file_radar.init_radar_map_from_file(file_path)
+        file_radar.scan()
+        if output_format is None:
+            file_radar.dump_to_file(file_path, output_file_path)
+        else:
+            file_radar.dump_detections_to_file(file_path, output_format, output_file_path)
+    except Exception as exception:
+        file['error'] = str(exception) or type(exception).__name__
+    else:
+        row_num, col_num = file_radar.radar_map.get_dimensions()
+        file.update(cell_num=int(row_num * col_num), detection_num=len(file_radar.scan_results))
+    file['seconds'] = time.perf_counter() - start_time
+    return file
+
+
+def _scan_worker_file(task: Tuple) -> Dict:
+    return _scan_file(get_worker_radar(), *task)
+
+
+class BatchScanner:
+    """
+    Scans the radar samples of many files against the known invaders of a single radar, one file per task in a
+    process pool. Known invaders of the scanned files are ignored.
+    Each cleaned map or detections file is written to its own output file, see get_output_file_paths, so files of
+    a directory never overwrite the outputs of each other.
+    """
+    OUTPUT_SUFFIX = '.cleaned_map'
+    DETECTION_OUTPUT_SUFFIX = '.detections'
+    # names of the outputs of single file scans, see OutputFileHandler and DetectionOutputFileHandler
+    OUTPUT_NAMES = ('cleaned_map', 'detections')
+
+    radar = None
+    worker_num = None
+    output_directory = None
+    output_format = None
+
+    def __init__(self, radar: Radar, worker_num: int = 1, output_directory: str = None, output_format: str = None):
+        """
+        :param radar: settings and known invaders of the scans, its radar map is not used
+        :param output_directory: directory of the output files, the directory of each input file by default
+        :param output_format: detections are written in this format of DetectionHandler instead of cleaned maps
+        """
+        if not isinstance(worker_num, int) or worker_num < 1:
+            raise Exception
+        if output_format is not None and output_format not in DetectionHandler.FORMATS:
+            raise Exception
+        self.radar = radar
+        self.worker_num = worker_num
+        self.output_directory = output_directory
+        self.output_format = output_format
+
+    @classmethod
+    def is_output_file_path(cls, file_path: str) -> bool:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        return (name in cls.OUTPUT_NAMES or name.endswith(cls.OUTPUT_SUFFIX)
+                or name.endswith(cls.DETECTION_OUTPUT_SUFFIX))
+
+    @classmethod
+    def expand_file_paths(cls, paths: List[str]) -> List[str]:
+        """
+        Expands directories to their files and glob patterns to the files they match, other paths are kept.
+        Output files of earlier batches found in directories or by patterns are left out, the first occurrence of
+        each file is kept.
+        """
+        file_paths = []
+        for path in paths:
+            if os.path.isdir(path):
+                found_file_paths = FileHandler.get_directory_file_paths(path)
+            elif glob.has_magic(path):
+                found_file_paths = [file_path for file_path in sorted(glob.glob(path)) if os.path.isfile(file_path)]
+            else:
+                file_paths.append(path)
+                continue
+            file_paths.extend(file_path for file_path in found_file_paths if not cls.is_output_file_path(file_path))
+
+        unique_file_paths, real_paths = [], set()
+        for file_path in file_paths:
+            real_path = os.path.realpath(file_path)
+            if real_path not in real_paths:
+                real_paths.add(real_path)
+                unique_file_paths.append(file_path)
+        return unique_file_paths
+
+    def get_output_file_paths(self, file_paths: List[str]) -> List[str]:
+        """
+        Returns <name>.cleaned_map.<extension> for each input file <name>.<extension>, or <name>.detections.<format>
+        with an output format.
+        Inputs of the same name from different directories written to the output directory are told apart by
+        a number, such as <name>.<number>.cleaned_map.<extension>.
+        """
+        output_file_paths, real_paths = [], set()
+        for file_path in file_paths:
+            directory = self.output_directory if self.output_directory is not None else os.path.dirname(file_path)
+            name, extension = os.path.splitext(os.path.basename(file_path))
+            suffix = self.OUTPUT_SUFFIX
+            if self.output_format is not None:
+                suffix, extension = self.DETECTION_OUTPUT_SUFFIX, f'.{self.output_format}'
+            output_file_path = os.path.join(directory, f'{name}{suffix}{extension}')
+            number = 1
+            while os.path.realpath(output_file_path) in real_paths:
+                output_file_path = os.path.join(directory, f'{name}.{number}{suffix}{extension}')
+                number += 1
+            real_paths.add(os.path.realpath(output_file_path))
+            output_file_paths.append(output_file_path)
+        return output_file_paths
+
+    def scan(self, file_paths: List[str]) -> Dict:
+        """
+        Returns a summary of the throughput with an entry for each file in the order of the files, entries of
+        files that failed have an error
+        """
+        start_time = time.perf_counter()
+        if self.output_directory is not None:
+            os.makedirs(self.output_directory, exist_ok=True)
+        tasks = [(file_path, output_file_path, self.output_format)
+                 for file_path, output_file_path in zip(file_paths, self.get_output_file_paths(file_paths))]
+        if self.worker_num == 1 or len(tasks) <= 1:
+            files = [_scan_file(self.radar, *task) for task in tasks]
+        else:
+            with create_worker_pool(self.radar, min(self.worker_num, len(tasks))) as executor:
+                files = list(executor.map(_scan_worker_file, tasks))
+        seconds = time.perf_counter() - start_time
+
+        cell_num = sum(file['cell_num'] for file in files)
+        return {
+            'file_num': len(files),
+            'cell_num': cell_num,
+            'detection_num': sum(file['detection_num'] for file in files),
+            'error_num': sum('error' in file for file in files),
+            'worker_num': self.worker_num,
+            'seconds': seconds,
+            'files_per_second': len(files) / seconds if seconds else None,
+            'cells_per_second': cell_num / seconds if seconds else None,
+            'files': files,
+        }
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from ascii_pattern_matcher.models import Radar
+from ascii_pattern_matcher.utils import FileHandler, SampleHandler
+
+
+class RadarGenerator:
+    """
+    Generates random invaders and noisy radar maps with copies of the invaders planted at known points
+    """
+    INVADER_MIN_SIZE = 6
+    INVADER_MAX_SIZE = 12
+    INVADER_DENSITY = 0.6
+
+    random_state = None
+
+    def __init__(self, seed: int = None):
+        self.random_state = np.random.RandomState(seed)
+
+    def generate_invaders(self, invader_num: int) -> List[np.ndarray]:
+        invaders = []
+        for _ in range(invader_num):
+            dimensions = self.random_state.randint(self.INVADER_MIN_SIZE, self.INVADER_MAX_SIZE + 1, size=2)
+            invader = (self.random_state.rand(*dimensions) < self.INVADER_DENSITY).astype(np.uint8)
+            # an invader without positive signals cannot be detected
+            invader[0, 0] = 1
+            invaders.append(invader)
+        return invaders
+
+    def generate_map(self, row_num: int, col_num: int, noise_density: float) -> np.ndarray:
+        """
+        Returns a map of positive signals with the noise density as probability
+        """
+        return (self.random_state.rand(row_num, col_num) < noise_density).astype(np.uint8)
+
+    def plant_invaders(self, radar_map: np.ndarray, invaders: List[np.ndarray], plant_num: int,
+                       corruption: float) -> List[Tuple]:
+        """
+        Copies randomly chosen invaders onto cells of a grid as large as the largest invader, so they never overlap.
+        A copy has the corruption fraction of its signals flipped.
+
+        :return: (row_index, column_index, invader_index) of the planted invaders, sorted
+        """
+        cell_row_num, cell_col_num = (max(lengths) for lengths in zip(*(invader.shape for invader in invaders)))
+        grid_row_num, grid_col_num = radar_map.shape[0] // cell_row_num, radar_map.shape[1] // cell_col_num
+        plant_num = min(plant_num, grid_row_num * grid_col_num)
+        cell_indices = self.random_state.choice(grid_row_num * grid_col_num, plant_num, replace=False)
+        planted_invaders = []
+        for cell_index in cell_indices:
+            invader_index = self.random_state.randint(len(invaders))
+            invader = invaders[invader_index].copy()
+            flipped_indices = self.random_state.choice(invader.size, int(round(corruption * invader.size)),
+                                                       replace=False)
+            invader.ravel()[flipped_indices] ^= 1
+            row_idx, col_idx = (cell_index // grid_col_num) * cell_row_num, (cell_index % grid_col_num) * cell_col_num
+            radar_map[row_idx:row_idx + invader.shape[0], col_idx:col_idx + invader.shape[1]] = invader
+            planted_invaders.append((int(row_idx), int(col_idx), int(invader_index)))
+        return sorted(planted_invaders)
+
+
+class Benchmark:
+    """
+    Times parsing, scanning and rendering of generated radar files separately, and measures the recall of the
+    planted invaders, for every combination of map dimensions, invader number and accuracy
+    """
+    REPEAT_NUM = 3
+    # one invader is planted per this many cells of the map
+    PLANT_CELL_NUM = 4096
+
+    generator = None
+    engine = None
+    noise_density = None
+    corruption = None
+    repeat_num = None
+
+    def __init__(self, generator: RadarGenerator, engine: str = Radar.ENGINE_AUTO, noise_density: float = 0.3,
+                 corruption: float = 0.05, repeat_num: int = REPEAT_NUM):
+        if not 0 <= noise_density <= 1 or not 0 <= corruption <= 1:
+            raise Exception
+        if not isinstance(repeat_num, int) or repeat_num < 1:
+            raise Exception
+        self.generator = generator
+        self.engine = engine
+        self.noise_density = noise_density
+        self.corruption = corruption
+        self.repeat_num = repeat_num
+
+    def run_case(self, map_dimensions: Tuple, invader_num: int, accuracy: float) -> Dict:
+        """
+        Each phase is timed repeat_num times on a new radar, and its fastest time is reported
+        """
+        invaders = self.generator.generate_invaders(invader_num)
+        radar_map = self.generator.generate_map(*map_dimensions, self.noise_density)
+        plant_num = max(1, radar_map.size // self.PLANT_CELL_NUM)
+        planted_invaders = self.generator.plant_invaders(radar_map, invaders, plant_num, self.corruption)
+
+        phase_seconds = {'parse': [], 'scan': [], 'render': []}
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'radar.md')
+            FileHandler(file_path).dump_file_content(SampleHandler().compose_samples(invaders + [radar_map]))
+            for _ in range(self.repeat_num):
+                radar = Radar(accuracy, engine=self.engine)
+                start_time = time.perf_counter()
+                radar.init_from_file(file_path)
+                scan_start_time = time.perf_counter()
+                radar.scan()
+                render_start_time = time.perf_counter()
+                radar.dump_to_file(file_path)
+                end_time = time.perf_counter()
+                phase_seconds['parse'].append(scan_start_time - start_time)
+                phase_seconds['scan'].append(render_start_time - scan_start_time)
+                phase_seconds['render'].append(end_time - render_start_time)
+
+        results = radar.scan_results.get_results()
+        detections = set(zip(results['row_index'].tolist(), results['column_index'].tolist(),
+                             results['invader_index'].tolist()))
+        found_num = sum(planted_invader in detections for planted_invader in planted_invaders)
+        scan_seconds = min(phase_seconds['scan'])
+        return {
+            'map_dimensions': list(map_dimensions),
+            'invader_num': invader_num,
+            'accuracy': accuracy,
+            'planted_num': len(planted_invaders),
+            'detection_num': len(results),
+            'recall': found_num / len(planted_invaders) if planted_invaders else 1.0,
+            'parse_seconds': min(phase_seconds['parse']),
+            'scan_seconds': scan_seconds,
+            'render_seconds': min(phase_seconds['render']),
+            'scanned_cells_per_second': radar_map.size / scan_seconds if scan_seconds else None,
+        }
+
+    def run(self, map_dimensions_list: List[Tuple], invader_nums: List[int], accuracies: List[float]) -> Dict:
+        cases = [self.run_case(map_dimensions, invader_num, accuracy)
+                 for map_dimensions in map_dimensions_list
+                 for invader_num in invader_nums
+                 for accuracy in accuracies]
+        return {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'engine': self.engine,
+            'noise_density': self.noise_density,
+            'corruption': self.corruption,
+            'repeat_num': self.repeat_num,
+            'cases': cases,
+        }
+
+
+def clean_map_dimensions(map_dimensions: str) -> Tuple:
+    row_num, col_num = map_dimensions.lower().split('x')
+    return int(row_num), int(col_num)
+
+
+parser = argparse.ArgumentParser(
+    description='Benchmarks parsing, scanning and rendering on generated radar files and prints the results as json')
+parser.add_argument('-s', '--sizes', type=clean_map_dimensions, nargs='+', required=False,
+                    default=[(256, 256), (1024, 1024)],
+                    help='Dimensions of the generated radar maps, such as 512x1024.')
+parser.add_argument('-i', '--invader-nums', type=int, nargs='+', required=False, default=[2, 16],
+                    help='Numbers of the generated known invaders.')
+parser.add_argument('-a', '--accuracies', type=int, nargs='+', required=False, default=[80, 90],
+                    help='Accuracies of invader detection between 0 and 100.')
+parser.add_argument('-n', '--noise-density', type=float, required=False, default=0.3,
+                    help='Ratio of positive signals in the noise of the radar maps.')
+parser.add_argument('-c', '--corruption', type=float, required=False, default=0.05,
+                    help='Ratio of flipped signals of the planted invaders.')
+parser.add_argument('-e', '--engine', type=str, required=False, default=Radar.ENGINE_AUTO,
+                    choices=[Radar.ENGINE_AUTO, Radar.ENGINE_LOOP, Radar.ENGINE_EXACT, *Radar.ENGINES],
+                    help='Matching engine, picked for each invader by default.')
+parser.add_argument('-r', '--repeat', type=int, required=False, default=Benchmark.REPEAT_NUM,
+                    help='Number of times each phase is timed, the fastest time is reported.')
+parser.add_argument('--seed', type=int, required=False, default=0,
+                    help='Seed of the generated radar maps and invaders.')
+parser.add_argument('-o', '--output-path', type=str, required=False, default=None,
+                    help='Relative path of the json file of the results, printed by default.')
+
+
+if __name__ == '__main__':
+    from ascii_pattern_matcher.main import clean_accuracy, clean_file_name
+
+    args = parser.parse_args()
+    benchmark = Benchmark(RadarGenerator(args.seed), engine=args.engine, noise_density=args.noise_density,
+                          corruption=args.corruption, repeat_num=args.repeat)
+    report = benchmark.run(args.sizes, args.invader_nums, [clean_accuracy(accuracy) for accuracy in args.accuracies])
+    report['seed'] = args.seed
+    if args.output_path:
+        FileHandler(clean_file_name(args.output_path)).dump_file_content(json.dumps(report, indent=2) + '\n')
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
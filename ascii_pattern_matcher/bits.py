@@ -0,0 +1,54 @@
+""" Helpers to store binary signals packed into 64 bit words, eight times denser than a byte per signal. """
+import numpy as np
+
+WORD_DTYPE = np.dtype('<u8')
+WORD_BIT_NUM = 64
+
+# number of positive bits in every byte value, used when numpy has no native popcount
+_BYTE_POPCOUNTS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def get_word_num(column_num: int) -> int:
+    return -(-column_num // WORD_BIT_NUM)
+
+
+def pack_signals(signals: np.ndarray) -> np.ndarray:
+    """
+    Packs each row of a 2D signal array into little-endian 64 bit words.
+    Bit i of word j holds the signal at column 64 * j + i, trailing bits of the last word are zeros.
+    """
+    row_num, column_num = signals.shape
+    packed_bytes = np.packbits(np.not_equal(signals, 0), axis=1, bitorder='little')
+    word_bytes = np.zeros((row_num, get_word_num(column_num) * WORD_DTYPE.itemsize), dtype=np.uint8)
+    word_bytes[:, :packed_bytes.shape[1]] = packed_bytes
+    return word_bytes.view(WORD_DTYPE)
+
+
+def unpack_signals(words: np.ndarray, column_num: int) -> np.ndarray:
+    """
+    Reverse of pack_signals, returns zeros and ones as uint8
+    """
+    word_bytes = np.ascontiguousarray(words, dtype=WORD_DTYPE).view(np.uint8)
+    return np.unpackbits(word_bytes, axis=1, count=column_num, bitorder='little')
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """
+    Returns the number of positive bits of every word
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    word_bytes = np.ascontiguousarray(words, dtype=WORD_DTYPE).view(np.uint8)
+    return _BYTE_POPCOUNTS[word_bytes].reshape(words.shape + (WORD_DTYPE.itemsize,)).sum(axis=-1, dtype=np.uint8)
+
+
+def shift_words(words: np.ndarray, bit_num: int) -> np.ndarray:
+    """
+    Shifts packed rows towards the first column by bit_num bits, where bit_num is less than a word.
+    Word j of the result holds the signals starting from column 64 * j + bit_num.
+    """
+    if bit_num == 0:
+        return words
+    next_words = np.zeros_like(words)
+    next_words[:, :-1] = words[:, 1:]
+    return (words >> np.uint64(bit_num)) | (next_words << np.uint64(WORD_BIT_NUM - bit_num))
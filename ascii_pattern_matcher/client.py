@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import json
+import sys
+from typing import List
+
+from ascii_pattern_matcher.server import LINE_BYTE_NUM
+from ascii_pattern_matcher.utils import FileHandler
+
+
+class ScanClient:
+    """
+    Connection to a ScanServer, see server.ScanServer for the requests and responses
+    """
+    host = None
+    port = None
+    unix_socket_path = None
+    _reader = None
+    _writer = None
+
+    def __init__(self, host: str = None, port: int = None, unix_socket_path: str = None):
+        self.host = host
+        self.port = port
+        self.unix_socket_path = unix_socket_path
+
+    async def connect(self):
+        if self.unix_socket_path is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(self.unix_socket_path,
+                                                                            limit=LINE_BYTE_NUM)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port, limit=LINE_BYTE_NUM)
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def scan(self, sample: str, cleaned_map: bool = False) -> dict:
+        """
+        :param sample: radar sample rows, or a content in the input file format whose last sample is the radar sample
+        """
+        self._writer.write(json.dumps({'sample': sample, 'cleaned_map': cleaned_map}).encode() + b'\n')
+        await self._writer.drain()
+        line = await self._reader.readline()
+        if not line:
+            raise Exception('connection closed by the server')
+        return json.loads(line)
+
+
+parser = argparse.ArgumentParser(
+    description='Sends radar samples to a scan server and prints a json line of detections for each file')
+parser.add_argument('file_paths', type=str, nargs='+',
+                    help='Relative paths of the input files.')
+parser.add_argument('-c', '--connections', type=int, required=False, default=1,
+                    help='Number of connections sending the files concurrently.')
+parser.add_argument('--host', type=str, required=False, default='127.0.0.1',
+                    help='Host of the server.')
+parser.add_argument('-p', '--port', type=int, required=False, default=8765,
+                    help='TCP port of the server.')
+parser.add_argument('-u', '--unix-socket', type=str, required=False, default=None,
+                    help='Path of the Unix socket of the server instead of the TCP port.')
+
+
+async def send_files(file_paths: List[str], connection_num: int, host: str, port: int, unix_socket_path: str):
+    file_path_queue = asyncio.Queue()
+    for file_path in file_paths:
+        file_path_queue.put_nowait(file_path)
+
+    async def send_queued_files():
+        client = ScanClient(host, port, unix_socket_path)
+        await client.connect()
+        try:
+            while not file_path_queue.empty():
+                file_path = file_path_queue.get_nowait()
+                response = await client.scan(FileHandler(file_path).get_file_content())
+                sys.stdout.write(json.dumps({'file_path': file_path, **response}) + '\n')
+        finally:
+            await client.close()
+
+    await asyncio.gather(*(send_queued_files() for _ in range(min(connection_num, len(file_paths)))))
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.connections < 1:
+        raise Exception
+    asyncio.run(send_files(args.file_paths, args.connections, args.host, args.port, args.unix_socket))
@@ -0,0 +1,263 @@
+from typing import TYPE_CHECKING, List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from ascii_pattern_matcher.bits import WORD_BIT_NUM, popcount, shift_words
+
+if TYPE_CHECKING:
+    from ascii_pattern_matcher.models import Invader, RectanglePattern
+
+
+class CorrelationEngine:
+    """
+    Computes the matched area of an invader for every offset of a radar map in one batched operation.
+    Matched area is the number of positive signals shared by the invader and the map slice at the offset.
+    Invaders of the same dimensions can be matched as a group, sharing the work done on the map.
+    """
+    name = None
+    # whether the engine works on packed patterns without unpacking the radar map
+    supports_packed = False
+
+    def get_matched_area_map(self, radar_map: 'RectanglePattern', invader: 'Invader',
+                             offset_dimensions: Tuple) -> np.ndarray:
+        """
+        :return: 2D array of matched areas, indexed by the top-left point of the invader on the map
+        """
+        return self.get_matched_area_maps(radar_map, [invader], offset_dimensions)[0]
+
+    def get_matched_area_maps(self, radar_map: 'RectanglePattern', invaders: List['Invader'],
+                              offset_dimensions: Tuple) -> np.ndarray:
+        """
+        :param invaders: invaders of the same dimensions
+        :return: 3D array of matched area maps, one per invader
+        """
+        raise NotImplementedError
+
+    def get_matched_areas_at(self, radar_map: 'RectanglePattern', invader: 'Invader',
+                             row_indices: np.ndarray, col_indices: np.ndarray) -> np.ndarray:
+        """
+        Returns matched areas of the given offsets only. Used when most of the offsets are already pruned.
+        """
+        map_signals = radar_map.get_signal_pattern()
+        matched_areas = np.zeros(len(row_indices), dtype=np.int32)
+        for row_idx, col_idx in zip(*np.nonzero(invader.get_signal_pattern())):
+            matched_areas += map_signals[row_indices + row_idx, col_indices + col_idx]
+        return matched_areas
+
+    def estimate_cost(self, radar_map: 'RectanglePattern', invader: 'Invader', offset_dimensions: Tuple) -> float:
+        """
+        Returns the approximate cost of get_matched_area_map, in units of a single vectorized cell addition.
+        Used to select the cheapest engine automatically.
+        """
+        raise NotImplementedError
+
+    def estimate_group_cost(self, radar_map: 'RectanglePattern', invaders: List['Invader'],
+                            offset_dimensions: Tuple) -> float:
+        """
+        Returns the approximate cost of get_matched_area_maps, in the units of estimate_cost
+        """
+        return sum(self.estimate_cost(radar_map, invader, offset_dimensions) for invader in invaders)
+
+
+class DirectCorrelationEngine(CorrelationEngine):
+    """
+    Correlates the map with the invader by adding a shifted view of the map for each positive invader signal.
+    Costs O(offsets x covered area) without allocating any per-window object.
+    Large groups of invaders are instead multiplied at once with a strided window view of the map.
+    """
+    name = 'direct'
+    # bytes of the window view copied at once by the group multiplication
+    WINDOW_CHUNK_BYTE_NUM = 16 << 20
+    # measured costs of the group multiplication relative to a cell addition
+    WINDOW_CELL_COST_FACTOR = 3.3
+    WINDOW_PRODUCT_COST_FACTOR = 0.11
+    WINDOW_OUTPUT_COST_FACTOR = 9.0
+
+    _float_map_source = None
+    _float_map = None
+
+    def get_matched_area_maps(self, radar_map: 'RectanglePattern', invaders: List['Invader'],
+                              offset_dimensions: Tuple) -> np.ndarray:
+        if self.estimate_window_cost(invaders, offset_dimensions) < \
+                super().estimate_group_cost(radar_map, invaders, offset_dimensions):
+            return self._get_window_matched_area_maps(radar_map, invaders, offset_dimensions)
+
+        row_num, col_num = offset_dimensions
+        map_signals = radar_map.get_signal_pattern()
+        matched_area_maps = np.zeros((len(invaders), row_num, col_num), dtype=np.int32)
+        for matched_area_map, invader in zip(matched_area_maps, invaders):
+            for row_idx, col_idx in zip(*np.nonzero(invader.get_signal_pattern())):
+                matched_area_map += map_signals[row_idx:row_idx + row_num, col_idx:col_idx + col_num]
+        return matched_area_maps
+
+    def get_float_map(self, radar_map: 'RectanglePattern') -> np.ndarray:
+        if self._float_map_source is not radar_map:
+            self._float_map = radar_map.get_signal_pattern().astype(np.float32)
+            self._float_map_source = radar_map
+        return self._float_map
+
+    def _get_window_matched_area_maps(self, radar_map: 'RectanglePattern', invaders: List['Invader'],
+                                      offset_dimensions: Tuple) -> np.ndarray:
+        row_num, col_num = offset_dimensions
+        invader_row_num, invader_col_num = invaders[0].get_dimensions()
+        window_area = invader_row_num * invader_col_num
+        stacked_invaders = np.array([invader.get_signal_pattern().ravel() for invader in invaders], dtype=np.float32)
+
+        float_map = self.get_float_map(radar_map)
+        windows = as_strided(float_map, shape=(row_num, col_num, invader_row_num, invader_col_num),
+                             strides=float_map.strides * 2, writeable=False)
+        matched_area_maps = np.empty((len(invaders), row_num, col_num), dtype=np.int32)
+        chunk_row_num = max(1, self.WINDOW_CHUNK_BYTE_NUM // max(col_num * window_area * float_map.itemsize, 1))
+        for row_idx in range(0, row_num, chunk_row_num):
+            chunk_windows = windows[row_idx:row_idx + chunk_row_num].reshape(-1, window_area)
+            # sums of float32 zeros and ones are exact far beyond any invader area
+            chunk_matched_areas = stacked_invaders @ chunk_windows.T
+            matched_area_maps[:, row_idx:row_idx + chunk_row_num] = \
+                chunk_matched_areas.reshape(len(invaders), -1, col_num)
+        return matched_area_maps
+
+    def estimate_window_cost(self, invaders: List['Invader'], offset_dimensions: Tuple) -> float:
+        row_num, col_num = offset_dimensions
+        invader_row_num, invader_col_num = invaders[0].get_dimensions()
+        invader_num = len(invaders)
+        window_cost = invader_row_num * invader_col_num * (self.WINDOW_CELL_COST_FACTOR
+                                                           + self.WINDOW_PRODUCT_COST_FACTOR * invader_num)
+        return row_num * col_num * (window_cost + self.WINDOW_OUTPUT_COST_FACTOR * invader_num)
+
+    def estimate_cost(self, radar_map: 'RectanglePattern', invader: 'Invader', offset_dimensions: Tuple) -> float:
+        row_num, col_num = offset_dimensions
+        return float(row_num * col_num * np.count_nonzero(invader.get_signal_pattern()))
+
+    def estimate_group_cost(self, radar_map: 'RectanglePattern', invaders: List['Invader'],
+                            offset_dimensions: Tuple) -> float:
+        return min(super().estimate_group_cost(radar_map, invaders, offset_dimensions),
+                   self.estimate_window_cost(invaders, offset_dimensions))
+
+
+def get_fast_fft_length(length: int) -> int:
+    """
+    Returns the smallest 5-smooth number which is not less than the given length. FFT is fastest on those lengths.
+    """
+    fast_length = length
+    while True:
+        remainder = fast_length
+        for prime in (2, 3, 5):
+            while remainder % prime == 0:
+                remainder //= prime
+        if remainder == 1:
+            return fast_length
+        fast_length += 1
+
+
+class FFTCorrelationEngine(CorrelationEngine):
+    """
+    Correlates the map with the invader through the frequency domain in O(N log N).
+    Transform of the map does not depend on the invader, so it is computed once and reused by every invader.
+    """
+    name = 'fft'
+    # measured cost of a transform element relative to a cell addition of the direct engine
+    TRANSFORM_COST_FACTOR = 4.5
+    # invaders transformed at once, bounds the memory of the stacked transforms
+    INVADER_BATCH_SIZE = 8
+
+    _transformed_map = None
+    _map_transform = None
+
+    def get_fft_shape(self, radar_map: 'RectanglePattern') -> Tuple:
+        # circular correlation never wraps around for valid offsets when the transform covers the whole map
+        return tuple(get_fast_fft_length(length) for length in radar_map.get_dimensions())
+
+    def get_map_transform(self, radar_map: 'RectanglePattern') -> np.ndarray:
+        if self._transformed_map is not radar_map:
+            self._map_transform = np.fft.rfft2(radar_map.get_signal_pattern(), s=self.get_fft_shape(radar_map))
+            self._transformed_map = radar_map
+        return self._map_transform
+
+    def get_matched_area_maps(self, radar_map: 'RectanglePattern', invaders: List['Invader'],
+                              offset_dimensions: Tuple) -> np.ndarray:
+        row_num, col_num = offset_dimensions
+        fft_shape = self.get_fft_shape(radar_map)
+        map_transform = self.get_map_transform(radar_map)
+        matched_area_maps = np.empty((len(invaders), row_num, col_num), dtype=np.int32)
+        for invader_idx in range(0, len(invaders), self.INVADER_BATCH_SIZE):
+            batch_invaders = invaders[invader_idx:invader_idx + self.INVADER_BATCH_SIZE]
+            stacked_invaders = np.array([invader.get_signal_pattern() for invader in batch_invaders])
+            invader_transforms = np.fft.rfft2(stacked_invaders, s=fft_shape)
+            correlations = np.fft.irfft2(map_transform * np.conj(invader_transforms), s=fft_shape)
+            matched_area_maps[invader_idx:invader_idx + len(batch_invaders)] = \
+                np.rint(correlations[:, :row_num, :col_num])
+        return matched_area_maps
+
+    def estimate_cost(self, radar_map: 'RectanglePattern', invader: 'Invader', offset_dimensions: Tuple) -> float:
+        fft_row_num, fft_col_num = self.get_fft_shape(radar_map)
+        fft_area = fft_row_num * fft_col_num
+        return self.TRANSFORM_COST_FACTOR * fft_area * np.log2(max(fft_area, 2))
+
+
+class BitPackedCorrelationEngine(CorrelationEngine):
+    """
+    Matches packed rows of the invader with packed rows of the map using word-wise AND plus popcount.
+    Map words are shifted once for every bit offset within a word and shared by all the column offsets
+    having that bit offset and by all the invaders of a group, so each operation compares 64 signals at once.
+    """
+    name = 'bitpacked'
+    supports_packed = True
+    # number of offset rows processed at once, bounds the memory of shifted map words
+    ROW_BAND_SIZE = 1024
+    # measured cost of a word comparison relative to a cell addition of the direct engine
+    WORD_COST_FACTOR = 8.0
+
+    def get_matched_area_maps(self, radar_map: 'RectanglePattern', invaders: List['Invader'],
+                              offset_dimensions: Tuple) -> np.ndarray:
+        row_num, col_num = offset_dimensions
+        matched_area_maps = np.zeros((len(invaders), row_num, col_num), dtype=np.int32)
+        invader_words_list = [invader.get_packed_pattern() for invader in invaders]
+        invader_row_num, invader_word_num = invader_words_list[0].shape
+        map_words = radar_map.get_packed_pattern()
+        for band_row_idx in range(0, row_num, self.ROW_BAND_SIZE):
+            band_row_num = min(self.ROW_BAND_SIZE, row_num - band_row_idx)
+            band_words = self._get_band_words(map_words, band_row_idx, band_row_num + invader_row_num - 1,
+                                              invader_word_num)
+            band_matched_area_maps = matched_area_maps[:, band_row_idx:band_row_idx + band_row_num]
+            for bit_num in range(min(WORD_BIT_NUM, col_num)):
+                # column offsets bit_num, bit_num + 64, ... start from the consecutive words of the shifted map
+                word_offset_num = len(range(bit_num, col_num, WORD_BIT_NUM))
+                shifted_words = shift_words(band_words, bit_num)
+                matched_words = np.empty((band_row_num, word_offset_num), dtype=shifted_words.dtype)
+                for band_matched_area_map, invader_words in zip(band_matched_area_maps, invader_words_list):
+                    bit_matched_area_map = np.zeros((band_row_num, word_offset_num), dtype=np.int32)
+                    for invader_row_idx in range(invader_row_num):
+                        for word_idx in range(invader_word_num):
+                            invader_word = invader_words[invader_row_idx, word_idx]
+                            if not invader_word:
+                                continue
+                            window_words = shifted_words[invader_row_idx:invader_row_idx + band_row_num,
+                                                         word_idx:word_idx + word_offset_num]
+                            np.bitwise_and(window_words, invader_word, out=matched_words)
+                            bit_matched_area_map += popcount(matched_words)
+                    band_matched_area_map[:, bit_num::WORD_BIT_NUM] = bit_matched_area_map
+        return matched_area_maps
+
+    def get_matched_areas_at(self, radar_map: 'RectanglePattern', invader: 'Invader',
+                             row_indices: np.ndarray, col_indices: np.ndarray) -> np.ndarray:
+        map_words = radar_map.get_packed_pattern()
+        matched_areas = np.zeros(len(row_indices), dtype=np.int32)
+        for row_idx, col_idx in zip(*np.nonzero(invader.get_signal_pattern())):
+            map_col_indices = col_indices + col_idx
+            words = map_words[row_indices + row_idx, map_col_indices // WORD_BIT_NUM]
+            bit_nums = (map_col_indices % WORD_BIT_NUM).astype(np.uint64)
+            matched_areas += ((words >> bit_nums) & np.uint64(1)).astype(np.int32)
+        return matched_areas
+
+    @staticmethod
+    def _get_band_words(map_words: np.ndarray, row_idx: int, row_num: int, extra_word_num: int) -> np.ndarray:
+        # extra zero words let the windows at the last column offsets read past the end of the rows
+        band_words = np.zeros((row_num, map_words.shape[1] + extra_word_num), dtype=map_words.dtype)
+        band_words[:, :map_words.shape[1]] = map_words[row_idx:row_idx + row_num]
+        return band_words
+
+    def estimate_cost(self, radar_map: 'RectanglePattern', invader: 'Invader', offset_dimensions: Tuple) -> float:
+        row_num, col_num = offset_dimensions
+        invader_row_num, invader_word_num = invader.get_packed_pattern().shape
+        return self.WORD_COST_FACTOR * row_num * col_num * invader_row_num * invader_word_num
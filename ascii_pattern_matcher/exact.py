@@ -0,0 +1,129 @@
+from typing import TYPE_CHECKING, List, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from ascii_pattern_matcher.models import Invader, RectanglePattern
+
+# odd bases are invertible modulo 2^64
+ROW_HASH_BASE = 0x9E3779B97F4A7C15
+COLUMN_HASH_BASE = 0xC2B2AE3D27D4EB4F
+# top bits of the hashes indexing the lookup table
+FILTER_BIT_NUM = 20
+
+
+def get_window_hashes(values: np.ndarray, window_length: int, base: int) -> np.ndarray:
+    """
+    Returns the polynomial hashes modulo 2^64 of every window of window_length values along the last axis,
+    sum of value j of the window times base^j. Computed from prefix sums, so the cost does not depend on the window.
+    """
+    value_num = values.shape[-1]
+    window_num = max(value_num - window_length + 1, 0)
+    powers = np.ones(value_num + 1, dtype=np.uint64)
+    powers[1:] = np.multiply.accumulate(np.full(value_num, base, dtype=np.uint64))
+    inverse_base = pow(base, -1, 1 << 64)
+    inverse_powers = np.ones(window_num, dtype=np.uint64)
+    inverse_powers[1:] = np.multiply.accumulate(np.full(max(window_num - 1, 0), inverse_base, dtype=np.uint64))
+
+    # unsigned arithmetic wraps around, which is the modulo
+    prefix_sums = np.zeros(values.shape[:-1] + (value_num + 1,), dtype=np.uint64)
+    np.cumsum(values.astype(np.uint64) * powers[:value_num], axis=-1, dtype=np.uint64, out=prefix_sums[..., 1:])
+    return (prefix_sums[..., window_length:] - prefix_sums[..., :window_num]) * inverse_powers
+
+
+def lookup_hashes(hashes: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    Returns the index of every hash in the sorted unique keys, or -1 if it is not a key.
+    Keys are placed in a table indexed by the top bits of the hashes, so a hash is found with a single lookup and
+    only the hashes falling into a slot shared by several keys are binary searched.
+    """
+    shift = np.uint64(64 - FILTER_BIT_NUM)
+    key_slots = (keys >> shift).astype(np.int64)
+    slot_key_indices = np.full(1 << FILTER_BIT_NUM, -1, dtype=np.int64)
+    slot_key_indices[key_slots] = np.arange(len(keys))
+    # -2 marks the slots of more than one key
+    slot_key_indices[key_slots[np.flatnonzero(np.diff(key_slots) == 0)]] = -2
+
+    indices = slot_key_indices[(hashes >> shift).astype(np.int64)]
+    is_found = indices >= 0
+    is_found[is_found] = keys[indices[is_found]] == hashes[is_found]
+    is_shared = indices == -2
+    shared_hashes = hashes[is_shared]
+    key_indices = np.minimum(np.searchsorted(keys, shared_hashes), len(keys) - 1)
+    indices[is_shared] = np.where(keys[key_indices] == shared_hashes, key_indices, -1)
+    indices[~is_found & ~is_shared] = -1
+    return indices
+
+
+class ExactMatcher:
+    """
+    Finds the windows of the map which are identical to an invader, negative signals included, for a whole invader
+    library at once in the style of Baker-Bird.
+    Row step labels each row window of the map with the invader row it equals, column step finds the columns of
+    labels spelling out an invader. Both steps compare rolling hashes instead of running an automaton, so each is a
+    linear vectorized pass over the map for each distinct invader width and shape, whatever the number of invaders.
+    Hash matches are verified cell by cell, so collisions never cause false matches.
+    """
+
+    def find_matches(self, radar_map: 'RectanglePattern', invaders: List['Invader']) -> Tuple:
+        """
+        :return: row indices, column indices and positions in invaders of the matches, for every offset where the
+            invader fits in the map, sorted by invader position, row and column
+        """
+        map_signals = radar_map.get_signal_pattern()
+        matches = [(np.zeros(0, dtype=np.int64),) * 3]
+        widths = {invader.get_dimensions()[1] for invader in invaders}
+        for width in sorted(widths):
+            width_invader_positions = [position for position, invader in enumerate(invaders)
+                                       if invader.get_dimensions()[1] == width]
+            matches.extend(self._find_width_matches(map_signals, invaders, width_invader_positions, width))
+        row_indices, col_indices, invader_positions = (np.concatenate(indices) for indices in zip(*matches))
+        order = np.lexsort((col_indices, row_indices, invader_positions))
+        return row_indices[order], col_indices[order], invader_positions[order]
+
+    def _find_width_matches(self, map_signals: np.ndarray, invaders: List['Invader'], invader_positions: List[int],
+                            width: int) -> List[Tuple]:
+        shape_invader_positions = {}
+        for position in invader_positions:
+            shape_invader_positions.setdefault(invaders[position].get_dimensions()[0], []).append(position)
+        # row hashes of the invaders of a shape are computed at once from their stacked signals
+        shape_row_hashes = {}
+        for height, positions in shape_invader_positions.items():
+            stacked_signals = np.array([invaders[position].get_signal_pattern() for position in positions])
+            shape_row_hashes[height] = get_window_hashes(stacked_signals, width, ROW_HASH_BASE)[..., 0]
+
+        # row step, label 0 is kept for the map rows which are not an invader row
+        row_hashes = np.unique(np.concatenate([hashes.ravel() for hashes in shape_row_hashes.values()]))
+        map_labels = lookup_hashes(get_window_hashes(map_signals, width, ROW_HASH_BASE), row_hashes) + 1
+        map_labels = map_labels.astype(np.uint64)
+
+        # column step for each invader height
+        matches = []
+        for height in sorted(shape_invader_positions):
+            positions = shape_invader_positions[height]
+            invader_labels = np.searchsorted(row_hashes, shape_row_hashes[height]) + 1
+            invader_hashes = get_window_hashes(invader_labels, height, COLUMN_HASH_BASE)[:, 0]
+            # identical invaders share a hash
+            unique_invader_hashes, invader_hash_indices = np.unique(invader_hashes, return_inverse=True)
+            map_hash_indices = lookup_hashes(get_window_hashes(map_labels.T, height, COLUMN_HASH_BASE).T,
+                                             unique_invader_hashes)
+            row_indices, col_indices = np.nonzero(map_hash_indices >= 0)
+            candidate_hash_indices = map_hash_indices[row_indices, col_indices]
+            for position, invader_hash_index in zip(positions, invader_hash_indices):
+                is_candidate = candidate_hash_indices == invader_hash_index
+                matched_row_indices, matched_col_indices = self._verify(map_signals, invaders[position],
+                                                                        row_indices[is_candidate],
+                                                                        col_indices[is_candidate])
+                matches.append((matched_row_indices, matched_col_indices,
+                                np.full(len(matched_row_indices), position, dtype=np.int64)))
+        return matches
+
+    @staticmethod
+    def _verify(map_signals: np.ndarray, invader: 'Invader', row_indices: np.ndarray,
+                col_indices: np.ndarray) -> Tuple:
+        if not len(row_indices):
+            return row_indices, col_indices
+        is_equal = np.ones(len(row_indices), dtype=bool)
+        for (row_idx, col_idx), signal in np.ndenumerate(invader.get_signal_pattern()):
+            is_equal &= map_signals[row_indices + row_idx, col_indices + col_idx] == signal
+        return row_indices[is_equal], col_indices[is_equal]
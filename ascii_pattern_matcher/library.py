@@ -0,0 +1,120 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+
+from ascii_pattern_matcher.models import Invader
+
+
+class InvaderLibrary:
+    """
+    Known invaders compiled once: signal patterns, packed patterns and covered areas are computed on creation,
+    so radars using the library skip all invader-side preparation.
+    Identified by the content hash of the invader samples.
+    """
+    invaders = None
+    content_hash = None
+
+    def __init__(self, invaders: List[Invader], content_hash: str):
+        self.invaders = invaders
+        self.content_hash = content_hash
+
+    @staticmethod
+    def get_content_hash(invader_samples: List[np.ndarray]) -> str:
+        content_hash = hashlib.sha256()
+        for invader_sample in invader_samples:
+            invader_sample = np.ascontiguousarray(invader_sample)
+            content_hash.update(f'{invader_sample.dtype.str}{invader_sample.shape};'.encode())
+            content_hash.update(invader_sample.tobytes())
+        return content_hash.hexdigest()
+
+    @classmethod
+    def compile(cls, invader_samples: List[np.ndarray]):
+        invaders = []
+        for invader_sample in invader_samples:
+            invader = Invader(invader_sample)
+            invader.get_signal_pattern()
+            invader.get_packed_pattern()
+            invader.get_covered_area()
+            invaders.append(invader)
+        return cls(invaders, cls.get_content_hash(invader_samples))
+
+    def save(self, file_path: str):
+        """
+        Writes the compiled invaders as an npz file, through a temporary file so readers never see a partial file
+        """
+        arrays = {'covered_areas': np.array([invader.get_covered_area() for invader in self.invaders])}
+        for invader_index, invader in enumerate(self.invaders):
+            arrays[f'pattern_{invader_index}'] = invader.get_pattern()
+            arrays[f'packed_pattern_{invader_index}'] = invader.get_packed_pattern()
+        file_descriptor, temporary_file_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or '.')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                np.savez(file, **arrays)
+            os.replace(temporary_file_path, file_path)
+        except BaseException:
+            os.remove(temporary_file_path)
+            raise
+
+    @classmethod
+    def load(cls, file_path: str, content_hash: str):
+        with np.load(file_path) as arrays:
+            covered_areas = arrays['covered_areas']
+            invaders = [Invader.from_compiled(arrays[f'pattern_{invader_index}'],
+                                              arrays[f'packed_pattern_{invader_index}'], covered_area.item())
+                        for invader_index, covered_area in enumerate(covered_areas)]
+        return cls(invaders, content_hash)
+
+
+class InvaderLibraryCache:
+    """
+    Keeps the most recently used compiled invader libraries in memory, keyed by the content hash of their samples.
+    With a cache directory, compiled libraries are also persisted there and loaded instead of compiled again
+    by later processes.
+    """
+    CAPACITY = 16
+    FILE_EXTENSION = '.npz'
+
+    capacity = None
+    cache_directory = None
+    _libraries = None
+
+    def __init__(self, capacity: int = CAPACITY, cache_directory: str = None):
+        if not isinstance(capacity, int) or capacity < 1:
+            raise Exception
+        self.capacity = capacity
+        self.cache_directory = cache_directory
+        self._libraries = OrderedDict()
+        if cache_directory is not None:
+            os.makedirs(cache_directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._libraries)
+
+    def __contains__(self, content_hash: str) -> bool:
+        return content_hash in self._libraries
+
+    def get_library_file_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_directory, content_hash + self.FILE_EXTENSION)
+
+    def get_library(self, invader_samples: List[np.ndarray]) -> InvaderLibrary:
+        content_hash = InvaderLibrary.get_content_hash(invader_samples)
+        if content_hash in self._libraries:
+            self._libraries.move_to_end(content_hash)
+            return self._libraries[content_hash]
+
+        if self.cache_directory is not None and os.path.isfile(self.get_library_file_path(content_hash)):
+            library = InvaderLibrary.load(self.get_library_file_path(content_hash), content_hash)
+        else:
+            library = InvaderLibrary.compile(invader_samples)
+            if self.cache_directory is not None:
+                library.save(self.get_library_file_path(content_hash))
+
+        self._libraries[content_hash] = library
+        if len(self._libraries) > self.capacity:
+            # least recently used first
+            self._libraries.popitem(last=False)
+        return library
@@ -1,6 +1,13 @@
 import argparse
+import json
 
-from models import Radar
+# NumPy and the models are imported when a run starts, so the parser is cheap to build and to import from the
+# other scripts, these names are the same as Radar.ENGINE_AUTO, Radar.ENGINE_LOOP, Radar.ENGINE_EXACT,
+# Radar.ENGINES and Radar.VARIANT_POLICIES
+ENGINE_NAMES = ['auto', 'loop', 'exact', 'direct', 'fft', 'bitpacked']
+VARIANT_POLICY_NAMES = ['none', 'rotations', 'mirrors', 'all']
+# same as DetectionHandler.FORMATS
+DETECTION_FORMAT_NAMES = ['jsonl', 'csv']
 
 parser = argparse.ArgumentParser(
     description='Reveals possible locations of invaders on given radar sample')
@@ -8,6 +15,32 @@ parser.add_argument('-a', '--accuracy', type=int, required=False, default=80,
                     help='Accuracy of invader detection between 0 and 100.')
 parser.add_argument('-f', '--file-path', type=str, required=False, default='../README.md',
                     help='Relative path of the input file.')
+parser.add_argument('-e', '--engine', type=str, required=False, default=ENGINE_NAMES[0],
+                    choices=ENGINE_NAMES,
+                    help='Matching engine, picked for each invader by default.')
+parser.add_argument('-w', '--workers', type=int, required=False, default=1,
+                    help='Number of processes scanning tiles of the radar map in parallel, or files in batch mode.')
+parser.add_argument('-v', '--variants', type=str, required=False, default=VARIANT_POLICY_NAMES[0],
+                    choices=VARIANT_POLICY_NAMES,
+                    help='Rotated and mirrored variants of the known invaders to scan as well.')
+parser.add_argument('-g', '--edge-visibility', type=int, required=False, default=None,
+                    help='Also detects invaders partially off the radar map with at least this percent of their '
+                         'signals on the map, between 0 and 100.')
+parser.add_argument('-s', '--stats-path', type=str, required=False, default=None,
+                    help='Relative path of a json report of the time and memory of each phase and invader, or of '
+                         'the throughput of each file in batch mode.')
+parser.add_argument('-c', '--convert-to', type=str, required=False, default=None,
+                    help='Converts the input file to the binary format at the given path instead of scanning.')
+parser.add_argument('-l', '--library-cache-dir', type=str, required=False, default=None,
+                    help='Directory where compiled known invaders are cached between runs.')
+parser.add_argument('-d', '--detections', type=str, required=False, default=None, choices=DETECTION_FORMAT_NAMES,
+                    help='Writes the detections in this format to detections.<format> instead of the cleaned map, '
+                         'or to <name>.detections.<format> in batch mode.')
+parser.add_argument('-b', '--batch', type=str, nargs='+', required=False, default=None,
+                    help='Relative paths of files, directories or glob patterns whose radar samples are scanned for '
+                         'the known invaders of the input file, each into its own <name>.cleaned_map.<extension>.')
+parser.add_argument('-o', '--output-dir', type=str, required=False, default=None,
+                    help='Directory of the cleaned maps in batch mode, the directory of each file by default.')
 
 
 def clean_accuracy(accuracy: int) -> float:
@@ -18,13 +51,76 @@ def clean_file_name(file_path: str) -> str:
     return file_path
 
 
+def create_radar(args: argparse.Namespace, hooks: list = None):
+    from ascii_pattern_matcher.library import InvaderLibraryCache
+    from ascii_pattern_matcher.models import Radar
+
+    invader_library_cache = None
+    if args.library_cache_dir:
+        invader_library_cache = InvaderLibraryCache(cache_directory=clean_file_name(args.library_cache_dir))
+    edge_visible_fraction = None
+    if args.edge_visibility is not None:
+        edge_visible_fraction = clean_accuracy(args.edge_visibility)
+    return Radar(clean_accuracy(args.accuracy), engine=args.engine, invader_library_cache=invader_library_cache,
+                 variants=args.variants, edge_visible_fraction=edge_visible_fraction, hooks=hooks)
+
+
+def run(args: argparse.Namespace):
+    from ascii_pattern_matcher.stats import ScanStats
+    from ascii_pattern_matcher.utils import FileHandler
+
+    file_path = clean_file_name(args.file_path)
+    scan_stats = ScanStats() if args.stats_path else None
+    radar = create_radar(args, hooks=[scan_stats] if scan_stats else None)
+    radar.init_from_file(file_path)
+
+    radar.scan(worker_num=args.workers)
+    if args.detections:
+        radar.dump_detections_to_file(file_path, args.detections)
+    else:
+        radar.dump_to_file(file_path)
+
+    if scan_stats:
+        report = scan_stats.get_report()
+        report.update(window_num=int(radar.window_num), pruned_window_num=int(radar.pruned_window_num),
+                      detection_num=len(radar.scan_results))
+        FileHandler(clean_file_name(args.stats_path)).dump_file_content(json.dumps(report, indent=2) + '\n')
+
+
+def run_batch(args: argparse.Namespace):
+    """
+    Loads the known invaders of the input file once and scans the radar samples of the batch files with them
+    """
+    from ascii_pattern_matcher.batch import BatchScanner
+    from ascii_pattern_matcher.utils import FileHandler
+
+    radar = create_radar(args)
+    radar.init_known_invaders_from_file(clean_file_name(args.file_path))
+    output_directory = clean_file_name(args.output_dir) if args.output_dir else None
+    scanner = BatchScanner(radar, args.workers, output_directory, args.detections)
+    summary = scanner.scan(scanner.expand_file_paths([clean_file_name(path) for path in args.batch]))
+
+    print(f'Scanned {summary["file_num"]} files of {summary["cell_num"]} cells with {summary["detection_num"]} '
+          f'detections in {summary["seconds"]:.3f}s using {summary["worker_num"]} workers')
+    if summary['seconds']:
+        print(f'{summary["files_per_second"]:.2f} files/s, {summary["cells_per_second"]:.0f} cells/s')
+    if summary['error_num']:
+        print(f'Failed to scan {summary["error_num"]} files:')
+    for file in summary['files']:
+        if 'error' in file:
+            print(f'{file["file_path"]}: {file["error"]}')
+    if args.stats_path:
+        FileHandler(clean_file_name(args.stats_path)).dump_file_content(json.dumps(summary, indent=2) + '\n')
+
+
 if __name__ == '__main__':
     args = parser.parse_args()
-    accuracy = clean_accuracy(args.accuracy)
-    file_path = clean_file_name(args.file_path)
 
-    radar = Radar(accuracy)
-    radar.init_from_file(file_path)
+    if args.convert_to:
+        from ascii_pattern_matcher.utils import BinaryOutputFileHandler
 
-    radar.scan()
-    radar.dump_to_file(file_path)
+        BinaryOutputFileHandler(clean_file_name(args.convert_to)).dump_from_ascii_file(clean_file_name(args.file_path))
+    elif args.batch:
+        run_batch(args)
+    else:
+        run(args)
@@ -1,8 +1,15 @@
-from typing import Tuple
+import time
+from typing import Iterable, Iterator, List, Tuple
 
 import numpy as np
 
-from ascii_pattern_matcher.utils import InputFileHandler, SampleHandler, OutputFileHandler
+from ascii_pattern_matcher.bits import WORD_DTYPE, get_word_num, pack_signals, unpack_signals
+from ascii_pattern_matcher.engines import BitPackedCorrelationEngine, DirectCorrelationEngine, FFTCorrelationEngine
+from ascii_pattern_matcher.exact import ExactMatcher
+from ascii_pattern_matcher.stats import Instrumentation
+from ascii_pattern_matcher.utils import (BinaryFileHandler, BinaryInputFileHandler, DetectionHandler,
+                                         DetectionOutputFileHandler, InputFileHandler, OutputFileHandler, SampleHandler,
+                                         StreamInputFileHandler)
 
 
 class Point:
@@ -27,6 +34,7 @@ class Pattern:
     Used to store and process ASCII pattern samples which is processed to zero and ones.
     """
     _pattern = None
+    _signal_pattern = None
 
     def __init__(self, pattern: np.ndarray):
         if not isinstance(pattern, np.ndarray):
@@ -38,6 +46,14 @@ class Pattern:
     def get_pattern(self):
         return self._pattern
 
+    def get_signal_pattern(self) -> np.ndarray:
+        """
+        Returns the pattern as zeros and ones where any non zero value is a positive signal.
+        """
+        if self._signal_pattern is None:
+            self._signal_pattern = np.not_equal(self.get_pattern(), 0).view(np.uint8)
+        return self._signal_pattern
+
     def get_area(self):
         raise NotImplementedError
 
@@ -46,9 +62,132 @@ class RectanglePattern(Pattern):
     """
     Stores 2D rectangular shaped np array.
     Used to store Invaders and Radar sample
+    Can be created from rows packed into 64 bit words instead, then the np array is unpacked only on demand.
     """
+    INTEGRAL_ROW_BAND_SIZE = 1024
+
+    _packed_pattern = None
+    _column_num = None
+    _integral_pattern = None
+    _block_signal_counts = None
+
+    @classmethod
+    def from_packed(cls, packed_pattern: np.ndarray, column_num: int):
+        """
+        :param packed_pattern: rows packed into words as in bits.pack_signals, can be a memory map
+        """
+        if not isinstance(packed_pattern, np.ndarray) or not isinstance(column_num, int):
+            raise Exception
+        if len(packed_pattern.shape) != 2 or packed_pattern.dtype != WORD_DTYPE:
+            raise Exception
+        if packed_pattern.shape[1] != get_word_num(column_num):
+            raise Exception
+        rectangle_pattern = cls.__new__(cls)
+        rectangle_pattern._packed_pattern = packed_pattern
+        rectangle_pattern._column_num = column_num
+        return rectangle_pattern
+
+    def get_pattern(self):
+        if self._pattern is None:
+            self._pattern = unpack_signals(self._packed_pattern, self._column_num)
+        return self._pattern
+
+    def get_packed_pattern(self) -> np.ndarray:
+        """
+        Returns the rows of the signal pattern packed into 64 bit words
+        """
+        if self._packed_pattern is None:
+            self._packed_pattern = pack_signals(self.get_signal_pattern())
+        return self._packed_pattern
+
+    def _get_integral_dtype(self):
+        row_num, column_num = self.get_dimensions()
+        return np.int32 if row_num * column_num < np.iinfo(np.int32).max else np.int64
+
+    def get_integral_pattern(self) -> np.ndarray:
+        """
+        Returns the summed-area table of positive signals, padded with a leading row and column of zeros.
+        Positive signal count of any rectangle is found with four lookups, see get_window_signal_counts.
+        The table is kept unless the pattern is packed only, it is far larger than the packed rows.
+        """
+        if self._integral_pattern is not None:
+            return self._integral_pattern
+        row_num, column_num = self.get_dimensions()
+        dtype = self._get_integral_dtype()
+        integral_pattern = np.zeros((row_num + 1, column_num + 1), dtype=dtype)
+        for band_row_idx in range(0, row_num, self.INTEGRAL_ROW_BAND_SIZE):
+            # packed only patterns are unpacked band by band
+            band = self.get_sliced_pattern(Point(band_row_idx, 0), self.INTEGRAL_ROW_BAND_SIZE, column_num)
+            band_integral = np.cumsum(np.cumsum(band.get_signal_pattern(), axis=0, dtype=dtype), axis=1)
+            band_row_num = band_integral.shape[0]
+            integral_pattern[band_row_idx + 1:band_row_idx + band_row_num + 1, 1:] = \
+                band_integral + integral_pattern[band_row_idx, 1:]
+        if not self.is_packed_only():
+            self._integral_pattern = integral_pattern
+        return integral_pattern
+
+    @staticmethod
+    def _get_integral_window_counts(integral: np.ndarray, row_offset: int, col_offset: int,
+                                    offset_dimensions: Tuple) -> np.ndarray:
+        row_num, col_num = offset_dimensions
+        return (integral[row_offset:row_offset + row_num, col_offset:col_offset + col_num]
+                - integral[:row_num, col_offset:col_offset + col_num]
+                - integral[row_offset:row_offset + row_num, :col_num]
+                + integral[:row_num, :col_num])
+
+    def get_window_signal_counts(self, row_offset: int, col_offset: int, offset_dimensions: Tuple) -> np.ndarray:
+        """
+        Returns positive signal counts of every row_offset x col_offset window, indexed by the top-left point.
+        Packed only patterns are counted band by band from the summed-area table of each band only.
+        """
+        if not self.is_packed_only():
+            return self._get_integral_window_counts(self.get_integral_pattern(), row_offset, col_offset,
+                                                    offset_dimensions)
+        row_num, col_num = offset_dimensions
+        column_num = self.get_dimensions()[1]
+        dtype = self._get_integral_dtype()
+        counts = np.empty((row_num, col_num), dtype=dtype)
+        for band_row_idx in range(0, row_num, self.INTEGRAL_ROW_BAND_SIZE):
+            band_row_num = min(self.INTEGRAL_ROW_BAND_SIZE, row_num - band_row_idx)
+            # windows of the band reach row_offset - 1 rows below it
+            band = self.get_sliced_pattern(Point(band_row_idx, 0), band_row_num + row_offset - 1, column_num)
+            band_signals = band.get_signal_pattern()
+            band_integral = np.zeros((band_signals.shape[0] + 1, column_num + 1), dtype=dtype)
+            band_integral[1:, 1:] = np.cumsum(np.cumsum(band_signals, axis=0, dtype=dtype), axis=1)
+            counts[band_row_idx:band_row_idx + band_row_num] = self._get_integral_window_counts(
+                band_integral, row_offset, col_offset, (band_row_num, col_num))
+        return counts
+
+    def get_block_signal_counts(self, block_size: int) -> np.ndarray:
+        """
+        Returns positive signal counts of the block_size x block_size blocks tiling the pattern,
+        the last blocks of rows and columns may be smaller. Computed once per block size.
+        """
+        if self._block_signal_counts is None:
+            self._block_signal_counts = {}
+        if block_size not in self._block_signal_counts:
+            row_num, column_num = self.get_dimensions()
+            col_indices = np.arange(0, column_num, block_size)
+            block_signal_counts = np.zeros((-(-row_num // block_size), len(col_indices)), dtype=np.int64)
+            # bands of whole blocks, packed only patterns are unpacked band by band
+            band_row_num = max(self.INTEGRAL_ROW_BAND_SIZE // block_size, 1) * block_size
+            for band_row_idx in range(0, row_num, band_row_num):
+                band = self.get_sliced_pattern(Point(band_row_idx, 0), band_row_num, column_num)
+                band_signals = band.get_signal_pattern()
+                row_indices = np.arange(0, band_signals.shape[0], block_size)
+                band_counts = np.add.reduceat(np.add.reduceat(band_signals, row_indices, axis=0, dtype=np.int64),
+                                              col_indices, axis=1)
+                block_row_idx = band_row_idx // block_size
+                block_signal_counts[block_row_idx:block_row_idx + len(band_counts)] = band_counts
+            self._block_signal_counts[block_size] = block_signal_counts
+        return self._block_signal_counts[block_size]
+
+    def is_packed_only(self) -> bool:
+        return self._pattern is None
 
     def get_dimensions(self) -> Tuple:
+        if self.is_packed_only():
+            return self._packed_pattern.shape[0], self._column_num
         return self._pattern.shape
 
     def get_area(self) -> int:
@@ -64,17 +203,107 @@ class RectanglePattern(Pattern):
         # TODO handle irrelevent inputs
         row_idx = point.row_index
         col_idx = point.column_index
+        if self.is_packed_only():
+            # unpack only the sliced rows
+            row_pattern = unpack_signals(self._packed_pattern[row_idx:row_idx + row_offset], self._column_num)
+            return self.__class__(row_pattern[:, col_idx:col_idx + col_offset])
         return self.__class__(self.get_pattern()[row_idx:row_idx + row_offset, col_idx:col_idx + col_offset])
 
 
 class Invader(RectanglePattern):
+    # variant v is the pattern mirrored left to right when v >= 4, then rotated clockwise by v % 4 quarter turns
+    VARIANT_NUM = 8
+
+    _covered_area = None
+    _variants = None
+
+    @classmethod
+    def from_compiled(cls, pattern: np.ndarray, packed_pattern: np.ndarray, covered_area):
+        """
+        Restores an invader compiled by library.InvaderLibrary without computing its derived data again
+        """
+        invader = cls(pattern)
+        if packed_pattern.shape != (pattern.shape[0], get_word_num(pattern.shape[1])):
+            raise Exception
+        invader._packed_pattern = packed_pattern.astype(WORD_DTYPE, copy=False)
+        invader._covered_area = covered_area
+        return invader
 
     def get_covered_area(self) -> int:
         """
         Returns sum of the positive signals within the pattern. The actual area in the 2D space.
         It is used to have a more accurate pattern matching.
         """
-        return np.sum(self.get_pattern())
+        if self._covered_area is None:
+            self._covered_area = np.sum(self.get_pattern())
+        return self._covered_area
+
+    def get_visible_covered_areas(self, row_indices: np.ndarray, col_indices: np.ndarray,
+                                  map_dimensions: Tuple) -> np.ndarray:
+        """
+        Returns the positive signals of the invader falling on the map, for every pair of the row and column indices
+        of its top-left point, which may be off the map. Four lookups per offset in the summed-area table.
+        """
+        row_num, column_num = self.get_dimensions()
+        map_row_num, map_col_num = map_dimensions
+        first_row_indices = np.clip(-row_indices, 0, row_num)[:, np.newaxis]
+        last_row_indices = np.clip(map_row_num - row_indices, 0, row_num)[:, np.newaxis]
+        first_col_indices = np.clip(-col_indices, 0, column_num)
+        last_col_indices = np.clip(map_col_num - col_indices, 0, column_num)
+        integral = self.get_integral_pattern()
+        return (integral[last_row_indices, last_col_indices] - integral[first_row_indices, last_col_indices]
+                - integral[last_row_indices, first_col_indices] + integral[first_row_indices, first_col_indices])
+
+    def get_variant(self, variant: int):
+        """
+        Returns the invader rotated and mirrored as the variant, created once per invader
+        """
+        if not 0 <= variant < self.VARIANT_NUM:
+            raise Exception
+        if variant == 0:
+            return self
+        if self._variants is None:
+            self._variants = {}
+        if variant not in self._variants:
+            pattern = self.get_pattern()
+            if variant >= 4:
+                pattern = np.fliplr(pattern)
+            self._variants[variant] = Invader(np.ascontiguousarray(np.rot90(pattern, -(variant % 4))))
+        return self._variants[variant]
+
+    def get_variants(self, variants: Iterable[int]) -> List[Tuple]:
+        """
+        Returns (variant, invader) of the variants, a variant identical to a previous one is left out,
+        so symmetric invaders are not scanned more than once
+        """
+        unique_variants = []
+        patterns = set()
+        for variant in variants:
+            invader = self.get_variant(variant)
+            pattern = invader.get_signal_pattern()
+            key = (pattern.shape, pattern.tobytes())
+            if key not in patterns:
+                patterns.add(key)
+                unique_variants.append((variant, invader))
+        return unique_variants
+
+    def get_block_signal_caps(self, block_size: int) -> np.ndarray:
+        """
+        Returns the most positive signals of the invader which can fall into each block of a block_size grid,
+        over every position of the invader within its first block
+        """
+        row_num, column_num = self.get_dimensions()
+        block_row_num, block_col_num = (row_num + block_size - 2) // block_size + 1, \
+            (column_num + block_size - 2) // block_size + 1
+        signal_caps = np.zeros((block_row_num, block_col_num), dtype=np.int64)
+        grid = np.zeros((block_row_num * block_size, block_col_num * block_size), dtype=np.int64)
+        for row_idx in range(block_size):
+            for col_idx in range(block_size):
+                grid[:] = 0
+                grid[row_idx:row_idx + row_num, col_idx:col_idx + column_num] = self.get_signal_pattern()
+                block_counts = grid.reshape(block_row_num, block_size, block_col_num, block_size).sum(axis=(1, 3))
+                np.maximum(signal_caps, block_counts, out=signal_caps)
+        return signal_caps
 
 
 class RadarMap(RectanglePattern):
@@ -87,43 +316,320 @@ class ScanResult:
     """
     point = None
     invader_index = None
+    score = None
+    variant = None
 
-    def __init__(self, point: Point, invader_index: int):
+    def __init__(self, point: Point, invader_index: int, score: float = None, variant: int = 0):
+        """
+        :param variant: rotation and mirroring of the invader which matched, see Invader.get_variant
+        """
         if not isinstance(point, Point) or not isinstance(invader_index, int):
             raise Exception
         self.point = point
         self.invader_index = invader_index
+        self.score = score
+        self.variant = variant
+
+
+class ScanResultStore:
+    """
+    Stores scan results in a structured np array growing in chunks, instead of a ScanResult object per detection.
+    Iterating or indexing still returns ScanResult objects, get_results returns the array itself.
+    """
+    DTYPE = np.dtype([('row_index', np.int64), ('column_index', np.int64), ('invader_index', np.int32),
+                      ('score', np.float32), ('variant', np.int8)])
+    CHUNK_SIZE = 1024
+
+    _results = None
+    _result_num = 0
+
+    def __init__(self):
+        self._results = np.empty(self.CHUNK_SIZE, dtype=self.DTYPE)
+        self._result_num = 0
+
+    def __len__(self) -> int:
+        return self._result_num
+
+    def __iter__(self) -> Iterator[ScanResult]:
+        for result in self.get_results():
+            yield self._to_scan_result(result)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._to_scan_result(result) for result in self.get_results()[index]]
+        return self._to_scan_result(self.get_results()[index])
+
+    @staticmethod
+    def _to_scan_result(result: np.void) -> ScanResult:
+        point = Point(int(result['row_index']), int(result['column_index']))
+        return ScanResult(point, int(result['invader_index']), float(result['score']), int(result['variant']))
+
+    def _reserve(self, result_num: int):
+        capacity = len(self._results)
+        if self._result_num + result_num <= capacity:
+            return
+        # grow at least by doubling, so appending one by one stays linear
+        required_capacity = max(self._result_num + result_num, 2 * capacity)
+        chunk_num = -(-required_capacity // self.CHUNK_SIZE)
+        results = np.empty(chunk_num * self.CHUNK_SIZE, dtype=self.DTYPE)
+        results[:self._result_num] = self.get_results()
+        self._results = results
+
+    def append(self, row_index: int, column_index: int, invader_index: int, score: float = np.nan):
+        self._reserve(1)
+        self._results[self._result_num] = (row_index, column_index, invader_index, score, 0)
+        self._result_num += 1
+
+    def extend(self, row_indices: np.ndarray, column_indices: np.ndarray, invader_indices, scores=np.nan,
+               variants=0):
+        """
+        Appends results in bulk, invader indices, scores and variants can be single values shared by all the results
+        """
+        result_num = len(row_indices)
+        self._reserve(result_num)
+        results = self._results[self._result_num:self._result_num + result_num]
+        results['row_index'] = row_indices
+        results['column_index'] = column_indices
+        results['invader_index'] = invader_indices
+        results['score'] = scores
+        results['variant'] = variants
+        self._result_num += result_num
+
+    def extend_results(self, results: np.ndarray):
+        self.extend(results['row_index'], results['column_index'], results['invader_index'], results['score'],
+                    results['variant'])
+
+    def get_results(self) -> np.ndarray:
+        return self._results[:self._result_num]
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[np.ndarray]:
+        results = self.get_results()
+        for result_idx in range(0, len(results), chunk_size):
+            yield results[result_idx:result_idx + chunk_size]
+
+    def filter_by_invader(self, invader_index: int) -> np.ndarray:
+        results = self.get_results()
+        return results[results['invader_index'] == invader_index]
+
+    def remove(self, mask: np.ndarray):
+        """
+        Removes the results where the mask of get_results is True
+        """
+        kept_results = self.get_results()[~mask]
+        self._results[:len(kept_results)] = kept_results
+        self._result_num = len(kept_results)
+
+    def sort(self, start_index: int = 0):
+        """
+        Sorts the results from start_index on by invader, row, column indices and variant, in place
+        """
+        results = self.get_results()[start_index:]
+        order = np.lexsort((results['variant'], results['column_index'], results['row_index'],
+                            results['invader_index']))
+        results[:] = results[order]
+
+    def clear(self):
+        self._result_num = 0
 
 
 class Radar:
     """
     Main controller to handle initialization, scanning and reporting.
     """
+    ENGINE_AUTO = 'auto'
+    ENGINE_LOOP = 'loop'
+    ENGINE_EXACT = 'exact'
+    ENGINE_DIRECT = DirectCorrelationEngine.name
+    ENGINE_FFT = FFTCorrelationEngine.name
+    ENGINE_BITPACKED = BitPackedCorrelationEngine.name
+    ENGINES = {
+        ENGINE_DIRECT: DirectCorrelationEngine,
+        ENGINE_FFT: FFTCorrelationEngine,
+        ENGINE_BITPACKED: BitPackedCorrelationEngine,
+    }
+    # below this ratio of remaining windows only the remaining windows are matched instead of the whole map
+    SPARSE_MATCHING_RATIO = 0.02
+    STREAM_BAND_ROW_NUM = 64
+    # matched area maps computed at once for a group of invaders are limited to this many bytes
+    GROUP_MAP_BYTE_NUM = 256 << 20
+    FRAME_BATCH_NUM = 16
+    VARIANTS_NONE = 'none'
+    VARIANTS_ROTATIONS = 'rotations'
+    VARIANTS_MIRRORS = 'mirrors'
+    VARIANTS_ALL = 'all'
+    # variants of each policy, see Invader.get_variant
+    VARIANT_POLICIES = {
+        VARIANTS_NONE: (0,),
+        VARIANTS_ROTATIONS: (0, 1, 2, 3),
+        VARIANTS_MIRRORS: (0, 4, 6),
+        VARIANTS_ALL: tuple(range(Invader.VARIANT_NUM)),
+    }
+
     accuracy = None
+    engine = None
+    prune = None
+    pyramid_block_size = None
+    invader_library_cache = None
+    variants = None
+    edge_visible_fraction = None
+    instrumentation = None
     radar_map = None
-    known_invaders = []
-    scan_results = []
+    known_invaders = None
+    scan_results = None
+    window_num = 0
+    pruned_window_num = 0
+    # offsets counted in window_num and pruned_window_num from the top-left, all of them by default
+    counted_offset_dimensions = None
+    _engine_instances = None
+    _score_maps = None
 
-    def __init__(self, accuracy: float):
-        if not isinstance(accuracy, float):
+    def __init__(self, accuracy: float, engine: str = ENGINE_AUTO, prune: bool = True,
+                 pyramid_block_size: int = None, invader_library_cache=None, variants: str = VARIANTS_NONE,
+                 edge_visible_fraction: float = None, hooks: List = None):
+        """
+        :param engine: 'loop' compares every map slice one by one and is kept as the reference implementation,
+            'auto' picks the cheapest of the other engines for each invader,
+            'exact' finds the map slices identical to an invader with accuracy 1.0, see exact.ExactMatcher,
+            the others score every offset of the map in one batched operation
+        :param prune: skips the windows which do not have enough positive signals to match before matching them,
+            not applied by the 'loop' engine
+        :param pyramid_block_size: prunes with a coarse-to-fine search on blocks of this size instead,
+            see get_pyramid_candidates, faster on large and mostly empty maps
+        :param invader_library_cache: known invaders read from files are compiled once and taken from this cache,
+            see library.InvaderLibraryCache
+        :param variants: also scans the rotated and mirrored invaders of the policy, results keep the index of the
+            known invader and tell which variant matched, see get_variant_invaders
+        :param edge_visible_fraction: also scans the invaders partially off the map whose positive signals on the map
+            are at least this fraction of their covered area, scored by the fraction of those signals matched.
+            Their results may have negative indices. Only invaders fully on the map are scanned by default.
+        :param hooks: stats.ScanHook objects receiving the time and memory of each phase and the scan of each invader.
+            Sub radars scanning bands, frames, variants or tiles do not report their invaders.
+        """
+        if not self.is_valid_accuracy(accuracy):
             raise Exception
-        if not (0 < accuracy < 1):
+        if engine not in (self.ENGINE_AUTO, self.ENGINE_LOOP, self.ENGINE_EXACT) and engine not in self.ENGINES:
             raise Exception
+        if engine == self.ENGINE_EXACT and accuracy != 1.0:
+            raise Exception('exact engine requires accuracy 1.0')
+        if pyramid_block_size is not None and (not isinstance(pyramid_block_size, int) or pyramid_block_size < 2):
+            raise Exception
+        if variants not in self.VARIANT_POLICIES:
+            raise Exception
+        if edge_visible_fraction is not None and not self.is_valid_accuracy(edge_visible_fraction):
+            raise Exception
+        if edge_visible_fraction is not None and engine == self.ENGINE_EXACT:
+            raise Exception('exact engine does not scan edges')
         self.accuracy = accuracy
+        self.engine = engine
+        self.prune = prune
+        self.pyramid_block_size = pyramid_block_size
+        self.invader_library_cache = invader_library_cache
+        self.variants = variants
+        self.edge_visible_fraction = edge_visible_fraction
+        self.instrumentation = Instrumentation(hooks)
+        self.known_invaders = []
+        self.scan_results = ScanResultStore()
+        self._reset_map_state()
+
+    @staticmethod
+    def is_valid_accuracy(accuracy: float) -> bool:
+        return isinstance(accuracy, float) and 0 < accuracy <= 1
+
+    def create_sub_radar(self):
+        """
+        Returns a radar with the same settings and known invaders, to scan a part of the map or another map
+        """
+        sub_radar = Radar(self.accuracy, engine=self.engine, prune=self.prune,
+                          pyramid_block_size=self.pyramid_block_size, variants=self.variants,
+                          edge_visible_fraction=self.edge_visible_fraction)
+        sub_radar.known_invaders = self.known_invaders
+        return sub_radar
+
+    def _reset_map_state(self):
+        # engines may keep map-side work such as transforms
+        self._engine_instances = {}
+        self._score_maps = {}
 
     def add_known_invader(self, invader_sample: np.ndarray):
         self.known_invaders.append(Invader(invader_sample))
 
+    def add_known_invaders(self, invader_samples: List[np.ndarray]):
+        """
+        Adds the invaders of the samples, taken from the invader library cache when the radar has one
+        """
+        with self.instrumentation.measure_phase('prepare_invaders'):
+            if self.invader_library_cache is None:
+                for invader_sample in invader_samples:
+                    self.add_known_invader(invader_sample)
+            else:
+                self.known_invaders.extend(self.invader_library_cache.get_library(invader_samples).invaders)
+
+    def get_variant_invaders(self) -> Tuple[List[Invader], np.ndarray, np.ndarray]:
+        """
+        Returns the invaders scanned for the variant policy with the index of their known invader and their variant.
+        Symmetric variants are left out, see Invader.get_variants.
+        """
+        invaders, invader_indices, variants = [], [], []
+        for invader_index, known_invader in enumerate(self.known_invaders):
+            for variant, invader in known_invader.get_variants(self.VARIANT_POLICIES[self.variants]):
+                invaders.append(invader)
+                invader_indices.append(invader_index)
+                variants.append(variant)
+        return invaders, np.array(invader_indices, dtype=np.int32), np.array(variants, dtype=np.int8)
+
     def set_radar_map(self, radar_map_sample: np.ndarray):
         self.radar_map = RadarMap(radar_map_sample)
+        self._reset_map_state()
+
+    def set_packed_radar_map(self, packed_radar_map_sample: np.ndarray, column_num: int):
+        """
+        Sets the radar map from packed rows without unpacking them, see RectanglePattern.from_packed
+        """
+        self.radar_map = RadarMap.from_packed(packed_radar_map_sample, column_num)
+        self._reset_map_state()
 
     def init_from_file(self, file_path: str):
-        handler = InputFileHandler(file_path)
+        if BinaryFileHandler.is_binary_file(file_path):
+            self.init_from_binary_file(file_path)
+            return
+
+        with self.instrumentation.measure_phase('init'):
+            handler = InputFileHandler(file_path, self.instrumentation)
+            self.add_known_invaders(handler.get_known_invader_samples())
+
+            self.set_radar_map(handler.get_radar_sample())
+
+    def init_from_binary_file(self, file_path: str):
+        """
+        Memory maps the packed radar sample, so only the pages touched while scanning are read
+        """
+        with self.instrumentation.measure_phase('init'):
+            handler = BinaryInputFileHandler(file_path, self.instrumentation)
+            self.add_known_invaders(handler.get_known_invader_samples())
 
-        for invader_sample in handler.get_known_invader_samples():
-            self.add_known_invader(invader_sample)
+            self.set_packed_radar_map(*handler.get_packed_radar_sample())
 
-        self.set_radar_map(handler.get_radar_sample())
+    def init_known_invaders_from_file(self, file_path: str):
+        """
+        Adds the known invaders of the file only, its radar sample is not read
+        """
+        with self.instrumentation.measure_phase('init'):
+            if BinaryFileHandler.is_binary_file(file_path):
+                handler = BinaryInputFileHandler(file_path, self.instrumentation)
+            else:
+                handler = StreamInputFileHandler(file_path)
+            self.add_known_invaders(handler.get_known_invader_samples())
+
+    def init_radar_map_from_file(self, file_path: str):
+        """
+        Sets the radar map from the radar sample of the file only, its known invaders are ignored
+        """
+        with self.instrumentation.measure_phase('init'):
+            if BinaryFileHandler.is_binary_file(file_path):
+                self.set_packed_radar_map(*BinaryInputFileHandler(file_path, self.instrumentation)
+                                          .get_packed_radar_sample())
+            else:
+                self.set_radar_map(InputFileHandler(file_path, self.instrumentation).get_radar_sample())
 
     def get_match_probability(self, invader: Invader, map_slice: RectanglePattern) -> float:
         """
@@ -141,53 +647,828 @@ class Radar:
         probability = self.get_match_probability(invader, map_slice)
         return probability >= self.accuracy
 
-    def add_scan_result(self, point: Point, invader_index: int):
-        self.scan_results.append(ScanResult(point, invader_index))
+    def add_scan_result(self, point: Point, invader_index: int, score: float = np.nan):
+        if not isinstance(point, Point) or not isinstance(invader_index, int):
+            raise Exception
+        self.scan_results.append(point.row_index, point.column_index, invader_index, score)
+
+    def get_offset_dimensions(self, invader: Invader) -> Tuple:
+        """
+        Returns the number of row and column offsets the invader is compared on, as the top-left point of invader area
+        """
+        map_row_num, map_col_num = self.radar_map.get_dimensions()
+        invader_row_num, invader_col_num = invader.get_dimensions()
+        # offsets where the invader is fully on the map, including the last row and column
+        return max(map_row_num - invader_row_num + 1, 0), max(map_col_num - invader_col_num + 1, 0)
+
+    def get_counted_offset_dimensions(self, offset_dimensions: Tuple) -> Tuple:
+        """
+        Returns the number of row and column offsets counted in window_num, see counted_offset_dimensions
+        """
+        if self.counted_offset_dimensions is None:
+            return offset_dimensions
+        return tuple(min(length, counted_length)
+                     for length, counted_length in zip(offset_dimensions, self.counted_offset_dimensions))
+
+    def get_matches(self, invader: Invader, matched_area_map: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of is_match for every offset of the matched area map
+        """
+        return self.get_scores(invader, matched_area_map) >= self.accuracy
+
+    def _get_engine_instance(self, engine_name: str):
+        if engine_name not in self._engine_instances:
+            self._engine_instances[engine_name] = self.ENGINES[engine_name]()
+        return self._engine_instances[engine_name]
+
+    def get_engine(self, invader: Invader, offset_dimensions: Tuple):
+        """
+        Returns the engine chosen on init, or the one with the lowest estimated cost for the invader otherwise
+        """
+        return self.get_group_engine([invader], offset_dimensions)
+
+    def get_group_engine(self, invaders: List[Invader], offset_dimensions: Tuple):
+        """
+        Returns the engine chosen on init, or the one with the lowest estimated cost for matching the invaders
+        of the same dimensions together otherwise
+        """
+        if self.engine in self.ENGINES:
+            return self._get_engine_instance(self.engine)
+        engines = [self._get_engine_instance(engine_name) for engine_name in self.ENGINES]
+        if self.radar_map.is_packed_only():
+            # avoid unpacking the whole map
+            engines = [engine for engine in engines if engine.supports_packed]
+        return min(engines, key=lambda engine: engine.estimate_group_cost(self.radar_map, invaders, offset_dimensions))
+
+    def get_invader_groups(self, invader_indices: Iterable[int] = None) -> List[List[int]]:
+        """
+        Groups the invader indices by the dimensions of the invaders, all of them by default.
+        Invaders of a group share the offsets, the window signal counts and the map-side work of the engines.
+        """
+        if invader_indices is None:
+            invader_indices = range(len(self.known_invaders))
+        groups = {}
+        for invader_index in invader_indices:
+            groups.setdefault(self.known_invaders[invader_index].get_dimensions(), []).append(invader_index)
+        return list(groups.values())
+
+    def _iter_matched_area_maps(self, invader_indices: List[int], offset_dimensions: Tuple) -> Iterator[Tuple]:
+        """
+        Yields the invader index and the matched area map of invaders of the same dimensions,
+        computed together in batches bounded by GROUP_MAP_BYTE_NUM
+        """
+        row_num, col_num = offset_dimensions
+        batch_size = max(1, self.GROUP_MAP_BYTE_NUM // max(row_num * col_num * np.dtype(np.int32).itemsize, 1))
+        for batch_idx in range(0, len(invader_indices), batch_size):
+            batch_invader_indices = invader_indices[batch_idx:batch_idx + batch_size]
+            invaders = [self.known_invaders[invader_index] for invader_index in batch_invader_indices]
+            engine = self.get_group_engine(invaders, offset_dimensions)
+            matched_area_maps = engine.get_matched_area_maps(self.radar_map, invaders, offset_dimensions)
+            yield from zip(batch_invader_indices, matched_area_maps)
 
     def scan_for_invader(self, invader_index: int):
+        self.scan_for_invaders([invader_index])
+
+    def scan_for_invaders(self, invader_indices: List[int]):
+        """
+        Scans the invaders of the same dimensions together, see get_invader_groups.
+        Results are added in the order of the given invader indices.
+        The 'exact' engine scans invaders of any dimensions together.
+        """
+        if self.engine == self.ENGINE_LOOP:
+            for invader_index in invader_indices:
+                start_time = time.perf_counter()
+                result_num = len(self.scan_results)
+                self._scan_for_invader_with_loop(invader_index)
+                self._report_invader_scans([invader_index], start_time, result_num)
+            return
+        start_time = time.perf_counter()
+        result_num = len(self.scan_results)
+        if self.engine == self.ENGINE_EXACT:
+            self._scan_for_invaders_exactly(invader_indices)
+            self._report_invader_scans(invader_indices, start_time, result_num)
+            return
+
+        offset_dimensions = self.get_offset_dimensions(self.known_invaders[invader_indices[0]])
+        invader_candidates = {}
+        invader_matches = {}
+        evaluated_window_nums = {}
+        if self.prune:
+            if not self.pyramid_block_size:
+                invader_row_num, invader_col_num = self.known_invaders[invader_indices[0]].get_dimensions()
+                signal_counts = self.radar_map.get_window_signal_counts(invader_row_num, invader_col_num,
+                                                                        offset_dimensions)
+            for invader_index in invader_indices:
+                invader = self.known_invaders[invader_index]
+                if self.pyramid_block_size:
+                    row_indices, col_indices = self.get_pyramid_candidates(invader, offset_dimensions)
+                    candidate_num = len(row_indices)
+                else:
+                    candidates = self.get_candidates(invader, offset_dimensions, signal_counts)
+                    candidate_num = np.count_nonzero(candidates)
+                evaluated_window_nums[invader_index] = candidate_num
+
+                if candidate_num > self.SPARSE_MATCHING_RATIO * np.prod(offset_dimensions):
+                    if self.pyramid_block_size:
+                        candidates = np.zeros(offset_dimensions, dtype=bool)
+                        candidates[row_indices, col_indices] = True
+                    invader_candidates[invader_index] = candidates
+                else:
+                    if not self.pyramid_block_size:
+                        row_indices, col_indices = np.nonzero(candidates)
+                    engine = self.get_engine(invader, offset_dimensions)
+                    invader_matches[invader_index] = self._get_matched_sparse_candidates(engine, invader,
+                                                                                         row_indices, col_indices)
+        else:
+            invader_candidates = dict.fromkeys(invader_indices)
+
+        for invader_index, matched_area_map in self._iter_matched_area_maps(list(invader_candidates),
+                                                                            offset_dimensions):
+            matches = self.get_matches(self.known_invaders[invader_index], matched_area_map)
+            if invader_candidates[invader_index] is not None:
+                matches &= invader_candidates[invader_index]
+            row_indices, col_indices = np.nonzero(matches)
+            invader_matches[invader_index] = row_indices, col_indices, matched_area_map[row_indices, col_indices]
+
+        for invader_index in invader_indices:
+            row_indices, col_indices, matched_areas = invader_matches[invader_index]
+            scores = self.get_scores(self.known_invaders[invader_index], matched_areas)
+            self.add_scan_results(row_indices, col_indices, invader_index, scores)
+        self._report_invader_scans(invader_indices, start_time, result_num, evaluated_window_nums)
+
+    def _report_invader_scans(self, invader_indices: List[int], start_time: float, result_num: int,
+                              evaluated_window_nums: dict = None):
+        """
+        Reports the scans of the invaders since the start time to the hooks, see stats.ScanHook.on_invader_scan
+
+        :param result_num: number of results before the scans
+        :param evaluated_window_nums: windows left by pruning for each invader, all of them by default
+        """
+        if not self.instrumentation:
+            return
+        seconds = (time.perf_counter() - start_time) / len(invader_indices)
+        match_nums = np.bincount(self.scan_results.get_results()[result_num:]['invader_index'],
+                                 minlength=len(self.known_invaders))
+        for invader_index in invader_indices:
+            window_num = int(np.prod(self.get_offset_dimensions(self.known_invaders[invader_index])))
+            evaluated_window_num = (evaluated_window_nums or {}).get(invader_index, window_num)
+            self.instrumentation.report_invader_scan(invader_index, seconds, window_num, int(evaluated_window_num),
+                                                     int(match_nums[invader_index]))
+
+    def _scan_for_invaders_exactly(self, invader_indices: List[int]):
+        invaders = [self.known_invaders[invader_index] for invader_index in invader_indices]
+        row_indices, col_indices, invader_positions = ExactMatcher().find_matches(self.radar_map, invaders)
+        for invader_position, invader_index in enumerate(invader_indices):
+            offset_row_num, offset_col_num = self.get_offset_dimensions(invaders[invader_position])
+            is_invader_match = (invader_positions == invader_position) & (row_indices < offset_row_num) \
+                & (col_indices < offset_col_num)
+            counted_row_num, counted_col_num = self.get_counted_offset_dimensions((offset_row_num, offset_col_num))
+            self.window_num += counted_row_num * counted_col_num
+            self.add_scan_results(row_indices[is_invader_match], col_indices[is_invader_match], invader_index, 1.0)
+
+    def add_scan_results(self, row_indices: np.ndarray, col_indices: np.ndarray, invader_index: int,
+                         scores: np.ndarray):
+        self.scan_results.extend(row_indices, col_indices, invader_index, scores)
+
+    def get_scores(self, invader: Invader, matched_areas: np.ndarray) -> np.ndarray:
+        """
+        Vectorized version of get_match_probability for the matched areas
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return matched_areas / invader.get_covered_area()
+
+    def get_candidates(self, invader: Invader, offset_dimensions: Tuple,
+                       signal_counts: np.ndarray = None) -> np.ndarray:
+        """
+        Returns False for the offsets whose window has too few positive signals to match the invader.
+        Window counts come from the summed-area table of the map, built once and shared by all invaders.
+
+        :param signal_counts: window signal counts of the invader dimensions, when already computed for its group
+        """
+        if signal_counts is None:
+            invader_row_num, invader_col_num = invader.get_dimensions()
+            signal_counts = self.radar_map.get_window_signal_counts(invader_row_num, invader_col_num,
+                                                                    offset_dimensions)
+        candidates = self.get_matches(invader, signal_counts)
+        counted_row_num, counted_col_num = self.get_counted_offset_dimensions(candidates.shape)
+        self.window_num += counted_row_num * counted_col_num
+        self.pruned_window_num += counted_row_num * counted_col_num \
+            - np.count_nonzero(candidates[:counted_row_num, :counted_col_num])
+        return candidates
+
+    def get_pyramid_candidates(self, invader: Invader, offset_dimensions: Tuple) -> Tuple:
+        """
+        Coarse step of the pyramid search, returns the row and column indices of the offsets which may match the
+        invader, in row-major order.
+        Map and invader are downsampled by counting the signals of pyramid_block_size blocks.
+        For all the offsets starting in a block of the map, matched area is at most the sum of the map block counts
+        capped by the invader signals which can fall into each block, so comparing that bound with the accuracy
+        never loses a match. Only the remaining offsets are matched at full resolution.
+        """
+        block_size = self.pyramid_block_size
+        row_num, col_num = offset_dimensions
+        offset_block_row_num, offset_block_col_num = -(-row_num // block_size), -(-col_num // block_size)
+        signal_caps = invader.get_block_signal_caps(block_size)
+        cap_row_num, cap_col_num = signal_caps.shape
+
+        block_signal_counts = np.zeros((offset_block_row_num + cap_row_num - 1, offset_block_col_num + cap_col_num - 1),
+                                       dtype=np.int64)
+        map_block_signal_counts = self.radar_map.get_block_signal_counts(block_size)
+        kept_row_num = min(map_block_signal_counts.shape[0], block_signal_counts.shape[0])
+        kept_col_num = min(map_block_signal_counts.shape[1], block_signal_counts.shape[1])
+        block_signal_counts[:kept_row_num, :kept_col_num] = map_block_signal_counts[:kept_row_num, :kept_col_num]
+        matched_area_bounds = np.zeros((offset_block_row_num, offset_block_col_num), dtype=np.int64)
+        for row_idx in range(cap_row_num):
+            for col_idx in range(cap_col_num):
+                matched_area_bounds += np.minimum(
+                    block_signal_counts[row_idx:row_idx + offset_block_row_num,
+                                        col_idx:col_idx + offset_block_col_num], signal_caps[row_idx, col_idx])
+
+        block_row_indices, block_col_indices = np.nonzero(self.get_matches(invader, matched_area_bounds))
+        block_offsets = np.arange(block_size)
+        row_indices, col_indices = np.broadcast_arrays(
+            block_row_indices[:, np.newaxis, np.newaxis] * block_size + block_offsets[:, np.newaxis],
+            block_col_indices[:, np.newaxis, np.newaxis] * block_size + block_offsets)
+        row_indices, col_indices = row_indices.ravel(), col_indices.ravel()
+        is_offset = (row_indices < row_num) & (col_indices < col_num)
+        row_indices, col_indices = row_indices[is_offset], col_indices[is_offset]
+        order = np.lexsort((col_indices, row_indices))
+        counted_row_num, counted_col_num = self.get_counted_offset_dimensions(offset_dimensions)
+        self.window_num += counted_row_num * counted_col_num
+        self.pruned_window_num += counted_row_num * counted_col_num \
+            - np.count_nonzero((row_indices < counted_row_num) & (col_indices < counted_col_num))
+        return row_indices[order], col_indices[order]
+
+    def get_pruned_ratio(self) -> float:
+        """
+        Returns the ratio of the windows skipped by pruning in the last scan
+        """
+        return self.pruned_window_num / self.window_num if self.window_num else 0.0
+
+    def _get_matched_sparse_candidates(self, engine, invader: Invader, row_indices: np.ndarray,
+                                       col_indices: np.ndarray) -> Tuple:
+        """
+        Returns the indices and the matched areas of the candidates which match, matching only the candidates
+        """
+        matched_areas = engine.get_matched_areas_at(self.radar_map, invader, row_indices, col_indices)
+        matches = self.get_matches(invader, matched_areas)
+        return row_indices[matches], col_indices[matches], matched_areas[matches]
+
+    def _scan_for_invader_with_loop(self, invader_index: int):
         invader = self.known_invaders[invader_index]
 
-        map_row_num, map_col_num = self.radar_map.get_dimensions()
         invader_row_num, invader_col_num = invader.get_dimensions()
+        offset_row_num, offset_col_num = self.get_offset_dimensions(invader)
 
         # TODO come up with a better way instead of traversing the whole map
-        """
-            TODO what about edges?
-            Option 1: User padding (more efficient, less accurate)
-            1- Add padding to edges with zeros (maximum biggest invader's half size)
-            2- Decrease the accuracy while processing edges
-            3- Create the printable map as usual
-            3- Slice the actual portion while exporting to file
-            Option 2: Extra steps on edges (more accurate, more work)
-            1- Create smaller portions of given invaders (minimum quarter size)
-            2- Check with smaller invaders on edges with the same accuracy 
-        """
-        for row_idx in range(map_row_num - invader_row_num):
-            for col_idx in range(map_col_num - invader_col_num):
-                # exclude invader's sizes
+        # edges are scanned by scan_edges_for_invaders, see edge_visible_fraction
+        for row_idx in range(offset_row_num):
+            for col_idx in range(offset_col_num):
                 point = Point(row_idx, col_idx)  # utilizes the top-left point of invader area not center
                 map_slice = self.radar_map.get_sliced_pattern(point, invader_row_num, invader_col_num)
                 if self.is_match(invader, map_slice):
-                    self.add_scan_result(point, invader_index)
+                    self.add_scan_result(point, invader_index, self.get_match_probability(invader, map_slice))
+
+    def get_score_map(self, invader_index: int) -> np.ndarray:
+        """
+        Returns the match probability of the invader at every offset as float32, computed once per radar map.
+        Unlike scan, it does not depend on the accuracy, so any accuracy can be queried from it without a rescan.
+        """
+        if invader_index not in self._score_maps:
+            self._compute_score_maps([invader_index])
+        return self._score_maps[invader_index]
 
-    def scan(self):
-        for invader_index in range(len(self.known_invaders)):
-            self.scan_for_invader(invader_index)
+    def _compute_score_maps(self, invader_indices: Iterable[int]):
+        """
+        Computes the missing score maps of the invaders, group by group
+        """
+        if self.variants != self.VARIANTS_NONE:
+            raise Exception('score maps do not support variants')
+        missing_invader_indices = [invader_index for invader_index in invader_indices
+                                   if invader_index not in self._score_maps]
+        for group in self.get_invader_groups(missing_invader_indices):
+            offset_dimensions = self.get_offset_dimensions(self.known_invaders[group[0]])
+            for invader_index, matched_area_map in self._iter_matched_area_maps(group, offset_dimensions):
+                scores = self.get_scores(self.known_invaders[invader_index], matched_area_map)
+                self._score_maps[invader_index] = scores.astype(np.float32)
 
-    def get_cleaned_map(self) -> np.ndarray:
+    def _scan_for_invaders_with_score_maps(self, invader_indices: List[int]) -> dict:
+        """
+        Scans the invaders of the same dimensions without pruning and returns their score maps, each matched area
+        map gives both the results and the score map of its invader
+        """
+        score_maps = {}
+        offset_dimensions = self.get_offset_dimensions(self.known_invaders[invader_indices[0]])
+        for invader_index, matched_area_map in self._iter_matched_area_maps(invader_indices, offset_dimensions):
+            invader = self.known_invaders[invader_index]
+            row_indices, col_indices = np.nonzero(self.get_matches(invader, matched_area_map))
+            scores = self.get_scores(invader, matched_area_map)
+            self.add_scan_results(row_indices, col_indices, invader_index, scores[row_indices, col_indices])
+            score_maps[invader_index] = scores.astype(np.float32)
+        return score_maps
+
+    def _get_queried_invader_indices(self, invader_index: int = None) -> range:
+        if invader_index is None:
+            invader_indices = range(len(self.known_invaders))
+        else:
+            invader_indices = range(invader_index, invader_index + 1)
+        self._compute_score_maps(invader_indices)
+        return invader_indices
+
+    def query(self, accuracy: float = None, invader_index: int = None) -> ScanResultStore:
+        """
+        Returns the results scan would find with the given accuracy, up to float32 precision, from the score maps
+
+        :param accuracy: accuracy of the radar by default
+        :param invader_index: all invaders by default
+        """
+        accuracy = self.accuracy if accuracy is None else accuracy
+        if not self.is_valid_accuracy(accuracy):
+            raise Exception
+        results = ScanResultStore()
+        for queried_invader_index in self._get_queried_invader_indices(invader_index):
+            score_map = self.get_score_map(queried_invader_index)
+            row_indices, col_indices = np.nonzero(score_map >= np.float32(accuracy))
+            results.extend(row_indices, col_indices, queried_invader_index, score_map[row_indices, col_indices])
+        return results
+
+    def query_top(self, result_num: int, invader_index: int = None) -> ScanResultStore:
+        """
+        Returns the result_num offsets with the highest scores, highest first
+        """
+        if not isinstance(result_num, int) or result_num < 1:
+            raise Exception
+        candidates = ScanResultStore()
+        for queried_invader_index in self._get_queried_invader_indices(invader_index):
+            scores = self.get_score_map(queried_invader_index).ravel()
+            indices = np.argpartition(-scores, result_num - 1)[:result_num] if result_num < len(scores) \
+                else np.arange(len(scores))
+            row_indices, col_indices = np.unravel_index(indices, self.get_score_map(queried_invader_index).shape)
+            candidates.extend(row_indices, col_indices, queried_invader_index, scores[indices])
+        candidate_results = candidates.get_results()
+        # stable sort keeps invader, row and column order between equal scores
+        order = np.argsort(-candidate_results['score'], kind='stable')[:result_num]
+        results = ScanResultStore()
+        results.extend_results(candidate_results[order])
+        return results
+
+    def query_best_per_region(self, region_dimensions: Tuple, accuracy: float = None,
+                              invader_index: int = None) -> ScanResultStore:
+        """
+        Splits the offsets into regions of the given dimensions and returns the best offset of each region for each
+        invader, if it matches with the given accuracy
+        """
+        accuracy = self.accuracy if accuracy is None else accuracy
+        if not self.is_valid_accuracy(accuracy):
+            raise Exception
+        region_row_num, region_col_num = region_dimensions
+        results = ScanResultStore()
+        for queried_invader_index in self._get_queried_invader_indices(invader_index):
+            score_map = self.get_score_map(queried_invader_index)
+            row_num, col_num = score_map.shape
+            region_row_count, region_col_count = -(-row_num // region_row_num), -(-col_num // region_col_num)
+            padded_score_map = np.full((region_row_count * region_row_num, region_col_count * region_col_num),
+                                       -np.inf, dtype=np.float32)
+            padded_score_map[:row_num, :col_num] = score_map
+            regions = padded_score_map.reshape(region_row_count, region_row_num, region_col_count, region_col_num)
+            regions = regions.transpose(0, 2, 1, 3).reshape(region_row_count, region_col_count, -1)
+            best_indices = np.argmax(regions, axis=2)
+            best_scores = np.take_along_axis(regions, best_indices[..., np.newaxis], axis=2)[..., 0]
+            region_row_indices, region_col_indices = np.nonzero(best_scores >= np.float32(accuracy))
+            best_indices = best_indices[region_row_indices, region_col_indices]
+            row_indices = region_row_indices * region_row_num + best_indices // region_col_num
+            col_indices = region_col_indices * region_col_num + best_indices % region_col_num
+            results.extend(row_indices, col_indices, queried_invader_index,
+                           best_scores[region_row_indices, region_col_indices])
+        return results
+
+    def scan(self, worker_num: int = 1):
+        """
+        :param worker_num: number of processes scanning tiles of the map in parallel, see parallel.ParallelScanner
+        """
+        self.window_num = 0
+        self.pruned_window_num = 0
+        if self.variants != self.VARIANTS_NONE:
+            with self.instrumentation.measure_phase('scan'):
+                self._scan_variants(worker_num)
+            return
+        with self.instrumentation.measure_phase('scan'):
+            result_num = len(self.scan_results)
+            if worker_num > 1:
+                from ascii_pattern_matcher.parallel import ParallelScanner  # parallel module depends on this one
+                ParallelScanner(self, worker_num).scan()
+            else:
+                # exact engine matches all invaders in one pass
+                groups = [list(range(len(self.known_invaders)))] if self.engine == self.ENGINE_EXACT \
+                    else self.get_invader_groups()
+                for group in groups:
+                    self.scan_for_invaders(group)
+            if self.edge_visible_fraction is not None:
+                with self.instrumentation.measure_phase('scan_edges'):
+                    for group in self.get_invader_groups():
+                        self.scan_edges_for_invaders(group)
+            # same order as scanning the invaders one by one
+            self.scan_results.sort(result_num)
+
+    def get_edge_regions(self, invader: Invader) -> List[Tuple]:
+        """
+        Returns the regions of the offsets where the invader is partially off the map, as
+        (row_index, column_index, row_num, column_num) of the top-left points: strips along the four borders,
+        as deep as the invader minus one, or all offsets when the invader does not fit in the map
+        """
+        invader_row_num, invader_col_num = invader.get_dimensions()
+        offset_row_num, offset_col_num = self.get_offset_dimensions(invader)
         map_row_num, map_col_num = self.radar_map.get_dimensions()
-        result_map = np.zeros((map_row_num, map_col_num))
-        for scan_result in self.scan_results:
-            invader = self.known_invaders[scan_result.invader_index]
-            row_idx, col_idx = scan_result.point.row_index, scan_result.point.column_index
-            invader_row_num, invader_col_num = invader.get_dimensions()
-            result_map[row_idx:row_idx + invader_row_num, col_idx:col_idx + invader_col_num] = invader.get_pattern()
-        return result_map
+        all_col_num = map_col_num + invader_col_num - 1
+        if not offset_row_num or not offset_col_num:
+            return [(1 - invader_row_num, 1 - invader_col_num, map_row_num + invader_row_num - 1, all_col_num)]
+        edge_regions = [(1 - invader_row_num, 1 - invader_col_num, invader_row_num - 1, all_col_num),
+                        (offset_row_num, 1 - invader_col_num, invader_row_num - 1, all_col_num),
+                        (0, 1 - invader_col_num, offset_row_num, invader_col_num - 1),
+                        (0, offset_col_num, offset_row_num, invader_col_num - 1)]
+        return [edge_region for edge_region in edge_regions if edge_region[2] > 0 and edge_region[3] > 0]
+
+    def get_padded_slice(self, row_idx: int, col_idx: int, row_num: int, col_num: int) -> np.ndarray:
+        """
+        Returns the signals of a region of the map which may reach off the map, negative off the map
+        """
+        map_row_num, map_col_num = self.radar_map.get_dimensions()
+        padded_slice = np.zeros((row_num, col_num), dtype=np.uint8)
+        first_row_idx, first_col_idx = max(row_idx, 0), max(col_idx, 0)
+        last_row_idx, last_col_idx = min(row_idx + row_num, map_row_num), min(col_idx + col_num, map_col_num)
+        if first_row_idx < last_row_idx and first_col_idx < last_col_idx:
+            map_slice = self.radar_map.get_sliced_pattern(Point(first_row_idx, first_col_idx),
+                                                          last_row_idx - first_row_idx, last_col_idx - first_col_idx)
+            padded_slice[first_row_idx - row_idx:last_row_idx - row_idx,
+                         first_col_idx - col_idx:last_col_idx - col_idx] = map_slice.get_signal_pattern()
+        return padded_slice
+
+    def scan_edges_for_invaders(self, invader_indices: List[int]):
+        """
+        Scans the invaders of the same dimensions on the offsets where they are partially off the map,
+        see edge_visible_fraction. Each edge region is scored in one batched pass on the slice of the map it covers,
+        padded with negative signals off the map, and divided by the visible covered areas of the offsets.
+        """
+        invader_row_num, invader_col_num = self.known_invaders[invader_indices[0]].get_dimensions()
+        map_dimensions = self.radar_map.get_dimensions()
+        for row_idx, col_idx, row_num, col_num in self.get_edge_regions(self.known_invaders[invader_indices[0]]):
+            edge_radar = self.create_sub_radar()
+            # the slice has exactly the offsets of the region
+            edge_radar.set_radar_map(self.get_padded_slice(row_idx, col_idx, row_num + invader_row_num - 1,
+                                                           col_num + invader_col_num - 1))
+            row_indices, col_indices = np.arange(row_idx, row_idx + row_num), np.arange(col_idx, col_idx + col_num)
+            self.window_num += row_num * col_num
+            for invader_index, matched_area_map in edge_radar._iter_matched_area_maps(invader_indices,
+                                                                                      (row_num, col_num)):
+                invader = self.known_invaders[invader_index]
+                visible_covered_areas = invader.get_visible_covered_areas(row_indices, col_indices, map_dimensions)
+                is_visible = visible_covered_areas >= self.edge_visible_fraction * invader.get_covered_area()
+                # offsets without visible signals never match, their scores are zero
+                scores = matched_area_map / np.maximum(visible_covered_areas, 1)
+                match_row_indices, match_col_indices = np.nonzero(is_visible & (scores >= self.accuracy))
+                self.add_scan_results(match_row_indices + row_idx, match_col_indices + col_idx, invader_index,
+                                      scores[match_row_indices, match_col_indices])
+
+    def _scan_variants(self, worker_num: int):
+        """
+        Scans the variants as invaders of their own, so variants of the same dimensions are matched as one group
+        and share the map-side work of the engines, then maps the results back to the known invaders
+        """
+        invaders, invader_indices, variants = self.get_variant_invaders()
+        variant_radar = self.create_sub_radar()
+        variant_radar.variants = self.VARIANTS_NONE
+        variant_radar.known_invaders = invaders
+        variant_radar.radar_map = self.radar_map
+        variant_radar.counted_offset_dimensions = self.counted_offset_dimensions
+        variant_radar.scan(worker_num)
+        self.window_num += variant_radar.window_num
+        self.pruned_window_num += variant_radar.pruned_window_num
+
+        results = variant_radar.scan_results.get_results()
+        results['variant'] = variants[results['invader_index']]
+        results['invader_index'] = invader_indices[results['invader_index']]
+        result_num = len(self.scan_results)
+        self.scan_results.extend_results(results)
+        self.scan_results.sort(result_num)
+
+    def scan_stream(self, file_path: str, band_row_num: int = STREAM_BAND_ROW_NUM) -> Iterator[ScanResult]:
+        """
+        Scans the radar sample of the file while reading it line by line, known invaders of the file are added first.
+        Radar map is not set, so the memory is bounded by the map width times the band and the tallest invader.
+        """
+        handler = StreamInputFileHandler(file_path)
+        self.add_known_invaders(handler.get_known_invader_samples())
+        yield from self.scan_rows(handler.iter_radar_rows(), band_row_num)
+
+    def scan_rows(self, rows: Iterable[np.ndarray], band_row_num: int = STREAM_BAND_ROW_NUM) -> Iterator[ScanResult]:
+        """
+        Scans radar map rows while keeping only a band of rows and the rows of the tallest invader below it.
+        Yields the results of each band as soon as the band is complete, they are added to scan_results as well.
+        """
+        result_num = len(self.scan_results)
+        for _ in self.scan_row_bands(rows, band_row_num):
+            yield from self.scan_results[result_num:]
+            result_num = len(self.scan_results)
+
+    def scan_row_bands(self, rows: Iterable[np.ndarray],
+                       band_row_num: int = STREAM_BAND_ROW_NUM) -> Iterator[np.ndarray]:
+        """
+        Same as scan_rows, but yields the results of each band together in a structured array
+        """
+        if self.edge_visible_fraction is not None:
+            raise Exception('streamed scans do not support edges')
+        self.window_num = 0
+        self.pruned_window_num = 0
+        max_invader_row_num = max((invader.get_dimensions()[0] for invader in self.get_variant_invaders()[0]),
+                                  default=0)
+        buffered_rows = []
+        band_row_idx = 0
+        for row in rows:
+            buffered_rows.append(row)
+            if len(buffered_rows) == band_row_num + max_invader_row_num:
+                yield self._scan_band(buffered_rows, band_row_idx, band_row_num)
+                buffered_rows = buffered_rows[band_row_num:]
+                band_row_idx += band_row_num
+        if buffered_rows:
+            yield self._scan_band(buffered_rows, band_row_idx, len(buffered_rows))
+
+    def _scan_band(self, rows: list, band_row_idx: int, band_row_num: int) -> np.ndarray:
+        band_radar = self.create_sub_radar()
+        band_radar.set_radar_map(np.array(rows, dtype=np.uint8))
+        band_radar.scan()
+        self.window_num += band_radar.window_num
+        self.pruned_window_num += band_radar.pruned_window_num
+
+        results = band_radar.scan_results.get_results()
+        # offsets below the band are scanned again with the next band
+        results = results[results['row_index'] < band_row_num]
+        results['row_index'] += band_row_idx
+        self.scan_results.extend_results(results)
+        return results
+
+    def scan_frames(self, frames: Iterable[np.ndarray],
+                    batch_frame_num: int = FRAME_BATCH_NUM) -> Iterator[ScanResultStore]:
+        """
+        Scans a sequence of radar frames of the same dimensions and yields the results of each frame in order.
+        Frames can be a 3D array or any iterable of 2D arrays, such as a generator reading them one by one.
+        Frames of a batch are stacked into one map and scanned together, so every invader group is matched once
+        per batch instead of once per frame. Radar map and scan results of the radar are not changed.
+        """
+        if not isinstance(batch_frame_num, int) or batch_frame_num < 1:
+            raise Exception
+        if self.edge_visible_fraction is not None:
+            raise Exception('frame scans do not support edges')
+        self.window_num = 0
+        self.pruned_window_num = 0
+        batch_frames = []
+        for frame in frames:
+            batch_frames.append(frame)
+            if len(batch_frames) == batch_frame_num:
+                yield from self._scan_frame_batch(batch_frames)
+                batch_frames = []
+        if batch_frames:
+            yield from self._scan_frame_batch(batch_frames)
+
+    def scan_frame_files(self, file_paths: Iterable[str],
+                         batch_frame_num: int = FRAME_BATCH_NUM) -> Iterator[ScanResultStore]:
+        """
+        Scans the radar samples of the files as frames, see scan_frames. Known invaders of the files are ignored.
+        """
+        yield from self.scan_frames((self.read_radar_sample(file_path) for file_path in file_paths), batch_frame_num)
+
+    @staticmethod
+    def read_radar_sample(file_path: str) -> np.ndarray:
+        if BinaryFileHandler.is_binary_file(file_path):
+            return unpack_signals(*BinaryInputFileHandler(file_path).get_packed_radar_sample())
+        return InputFileHandler(file_path).get_radar_sample()
+
+    def _scan_frame_batch(self, frames: List[np.ndarray]) -> Iterator[ScanResultStore]:
+        frame_dimensions = frames[0].shape
+        if any(len(frame.shape) != 2 or frame.shape != frame_dimensions for frame in frames):
+            raise Exception
+        batch_radar = self.create_sub_radar()
+        batch_radar.set_radar_map(np.concatenate([np.not_equal(frame, 0) for frame in frames]).view(np.uint8))
+        batch_radar.scan()
+        self.window_num += batch_radar.window_num
+        self.pruned_window_num += batch_radar.pruned_window_num
+
+        frame_row_num = frame_dimensions[0]
+        # offsets of the stacked map beyond the offsets of a single frame have windows crossing into the next frame
+        skipped_row_num = (len(frames) - 1) * frame_row_num
+        invaders, invader_indices, variants = self.get_variant_invaders()
+        frame_offset_row_nums = np.zeros((len(self.known_invaders), Invader.VARIANT_NUM), dtype=np.int64)
+        frame_offset_row_nums[invader_indices, variants] = [
+            batch_radar.get_offset_dimensions(invader)[0] - skipped_row_num for invader in invaders]
+        results = batch_radar.scan_results.get_results()
+        frame_indices, results['row_index'] = np.divmod(results['row_index'], frame_row_num)
+        is_in_frame = results['row_index'] < frame_offset_row_nums[results['invader_index'], results['variant']]
+        results, frame_indices = results[is_in_frame], frame_indices[is_in_frame]
+
+        # stable sort keeps invader, row and column order within each frame
+        order = np.argsort(frame_indices, kind='stable')
+        results = results[order]
+        frame_ends = np.searchsorted(frame_indices[order], np.arange(len(frames)), side='right')
+        frame_start = 0
+        for frame_end in frame_ends:
+            frame_results = ScanResultStore()
+            frame_results.extend_results(results[frame_start:frame_end])
+            frame_start = frame_end
+            yield frame_results
+
+    def update_radar_map(self, radar_map_sample: np.ndarray, dirty_region: Tuple = None):
+        """
+        Replaces the scanned radar map with a new frame of the same dimensions and rescans only the offsets whose
+        window overlaps a changed cell. Scan results and the computed score maps are updated in place,
+        so the cost depends on the size of the changes instead of the size of the map.
+
+        :param dirty_region: (row_index, column_index, row_num, column_num) of the region containing every change,
+            only this region is diffed with the previous map, the whole map by default
+        """
+        radar_map = RadarMap(radar_map_sample)
+        if self.radar_map is None or self.radar_map.get_dimensions() != radar_map.get_dimensions():
+            raise Exception
+        if self.variants != self.VARIANTS_NONE or self.edge_visible_fraction is not None:
+            raise Exception('incremental rescans do not support variants and edges')
+        if dirty_region is None:
+            dirty_region = (0, 0) + radar_map.get_dimensions()
+        changed_regions = self.get_changed_regions(self.radar_map, radar_map, dirty_region)
+
+        self.radar_map = radar_map
+        # engines keep work of the previous map, score maps are updated region by region
+        self._engine_instances = {}
+        self.window_num = 0
+        self.pruned_window_num = 0
+        for changed_region in changed_regions:
+            self.rescan_region(changed_region)
+
+    def get_changed_regions(self, previous_map: RadarMap, radar_map: RadarMap, region: Tuple) -> List[Tuple]:
+        """
+        Returns the bounding regions of the changed signals within the region, one for each run of changed rows.
+        Runs closer than the tallest invader are merged, so the offsets rescanned for two regions never overlap.
+        """
+        row_idx, col_idx, row_num, col_num = region
+        point = Point(row_idx, col_idx)
+        changes = np.not_equal(previous_map.get_sliced_pattern(point, row_num, col_num).get_signal_pattern(),
+                               radar_map.get_sliced_pattern(point, row_num, col_num).get_signal_pattern())
+        changed_row_indices = np.flatnonzero(changes.any(axis=1))
+        if not len(changed_row_indices):
+            return []
+
+        max_invader_row_num = max((invader.get_dimensions()[0] for invader in self.known_invaders), default=1)
+        run_start_indices = np.flatnonzero(np.diff(changed_row_indices) >= max_invader_row_num) + 1
+        changed_regions = []
+        for run_row_indices in np.split(changed_row_indices, run_start_indices):
+            first_row_idx, last_row_idx = int(run_row_indices[0]), int(run_row_indices[-1])
+            changed_col_indices = np.flatnonzero(changes[first_row_idx:last_row_idx + 1].any(axis=0))
+            first_col_idx, last_col_idx = int(changed_col_indices[0]), int(changed_col_indices[-1])
+            changed_regions.append((row_idx + first_row_idx, col_idx + first_col_idx,
+                                    last_row_idx - first_row_idx + 1, last_col_idx - first_col_idx + 1))
+        return changed_regions
+
+    def rescan_region(self, region: Tuple):
+        """
+        Rescans the offsets whose window overlaps the region of the radar map, replacing their previous results
+
+        :param region: (row_index, column_index, row_num, column_num)
+        """
+        if self.variants != self.VARIANTS_NONE or self.edge_visible_fraction is not None:
+            raise Exception('incremental rescans do not support variants and edges')
+        row_idx, col_idx, row_num, col_num = region
+        map_row_num, map_col_num = self.radar_map.get_dimensions()
+        for group in self.get_invader_groups():
+            invader_row_num, invader_col_num = self.known_invaders[group[0]].get_dimensions()
+            offset_row_num, offset_col_num = self.get_offset_dimensions(self.known_invaders[group[0]])
+            first_row_idx, first_col_idx = max(row_idx - invader_row_num + 1, 0), max(col_idx - invader_col_num + 1, 0)
+            last_row_idx, last_col_idx = min(row_idx + row_num, offset_row_num), min(col_idx + col_num, offset_col_num)
+            if first_row_idx >= last_row_idx or first_col_idx >= last_col_idx:
+                continue
+
+            results = self.scan_results.get_results()
+            self.scan_results.remove(np.isin(results['invader_index'], group)
+                                     & (results['row_index'] >= first_row_idx) & (results['row_index'] < last_row_idx)
+                                     & (results['column_index'] >= first_col_idx)
+                                     & (results['column_index'] < last_col_idx))
+
+            # the slice has exactly the rescanned offsets
+            region_radar = self.create_sub_radar()
+            region_radar.radar_map = self.radar_map.get_sliced_pattern(
+                Point(first_row_idx, first_col_idx), last_row_idx - first_row_idx + map_row_num - offset_row_num,
+                last_col_idx - first_col_idx + map_col_num - offset_col_num)
+            # invaders with score maps are matched on their full matched area maps, computed once for both
+            scored_group = [invader_index for invader_index in group if invader_index in self._score_maps]
+            scanned_group = [invader_index for invader_index in group if invader_index not in self._score_maps]
+            if scanned_group:
+                region_radar.scan_for_invaders(scanned_group)
+            region_score_maps = region_radar._scan_for_invaders_with_score_maps(scored_group) if scored_group else {}
+            self.window_num += region_radar.window_num
+            self.pruned_window_num += region_radar.pruned_window_num
+
+            region_results = region_radar.scan_results.get_results()
+            region_results['row_index'] += first_row_idx
+            region_results['column_index'] += first_col_idx
+            self.scan_results.extend_results(region_results)
+            for invader_index, region_score_map in region_score_maps.items():
+                self._score_maps[invader_index][first_row_idx:last_row_idx, first_col_idx:last_col_idx] = \
+                    region_score_map
+        # same order as a full scan
+        self.scan_results.sort()
+
+    def get_cleaned_map(self) -> np.ndarray:
+        """
+        Returns zeros and ones as uint8, one byte per cell of the radar map.
+        Detections of each invader are painted in bulk, one assignment per positive signal of the invader.
+        """
+        with self.instrumentation.measure_phase('clean_map'):
+            return self._paint_cleaned_rows(self._get_detection_groups(), 0, self.radar_map.get_dimensions()[0])
+
+    def _get_detection_groups(self) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Returns the signal pattern of each detected invader variant with the row and column indices of its
+        detections, sorted by row index
+        """
+        detection_groups = []
+        results = self.scan_results.get_results()
+        variant_keys = results['invader_index'].astype(np.int64) * Invader.VARIANT_NUM + results['variant']
+        for variant_key in np.unique(variant_keys).tolist():
+            invader_results = results[variant_keys == variant_key]
+            invader_results = invader_results[np.argsort(invader_results['row_index'], kind='stable')]
+            invader_index, variant = divmod(variant_key, Invader.VARIANT_NUM)
+            invader = self.known_invaders[invader_index].get_variant(variant)
+            detection_groups.append((invader.get_signal_pattern(), invader_results['row_index'],
+                                     invader_results['column_index']))
+        return detection_groups
+
+    def _paint_cleaned_rows(self, detection_groups: List[Tuple], first_row_idx: int, row_num: int) -> np.ndarray:
+        """
+        Returns the rows of the cleaned map from the first row index, painted with the detections overlapping them
+        """
+        map_col_num = self.radar_map.get_dimensions()[1]
+        cleaned_rows = np.zeros((row_num, map_col_num), dtype=np.uint8)
+        for signal_pattern, row_indices, col_indices in detection_groups:
+            first_idx, last_idx = np.searchsorted(row_indices, [first_row_idx - signal_pattern.shape[0] + 1,
+                                                                first_row_idx + row_num]).tolist()
+            detection_row_indices = row_indices[first_idx:last_idx] - first_row_idx
+            detection_col_indices = col_indices[first_idx:last_idx]
+            for row_idx, col_idx in zip(*np.nonzero(signal_pattern)):
+                painted_row_indices = detection_row_indices + row_idx
+                painted_col_indices = detection_col_indices + col_idx
+                # invaders partially off the map or off the rows are painted where they are visible
+                is_visible = (painted_row_indices >= 0) & (painted_row_indices < row_num) \
+                    & (painted_col_indices >= 0) & (painted_col_indices < map_col_num)
+                cleaned_rows[painted_row_indices[is_visible], painted_col_indices[is_visible]] = 1
+        return cleaned_rows
+
+    def _iter_cleaned_bands(self, detection_groups: List[Tuple]) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yields the runs of rows of the cleaned map overlapped by detections with the index of their first row,
+        painted in bands of at most SampleHandler.CHARACTERIZE_ROW_BAND_SIZE rows
+        """
+        map_row_num = self.radar_map.get_dimensions()[0]
+        # +1 where the rows of a detection start and -1 where they end
+        row_changes = np.zeros(map_row_num + 1, dtype=np.int64)
+        for signal_pattern, row_indices, _ in detection_groups:
+            row_changes += np.bincount(np.clip(row_indices, 0, map_row_num), minlength=map_row_num + 1)
+            row_changes -= np.bincount(np.clip(row_indices + signal_pattern.shape[0], 0, map_row_num),
+                                       minlength=map_row_num + 1)
+        is_painted = (np.cumsum(row_changes[:-1]) > 0).view(np.int8)
+        run_edges = np.flatnonzero(np.diff(is_painted, prepend=0, append=0)).tolist()
+        band_row_num = SampleHandler.CHARACTERIZE_ROW_BAND_SIZE
+        for run_start, run_end in zip(run_edges[::2], run_edges[1::2]):
+            for band_start in range(run_start, run_end, band_row_num):
+                yield band_start, self._paint_cleaned_rows(detection_groups, band_start,
+                                                           min(band_row_num, run_end - band_start))
+
+    def _iter_printable_map_parts(self) -> Iterator[str]:
+        """
+        Renders only the bands of rows overlapped by detections, painting each band as it is rendered, other rows
+        cost a copy of a blank row
+        """
+        with self.instrumentation.measure_phase('clean_map'):
+            detection_groups = self._get_detection_groups()
+        return SampleHandler().iter_characterized_bands(self._iter_cleaned_bands(detection_groups),
+                                                        *self.radar_map.get_dimensions())
 
     def get_printable_map(self):
-        return SampleHandler().characterize_sample(self.get_cleaned_map())
+        printable_map_parts = self._iter_printable_map_parts()
+        with self.instrumentation.measure_phase('render'):
+            return ''.join(printable_map_parts)
 
-    def dump_to_file(self, file_path: str):
-        handler = OutputFileHandler(file_path)
-        printable_map = self.get_printable_map()
-        handler.dump_file_content(printable_map)
+    def dump_to_file(self, file_path: str, output_file_path: str = None):
+        handler = OutputFileHandler(file_path, self.instrumentation, output_file_path)
+        printable_map_parts = self._iter_printable_map_parts()
+        # parts are rendered while they are written
+        with self.instrumentation.measure_phase('render'):
+            handler.dump_file_parts(printable_map_parts)
+
+    def dump_detections_to_file(self, file_path: str, output_format: str = DetectionHandler.FORMAT_JSONL,
+                                output_file_path: str = None, detection_chunks: Iterable[np.ndarray] = None):
+        """
+        Writes the detections as JSON Lines or CSV instead of the cleaned map, see DetectionOutputFileHandler
+
+        :param detection_chunks: written as they are given instead of the scan results, such as the bands of
+            scan_row_bands, so detections are written while the scan goes on
+        """
+        handler = DetectionOutputFileHandler(file_path, output_format, self.instrumentation, output_file_path)
+        if detection_chunks is None:
+            detection_chunks = self.scan_results.iter_chunks()
+        handler.dump_detections(detection_chunks)
@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Tuple
+
+import numpy as np
+
+from ascii_pattern_matcher.models import Point, Radar, RadarMap
+
+# state of each worker process, set once by the initializer of its pool
+_worker_state = {}
+
+
+def init_worker(radar: Radar, **state):
+    _worker_state.update(radar=radar, **state)
+
+
+def get_worker_radar() -> Radar:
+    """
+    Returns the radar of the pool of this worker process, see create_worker_pool
+    """
+    return _worker_state['radar']
+
+
+def create_worker_pool(radar: Radar, worker_num: int, initializer=init_worker, initargs: Tuple = ()):
+    """
+    Returns a process pool whose workers get a sub radar of the radar, with all of its settings and its known
+    invaders already prepared, instead of preparing them again.
+
+    :param initializer: called with the sub radar followed by initargs, it has to call init_worker
+    """
+    return ProcessPoolExecutor(worker_num, initializer=initializer, initargs=(radar.create_sub_radar(), *initargs))
+
+
+def _init_tile_worker(radar: Radar, shared_memory_name: str, shape: Tuple, dtype: str, column_num: int):
+    shared_memory = SharedMemory(name=shared_memory_name)
+    shared_map = np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf)
+    if column_num is None:
+        radar_map = RadarMap(shared_map)
+    else:
+        radar_map = RadarMap.from_packed(shared_map, column_num)
+    init_worker(radar, shared_memory=shared_memory, radar_map=radar_map)
+
+
+def _scan_tile(tile: Tuple) -> Tuple:
+    """
+    Scans a tile of the shared map together with its halo and keeps the results and counts the windows whose
+    top-left point is in the tile
+    """
+    row_idx, col_idx, row_num, col_num, halo_row_num, halo_col_num = tile
+    radar_map = _worker_state['radar_map']
+    tile_map = radar_map.get_sliced_pattern(Point(row_idx, col_idx), row_num + halo_row_num, col_num + halo_col_num)
+
+    radar = get_worker_radar().create_sub_radar()
+    radar.set_radar_map(tile_map.get_pattern())
+    # offsets in the halo belong to the next tiles
+    radar.counted_offset_dimensions = (row_num, col_num)
+    radar.scan()
+
+    results = radar.scan_results.get_results()
+    results = results[(results['row_index'] < row_num) & (results['column_index'] < col_num)]
+    results['row_index'] += row_idx
+    results['column_index'] += col_idx
+    return results, radar.window_num, radar.pruned_window_num
+
+
+class ParallelScanner:
+    """
+    Splits the radar map into tiles and scans them in a process pool.
+    The map is shared with the workers through shared memory instead of pickled copies.
+    Each tile is scanned with a halo as wide as the largest known invader, so matches on tile seams are not lost,
+    and only results whose top-left point is in the tile itself are kept, so no duplicates appear.
+    """
+    TILE_SIZE = 512
+
+    radar = None
+    worker_num = None
+    tile_size = None
+
+    def __init__(self, radar: Radar, worker_num: int, tile_size: int = TILE_SIZE):
+        if not isinstance(worker_num, int) or worker_num < 1:
+            raise Exception
+        if not isinstance(tile_size, int) or tile_size < 1:
+            raise Exception
+        self.radar = radar
+        self.worker_num = worker_num
+        self.tile_size = tile_size
+
+    def get_halo_dimensions(self) -> Tuple:
+        invader_dimensions = [invader.get_dimensions() for invader in self.radar.known_invaders]
+        return tuple(max(lengths) for lengths in zip(*invader_dimensions)) or (0, 0)
+
+    def get_tiles(self) -> List[Tuple]:
+        map_row_num, map_col_num = self.radar.radar_map.get_dimensions()
+        halo_row_num, halo_col_num = self.get_halo_dimensions()
+        return [(row_idx, col_idx, min(self.tile_size, map_row_num - row_idx),
+                 min(self.tile_size, map_col_num - col_idx), halo_row_num, halo_col_num)
+                for row_idx in range(0, map_row_num, self.tile_size)
+                for col_idx in range(0, map_col_num, self.tile_size)]
+
+    def _get_shared_sample(self) -> Tuple:
+        radar_map = self.radar.radar_map
+        if radar_map.is_packed_only():
+            return radar_map.get_packed_pattern(), radar_map.get_dimensions()[1]
+        return radar_map.get_signal_pattern(), None
+
+    def scan(self):
+        sample, column_num = self._get_shared_sample()
+        shared_memory = SharedMemory(create=True, size=max(sample.nbytes, 1))
+        try:
+            np.ndarray(sample.shape, dtype=sample.dtype, buffer=shared_memory.buf)[:] = sample
+            tile_radar = self.radar.create_sub_radar()
+            # edges of the whole map are scanned by the radar itself, not at the borders of the tiles
+            tile_radar.edge_visible_fraction = None
+            init_args = (shared_memory.name, sample.shape, sample.dtype.str, column_num)
+            with create_worker_pool(tile_radar, self.worker_num, _init_tile_worker, init_args) as executor:
+                tile_results = list(executor.map(_scan_tile, self.get_tiles()))
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+        for _, window_num, pruned_window_num in tile_results:
+            self.radar.window_num += window_num
+            self.radar.pruned_window_num += pruned_window_num
+        result_num = len(self.radar.scan_results)
+        self.radar.scan_results.extend_results(np.concatenate([results for results, _, _ in tile_results]))
+        # same order as a serial scan
+        self.radar.scan_results.sort(result_num)
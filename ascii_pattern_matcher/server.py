@@ -0,0 +1,192 @@
+import argparse
+import asyncio
+import json
+
+import numpy as np
+
+from ascii_pattern_matcher.models import Radar
+from ascii_pattern_matcher.parallel import create_worker_pool, get_worker_radar
+from ascii_pattern_matcher.utils import SampleHandler
+
+# requests and responses are single lines of json, a line holds a whole radar sample
+LINE_BYTE_NUM = 256 << 20
+
+
+def _scan_request(request: dict) -> dict:
+    """
+    Scans the radar sample of a request with the known invaders of the worker
+    """
+    sample_handler = SampleHandler()
+    radar = get_worker_radar().create_sub_radar()
+    radar.set_radar_map(sample_handler.extract_radar_sample(request['sample']))
+    radar.scan()
+
+    response = {'results': [[row_index, column_index, invader_index, None if np.isnan(score) else score, variant]
+                            for row_index, column_index, invader_index, score, variant
+                            in radar.scan_results.get_results().tolist()]}
+    if request.get('cleaned_map'):
+        response['cleaned_map'] = radar.get_printable_map()
+    return response
+
+
+class ScanServer:
+    """
+    Resident scan service: known invaders are prepared once, radar samples are received over a TCP port or
+    a Unix socket and scanned in a process pool.
+    Each request is a json line {"sample": radar sample text, "cleaned_map": bool} and is answered with a json line
+    {"results": [[row index, column index, invader index, score, variant], ...], "cleaned_map": text}
+    or {"error": message}.
+    Requests of a connection are answered in order, connections are served concurrently.
+    Requests wait in a queue of queue_size, when it is full connections are not read any further until a worker
+    is free, so clients sending faster than the workers scan are slowed down instead of growing the queue.
+    """
+    QUEUE_SIZE = 64
+
+    radar = None
+    worker_num = None
+    queue_size = None
+    _queue = None
+    _executor = None
+    _dispatchers = None
+    _server = None
+
+    def __init__(self, radar: Radar, worker_num: int = 1, queue_size: int = QUEUE_SIZE):
+        """
+        :param radar: settings and known invaders of the scans, its radar map is not used
+        """
+        if not isinstance(worker_num, int) or worker_num < 1:
+            raise Exception
+        if not isinstance(queue_size, int) or queue_size < 1:
+            raise Exception
+        self.radar = radar
+        self.worker_num = worker_num
+        self.queue_size = queue_size
+
+    async def start(self, host: str = None, port: int = None, unix_socket_path: str = None):
+        """
+        Listens on the Unix socket if a path is given, on the TCP port otherwise
+        """
+        self._executor = create_worker_pool(self.radar, self.worker_num)
+        self._queue = asyncio.Queue(self.queue_size)
+        self._dispatchers = [asyncio.ensure_future(self._dispatch()) for _ in range(self.worker_num)]
+        if unix_socket_path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, unix_socket_path,
+                                                           limit=LINE_BYTE_NUM)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port, limit=LINE_BYTE_NUM)
+
+    def get_port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        for dispatcher in self._dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._executor.shutdown()
+
+    async def _dispatch(self):
+        """
+        Hands the queued requests to the pool, one request per worker at a time
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            request, response = await self._queue.get()
+            try:
+                result = await loop.run_in_executor(self._executor, _scan_request, request)
+            except Exception as exception:
+                result = {'error': str(exception) or type(exception).__name__}
+            finally:
+                self._queue.task_done()
+            # the connection may be gone
+            if not response.done():
+                response.set_result(result)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # the rest of a line over the limit cannot be told apart from the next request
+                    await self._write_response(writer, {'error': 'request is too long'})
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict) or not isinstance(request.get('sample'), str):
+                        raise ValueError
+                except ValueError:
+                    await self._write_response(writer, {'error': 'invalid request'})
+                    continue
+
+                response = loop.create_future()
+                await self._queue.put((request, response))
+                await self._write_response(writer, await response)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, response: dict):
+        writer.write(json.dumps(response).encode() + b'\n')
+        await writer.drain()
+
+
+parser = argparse.ArgumentParser(
+    description='Serves scans of radar samples against the known invaders of given file')
+parser.add_argument('-a', '--accuracy', type=int, required=False, default=80,
+                    help='Accuracy of invader detection between 0 and 100.')
+parser.add_argument('-f', '--file-path', type=str, required=False, default='../README.md',
+                    help='Relative path of the file of the known invaders.')
+parser.add_argument('-e', '--engine', type=str, required=False, default=Radar.ENGINE_AUTO,
+                    choices=[Radar.ENGINE_AUTO, Radar.ENGINE_LOOP, Radar.ENGINE_EXACT, *Radar.ENGINES],
+                    help='Matching engine, picked for each invader by default.')
+parser.add_argument('-w', '--workers', type=int, required=False, default=1,
+                    help='Number of processes scanning radar samples in parallel.')
+parser.add_argument('-v', '--variants', type=str, required=False, default=Radar.VARIANTS_NONE,
+                    choices=list(Radar.VARIANT_POLICIES),
+                    help='Rotated and mirrored variants of the known invaders to scan as well.')
+parser.add_argument('-g', '--edge-visibility', type=int, required=False, default=None,
+                    help='Also detects invaders partially off the radar maps with at least this percent of their '
+                         'signals on the map, between 0 and 100.')
+parser.add_argument('-q', '--queue-size', type=int, required=False, default=ScanServer.QUEUE_SIZE,
+                    help='Number of requests waiting for a worker before clients are slowed down.')
+parser.add_argument('--host', type=str, required=False, default='127.0.0.1',
+                    help='Host of the TCP port.')
+parser.add_argument('-p', '--port', type=int, required=False, default=8765,
+                    help='TCP port to listen on.')
+parser.add_argument('-u', '--unix-socket', type=str, required=False, default=None,
+                    help='Path of a Unix socket to listen on instead of the TCP port.')
+parser.add_argument('-l', '--library-cache-dir', type=str, required=False, default=None,
+                    help='Directory where compiled known invaders are cached between runs.')
+
+
+async def serve(server: ScanServer, host: str, port: int, unix_socket_path: str):
+    await server.start(host, port, unix_socket_path)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    from ascii_pattern_matcher.main import clean_file_name, create_radar
+
+    args = parser.parse_args()
+    # same radar options as main.py
+    radar = create_radar(args)
+    radar.init_from_file(clean_file_name(args.file_path))
+
+    try:
+        asyncio.run(serve(ScanServer(radar, args.workers, args.queue_size), args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,123 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+class ScanHook:
+    """
+    Receives the measurements of a radar and its file handlers, methods do nothing by default.
+    Memory is traced with tracemalloc, which NumPy reports its arrays to, only while a hook asks for it.
+    """
+    trace_memory = False
+
+    def on_phase(self, phase: str, seconds: float, peak_byte_num: int = None):
+        """
+        :param peak_byte_num: most memory allocated during the phase above the memory at its start,
+            None when memory is not traced
+        """
+
+    def on_invader_scan(self, invader_index: int, seconds: float, window_num: int, evaluated_window_num: int,
+                        match_num: int):
+        """
+        Invaders scanned together in a group share the time of the group equally
+
+        :param window_num: offsets of the invader on the map
+        :param evaluated_window_num: offsets which were matched, the others were pruned
+        """
+
+
+class Instrumentation:
+    """
+    Measures phases and reports them with the scans of invaders to the hooks.
+    Phases can be nested, the peak memory of a phase includes the peaks of its nested phases.
+    """
+    hooks = None
+    _peak_byte_nums = None
+
+    def __init__(self, hooks: List[ScanHook] = None):
+        self.hooks = list(hooks or [])
+        # peak memory of each measured phase so far, innermost last
+        self._peak_byte_nums = []
+
+    def __bool__(self) -> bool:
+        return bool(self.hooks)
+
+    def _is_tracing_memory(self) -> bool:
+        return any(hook.trace_memory for hook in self.hooks)
+
+    @contextmanager
+    def measure_phase(self, phase: str) -> Iterator[None]:
+        if not self.hooks:
+            yield
+            return
+        is_tracing_memory = self._is_tracing_memory()
+        is_tracing_started = is_tracing_memory and not tracemalloc.is_tracing()
+        start_byte_num = 0
+        if is_tracing_started:
+            tracemalloc.start()
+        if is_tracing_memory:
+            start_byte_num, peak_byte_num = tracemalloc.get_traced_memory()
+            if self._peak_byte_nums:
+                # the peak is reset for this phase, the outer phase keeps its peak so far
+                self._peak_byte_nums[-1] = max(self._peak_byte_nums[-1], peak_byte_num)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        self._peak_byte_nums.append(start_byte_num)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            peak_byte_num = self._peak_byte_nums.pop()
+            phase_peak_byte_num = None
+            if is_tracing_memory:
+                peak_byte_num = max(peak_byte_num, tracemalloc.get_traced_memory()[1])
+                phase_peak_byte_num = peak_byte_num - start_byte_num
+                if self._peak_byte_nums:
+                    self._peak_byte_nums[-1] = max(self._peak_byte_nums[-1], peak_byte_num)
+            if is_tracing_started:
+                tracemalloc.stop()
+            for hook in self.hooks:
+                hook.on_phase(phase, seconds, phase_peak_byte_num)
+
+    def report_invader_scan(self, invader_index: int, seconds: float, window_num: int, evaluated_window_num: int,
+                            match_num: int):
+        for hook in self.hooks:
+            hook.on_invader_scan(invader_index, seconds, window_num, evaluated_window_num, match_num)
+
+
+class ScanStats(ScanHook):
+    """
+    Sums the measurements by phase and by invader, get_report returns them json serializable
+    """
+    phases = None
+    invaders = None
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.invaders = {}
+
+    def on_phase(self, phase: str, seconds: float, peak_byte_num: int = None):
+        stats = self.phases.setdefault(phase, {'count': 0, 'seconds': 0.0, 'peak_byte_num': None})
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        if peak_byte_num is not None:
+            stats['peak_byte_num'] = max(stats['peak_byte_num'] or 0, peak_byte_num)
+
+    def on_invader_scan(self, invader_index: int, seconds: float, window_num: int, evaluated_window_num: int,
+                        match_num: int):
+        stats = self.invaders.setdefault(invader_index, {'seconds': 0.0, 'window_num': 0, 'evaluated_window_num': 0,
+                                                         'match_num': 0})
+        stats['seconds'] += seconds
+        stats['window_num'] += window_num
+        stats['evaluated_window_num'] += evaluated_window_num
+        stats['match_num'] += match_num
+
+    def get_report(self) -> Dict:
+        return {
+            'phases': self.phases,
+            'invaders': [dict(invader_index=invader_index, **self.invaders[invader_index])
+                         for invader_index in sorted(self.invaders)],
+        }
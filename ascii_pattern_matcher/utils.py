@@ -1,70 +1,202 @@
+import itertools
+import os
+
 import numpy as np
-import re
-from typing import List
+from typing import Iterable, Iterator, List, Tuple
+
+from ascii_pattern_matcher.bits import WORD_DTYPE, get_word_num, pack_signals, unpack_signals
+from ascii_pattern_matcher.stats import Instrumentation
 
 
 class SampleHandler:
+    SEPARATOR = '~~~~'
     NEGATIVE_SIGNAL = '-'
     POSITIVE_SIGNAL = 'o'
 
-    def _numeralize_char(self, character: str) -> int:
-        character = character.lower()
-        return 0 if character == self.NEGATIVE_SIGNAL else 1
+    # characters are encoded as single bytes, characters out of latin-1 become '?' which is a positive signal too
+    ENCODING = 'latin-1'
+    NEWLINE_CODE = ord('\n')
+
+    def _get_signal_lookup(self) -> np.ndarray:
+        signal_lookup = np.ones(256, dtype=np.uint8)
+        signal_lookup[ord(self.NEGATIVE_SIGNAL)] = 0
+        return signal_lookup
+
+    def _encode(self, text: str) -> np.ndarray:
+        return np.frombuffer(text.encode(self.ENCODING, errors='replace'), dtype=np.uint8)
+
+    def numeralize_line(self, line: str) -> np.ndarray:
+        return self._get_signal_lookup()[self._encode(line)]
 
     def _numeralize_sample(self, sample: str) -> np.ndarray:
-        line_arr_sample = sample.strip().split('\n')
-        num_arr_sample = []
-        for line in line_arr_sample:
-            num_arr_sample.append(list(map(self._numeralize_char, [ch for ch in line])))
-        return np.array(num_arr_sample)
+        """
+        Translates the whole sample to zeros and ones at once through a lookup table of byte values
+        """
+        codes = self._encode(sample.strip() + '\n')
+        line_ends = np.flatnonzero(codes == self.NEWLINE_CODE)
+        line_lengths = np.diff(line_ends, prepend=-1) - 1
+        ragged_row_indices = np.flatnonzero(line_lengths != line_lengths[0])
+        if len(ragged_row_indices):
+            row_idx = ragged_row_indices[0]
+            raise Exception(f'Row {row_idx} of the sample has {line_lengths[row_idx]} columns '
+                            f'instead of {line_lengths[0]}')
+        # newlines are the last column when the rows are equally long
+        rows = codes.reshape(len(line_ends), line_lengths[0] + 1)[:, :-1]
+        return self._get_signal_lookup()[rows]
 
     def _numeralize_samples(self, samples: List[str]) -> List[np.ndarray]:
         return [self._numeralize_sample(sample) for sample in samples]
 
     def extract_samples(self, content: str) -> List[np.ndarray]:
-        # TODO could be 2 steps?
-        all_samples = re.findall(r'~{4}(.*?)~{4}', content, re.DOTALL)
         # TODO separator can be an input?
+        parts = content.split(self.SEPARATOR)
+        # samples are between pairs of separators, a separator without a pair is ignored
+        pair_num = (len(parts) - 1) // 2
+        all_samples = parts[1:2 * pair_num:2]
         return self._numeralize_samples(all_samples)
 
-    def _characterize_number(self, number: int) -> str:
-        return self.NEGATIVE_SIGNAL if number == 0 else self.POSITIVE_SIGNAL
+    def compose_samples(self, samples: List[np.ndarray]) -> str:
+        """
+        Returns a content in the input file format with the samples in order, the inverse of extract_samples
+        """
+        return ''.join(f'{self.SEPARATOR}\n{self.characterize_sample(sample)}{self.SEPARATOR}\n\n'
+                       for sample in samples)
+
+    def extract_radar_sample(self, content: str) -> np.ndarray:
+        """
+        Returns the last sample of a content in the input file format, or the content itself if it is only rows
+        """
+        if self.SEPARATOR in content:
+            return self.extract_samples(content)[-1]
+        return self._numeralize_sample(content)
+
+    # rows rendered at once while streaming, bounds the memory of the rendered text
+    CHARACTERIZE_ROW_BAND_SIZE = 256
+
+    def _get_character_lookup(self) -> np.ndarray:
+        return np.array([ord(self.NEGATIVE_SIGNAL), ord(self.POSITIVE_SIGNAL)], dtype=np.uint8)
+
+    def _characterize_rows(self, rows: np.ndarray) -> str:
+        codes = np.full((rows.shape[0], rows.shape[1] + 1), self.NEWLINE_CODE, dtype=np.uint8)
+        codes[:, :-1] = self._get_character_lookup()[np.not_equal(rows, 0).view(np.uint8)]
+        return codes.tobytes().decode(self.ENCODING)
+
+    def iter_characterized_sample(self, sample: np.ndarray) -> Iterator[str]:
+        """
+        Yields the characterized sample band by band, each band is rendered in one lookup
+        """
+        for row_idx in range(0, sample.shape[0], self.CHARACTERIZE_ROW_BAND_SIZE):
+            yield self._characterize_rows(sample[row_idx:row_idx + self.CHARACTERIZE_ROW_BAND_SIZE])
 
     def characterize_sample(self, sample: np.ndarray) -> str:
-        str_arr_sample = ''
-        for line in sample:
-            str_line = ''.join(map(self._characterize_number, [num for num in line]))
-            str_arr_sample += str_line + '\n'
-        return str_arr_sample
+        return self._characterize_rows(sample)
+
+    def _iter_characterized_blank_rows(self, row_num: int, column_num: int) -> Iterator[str]:
+        blank_row = self.NEGATIVE_SIGNAL * column_num + '\n'
+        for row_idx in range(0, row_num, self.CHARACTERIZE_ROW_BAND_SIZE):
+            yield blank_row * min(self.CHARACTERIZE_ROW_BAND_SIZE, row_num - row_idx)
+
+    def iter_characterized_bands(self, bands: Iterable[Tuple[int, np.ndarray]], row_num: int,
+                                 column_num: int) -> Iterator[str]:
+        """
+        Yields the characterized sample of the given dimensions from bands of rows given in order with the index
+        of their first row. Rows out of the bands are negative signals, copies of a single rendered row, so the
+        work besides copying grows with the bands instead of the area.
+        """
+        row_idx = 0
+        for first_row_idx, band in bands:
+            yield from self._iter_characterized_blank_rows(first_row_idx - row_idx, column_num)
+            yield self._characterize_rows(band)
+            row_idx = first_row_idx + band.shape[0]
+        yield from self._iter_characterized_blank_rows(row_num - row_idx, column_num)
+
+
+class DetectionHandler:
+    """
+    Renders detections, structured arrays with the fields of models.ScanResultStore, as JSON Lines or CSV rows.
+    Scores which are not computed are null in JSON Lines and empty in CSV.
+    """
+    FORMAT_JSONL = 'jsonl'
+    FORMAT_CSV = 'csv'
+    FORMATS = (FORMAT_JSONL, FORMAT_CSV)
+    FIELDS = ('row_index', 'column_index', 'invader_index', 'score', 'variant')
+
+    output_format = None
+
+    def __init__(self, output_format: str = FORMAT_JSONL):
+        if output_format not in self.FORMATS:
+            raise Exception
+        self.output_format = output_format
+
+    def get_header(self) -> str:
+        if self.output_format == self.FORMAT_CSV:
+            return ','.join(self.FIELDS) + '\n'
+        return ''
+
+    def characterize_detections(self, detections: np.ndarray) -> str:
+        if self.output_format == self.FORMAT_CSV:
+            line_format, missing_score = '{},{},{},{},{}\n', ''
+        else:
+            line_format = '{{' + ', '.join(f'"{field}": {{}}' for field in self.FIELDS) + '}}\n'
+            missing_score = 'null'
+        # float32 scores are written with the digits they hold
+        scores = [missing_score if np.isnan(score) else f'{score:.7g}' for score in detections['score'].tolist()]
+        return ''.join(line_format.format(row_index, column_index, invader_index, score, variant)
+                       for row_index, column_index, invader_index, score, variant
+                       in zip(detections['row_index'].tolist(), detections['column_index'].tolist(),
+                              detections['invader_index'].tolist(), scores, detections['variant'].tolist()))
 
 
 class FileHandler:
     file_path = None
+    instrumentation = None
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, instrumentation: Instrumentation = None):
+        """
+        :param instrumentation: reading, parsing and writing are measured as phases, see stats.Instrumentation
+        """
         self.file_path = file_path
+        self.instrumentation = instrumentation or Instrumentation()
+
+    @staticmethod
+    def get_directory_file_paths(directory_path: str) -> List[str]:
+        """
+        Returns the paths of the files in the directory sorted by name, such as the frames of a radar sequence
+        """
+        file_paths = [os.path.join(directory_path, file_name) for file_name in sorted(os.listdir(directory_path))]
+        return [file_path for file_path in file_paths if os.path.isfile(file_path)]
 
     def get_file_content(self) -> str:
-        file = open(self.file_path, 'r')
-        content = file.read()
-        file.close()
+        with self.instrumentation.measure_phase('read_file'):
+            file = open(self.file_path, 'r')
+            content = file.read()
+            file.close()
         return content
 
     def dump_file_content(self, content: str):
-        with open(self.file_path, 'w') as file:
+        with self.instrumentation.measure_phase('write_file'), open(self.file_path, 'w') as file:
             file.write(content)
 
+    def dump_file_parts(self, parts: Iterable[str]):
+        """
+        Writes the content part by part, so the whole content is never kept in memory
+        """
+        with self.instrumentation.measure_phase('write_file'), open(self.file_path, 'w') as file:
+            for part in parts:
+                file.write(part)
+
 
 class InputFileHandler(FileHandler):
     samples = []
 
-    def __init__(self, file_path: str):
-        super().__init__(file_path)
+    def __init__(self, file_path: str, instrumentation: Instrumentation = None):
+        super().__init__(file_path, instrumentation)
         self._extract_samples()
 
     def _extract_samples(self):
         content = self.get_file_content()  # TODO will we need content?
-        self.samples = SampleHandler().extract_samples(content)
+        with self.instrumentation.measure_phase('parse_samples'):
+            self.samples = SampleHandler().extract_samples(content)
 
     def get_known_invader_samples(self) -> List[np.ndarray]:
         # TODO depends on file format but is it ok?
@@ -76,16 +208,231 @@ class InputFileHandler(FileHandler):
         return self.samples[-1]
 
 
-class OutputFileHandler(FileHandler):
+class StreamInputFileHandler(FileHandler):
+    """
+    Reads the samples line by line instead of reading the whole file, for radar samples larger than memory.
+    Known invader samples are small and kept, radar sample rows are only iterated.
+    """
+    sample_num = None
 
     def __init__(self, file_path: str):
         super().__init__(file_path)
-        self._prepare_output_file_path()
+        self.sample_num = self._count_samples()
+
+    def _iter_sample_lines(self) -> Iterator[Tuple[int, str]]:
+        """
+        Yields the lines within separators together with the index of their sample, as extract_samples splits them
+        """
+        sample_index = 0
+        is_in_sample = False
+        with open(self.file_path, 'r') as file:
+            for line in file:
+                parts = line.rstrip('\n').split(SampleHandler.SEPARATOR)
+                for part_index, part in enumerate(parts):
+                    if part_index > 0:
+                        if is_in_sample:
+                            sample_index += 1
+                        is_in_sample = not is_in_sample
+                    if is_in_sample:
+                        yield sample_index, part
+
+    def _count_samples(self) -> int:
+        sample_num = 0
+        is_in_sample = False
+        with open(self.file_path, 'r') as file:
+            for line in file:
+                for _ in range(line.count(SampleHandler.SEPARATOR)):
+                    sample_num += is_in_sample
+                    is_in_sample = not is_in_sample
+        return sample_num
+
+    def _iter_stripped_sample_lines(self, sample_index_range: range) -> Iterator[Tuple[int, str]]:
+        """
+        Yields the lines of the samples in the range, stripped of surrounding whitespace as a whole like
+        extract_samples does. The last line of a sample is only known at its end, so it is held back.
+        """
+        current_sample_index = None
+        held_lines = []  # last non blank line followed by the blank lines after it
+        for sample_index, line in self._iter_sample_lines():
+            if sample_index != current_sample_index:
+                if held_lines:
+                    yield current_sample_index, held_lines[0].rstrip()
+                if sample_index >= sample_index_range.stop:
+                    return
+                current_sample_index, held_lines = sample_index, []
+                is_started = False
+            if sample_index not in sample_index_range:
+                continue
+            if not line.strip():
+                if held_lines:
+                    held_lines.append(line)
+                continue
+            if not is_started:
+                line = line.lstrip()
+                is_started = True
+            for held_line in held_lines:
+                yield sample_index, held_line
+            held_lines = [line]
+        if held_lines:
+            yield current_sample_index, held_lines[0].rstrip()
+
+    def _iter_sample_rows(self, sample_index_range: range) -> Iterator[Tuple[int, np.ndarray]]:
+        sample_handler = SampleHandler()
+        current_sample_index, column_num = None, None
+        for sample_index, line in self._iter_stripped_sample_lines(sample_index_range):
+            row = sample_handler.numeralize_line(line)
+            if sample_index != current_sample_index:
+                current_sample_index, column_num = sample_index, len(row)
+            elif len(row) != column_num:
+                raise Exception(f'Row of sample {sample_index} has {len(row)} columns instead of {column_num}')
+            yield sample_index, row
+
+    def get_known_invader_samples(self) -> List[np.ndarray]:
+        samples = {}
+        for sample_index, row in self._iter_sample_rows(range(self.sample_num - 1)):
+            samples.setdefault(sample_index, []).append(row)
+        return [np.array(samples[sample_index], dtype=np.uint8) for sample_index in sorted(samples)]
+
+    def iter_radar_rows(self) -> Iterator[np.ndarray]:
+        for _, row in self._iter_sample_rows(range(self.sample_num - 1, self.sample_num)):
+            yield row
+
+
+class OutputFileHandler(FileHandler):
+
+    def __init__(self, file_path: str, instrumentation: Instrumentation = None, output_file_path: str = None):
+        """
+        :param output_file_path: written instead of the cleaned_map file next to the input file
+        """
+        super().__init__(file_path, instrumentation)
+        if output_file_path is None:
+            self._prepare_output_file_path()
+        else:
+            self.file_path = output_file_path
 
     def _prepare_output_file_path(self):
-        # TODO input as an argument?
         path_parts = self.file_path.split('/')
         file_extention = path_parts[-1].split('.')[-1]
         output_file_name = f'cleaned_map.{file_extention}'
         path_parts[-1] = output_file_name
         self.file_path = '/'.join(path_parts)
+
+
+class DetectionOutputFileHandler(OutputFileHandler):
+    """
+    Writes detections in the format of a DetectionHandler, to detections.<format> next to the input file by default
+    """
+    detection_handler = None
+
+    def __init__(self, file_path: str, output_format: str = DetectionHandler.FORMAT_JSONL,
+                 instrumentation: Instrumentation = None, output_file_path: str = None):
+        self.detection_handler = DetectionHandler(output_format)
+        super().__init__(file_path, instrumentation, output_file_path)
+
+    def _prepare_output_file_path(self):
+        path_parts = self.file_path.split('/')
+        path_parts[-1] = f'detections.{self.detection_handler.output_format}'
+        self.file_path = '/'.join(path_parts)
+
+    def dump_detections(self, detection_chunks: Iterable[np.ndarray]):
+        """
+        Writes each chunk of detections as soon as it is given, so detections can be written while they are found
+        """
+        parts = itertools.chain([self.detection_handler.get_header()],
+                                (self.detection_handler.characterize_detections(detections)
+                                 for detections in detection_chunks))
+        self.dump_file_parts(parts)
+
+
+class BinaryFileHandler(FileHandler):
+    """
+    Samples stored as rows packed into 64 bit words, see bits.pack_signals, so they can be memory mapped.
+    Layout: a header, one entry per sample with its dimensions and data offset, then the packed rows of each sample.
+    Like the ASCII format, the last sample is the radar sample and the others are the known invader samples.
+    """
+    MAGIC = b'APMB'
+    VERSION = 1
+    HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u4'), ('sample_num', '<u4'), ('reserved', '<u4')])
+    ENTRY_DTYPE = np.dtype([('row_num', '<u8'), ('column_num', '<u8'), ('offset', '<u8')])
+
+    @classmethod
+    def is_binary_file(cls, file_path: str) -> bool:
+        with open(file_path, 'rb') as file:
+            return file.read(len(cls.MAGIC)) == cls.MAGIC
+
+    def get_data_offset(self, sample_num: int) -> int:
+        return self.HEADER_DTYPE.itemsize + sample_num * self.ENTRY_DTYPE.itemsize
+
+
+class BinaryInputFileHandler(BinaryFileHandler):
+    entries = None
+
+    def __init__(self, file_path: str, instrumentation: Instrumentation = None):
+        super().__init__(file_path, instrumentation)
+        self._read_entries()
+
+    def _read_entries(self):
+        with self.instrumentation.measure_phase('read_file'):
+            header = np.fromfile(self.file_path, dtype=self.HEADER_DTYPE, count=1)
+            if len(header) != 1 or header[0]['magic'] != self.MAGIC or header[0]['version'] != self.VERSION:
+                raise Exception(f'{self.file_path} is not a binary radar file of version {self.VERSION}')
+            sample_num = int(header[0]['sample_num'])
+            self.entries = np.fromfile(self.file_path, dtype=self.ENTRY_DTYPE, count=sample_num,
+                                       offset=self.HEADER_DTYPE.itemsize)
+
+    def get_packed_sample(self, sample_index: int) -> Tuple[np.ndarray, int]:
+        """
+        Returns the packed rows of the sample as a read only memory map without reading them, and its column number
+        """
+        entry = self.entries[sample_index]
+        row_num, column_num, offset = int(entry['row_num']), int(entry['column_num']), int(entry['offset'])
+        if row_num == 0:
+            return np.zeros((0, get_word_num(column_num)), dtype=WORD_DTYPE), column_num
+        packed_sample = np.memmap(self.file_path, dtype=WORD_DTYPE, mode='r', offset=offset,
+                                  shape=(row_num, get_word_num(column_num)))
+        return packed_sample, column_num
+
+    def get_known_invader_samples(self) -> List[np.ndarray]:
+        return [unpack_signals(*self.get_packed_sample(sample_index)) for sample_index in range(len(self.entries) - 1)]
+
+    def get_packed_radar_sample(self) -> Tuple[np.ndarray, int]:
+        return self.get_packed_sample(len(self.entries) - 1)
+
+
+class BinaryOutputFileHandler(BinaryFileHandler):
+
+    def dump_samples(self, known_invader_samples: List[np.ndarray], radar_rows: Iterable[np.ndarray]):
+        """
+        Writes the samples while packing the radar rows one by one, so the radar sample is never kept in memory
+        """
+        sample_num = len(known_invader_samples) + 1
+        header = np.array([(self.MAGIC, self.VERSION, sample_num, 0)], dtype=self.HEADER_DTYPE)
+        entries = np.zeros(sample_num, dtype=self.ENTRY_DTYPE)
+        offset = self.get_data_offset(sample_num)
+        with open(self.file_path, 'wb') as file:
+            file.seek(offset)
+            for sample_index, sample in enumerate(known_invader_samples):
+                packed_sample = pack_signals(sample)
+                entries[sample_index] = (sample.shape[0], sample.shape[1], offset)
+                file.write(packed_sample.tobytes())
+                offset += packed_sample.nbytes
+
+            row_num, column_num = 0, 0
+            for row in radar_rows:
+                if row_num and len(row) != column_num:
+                    raise Exception(f'Radar row {row_num} has {len(row)} columns instead of {column_num}')
+                column_num = len(row)
+                file.write(pack_signals(row.reshape(1, -1)).tobytes())
+                row_num += 1
+            entries[-1] = (row_num, column_num, offset)
+
+            file.seek(0)
+            file.write(header.tobytes())
+            file.write(entries.tobytes())
+
+    def dump_from_ascii_file(self, ascii_file_path: str):
+        """
+        Converts a file in the ASCII format, reading it line by line
+        """
+        handler = StreamInputFileHandler(ascii_file_path)
+        self.dump_samples(handler.get_known_invader_samples(), handler.iter_radar_rows())
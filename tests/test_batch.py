@@ -0,0 +1,128 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+from ascii_pattern_matcher.batch import BatchScanner
+from ascii_pattern_matcher.main import DETECTION_FORMAT_NAMES, ENGINE_NAMES, VARIANT_POLICY_NAMES
+from ascii_pattern_matcher.models import Radar
+from ascii_pattern_matcher.utils import BinaryOutputFileHandler, DetectionHandler, FileHandler
+from tests.test_utils import README_PATH
+
+
+class TestBatchScanner(TestCase):
+
+    def setUp(self):
+        self.radar = Radar(0.8)
+        self.radar.init_known_invaders_from_file(README_PATH)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def copy_readme(self, *path_parts) -> str:
+        file_path = os.path.join(self.directory, *path_parts)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        shutil.copy(README_PATH, file_path)
+        return file_path
+
+    def test_init(self):
+        self.assertRaises(Exception, lambda: BatchScanner(self.radar, worker_num=0))
+        self.assertRaises(Exception, lambda: BatchScanner(self.radar, output_format='txt'))
+
+    def test_main_names(self):
+        # main.py lists them without importing the models
+        self.assertEqual([Radar.ENGINE_AUTO, Radar.ENGINE_LOOP, Radar.ENGINE_EXACT, *Radar.ENGINES], ENGINE_NAMES)
+        self.assertEqual(list(Radar.VARIANT_POLICIES), VARIANT_POLICY_NAMES)
+        self.assertEqual(list(DetectionHandler.FORMATS), DETECTION_FORMAT_NAMES)
+        # in a fresh interpreter, as the tests have imported numpy already
+        process = subprocess.run([sys.executable, '-c', 'import sys, ascii_pattern_matcher.main; '
+                                                        'print("numpy" in sys.modules)'],
+                                 capture_output=True, text=True, check=True)
+        self.assertEqual('False', process.stdout.strip())
+
+    def test_expand_file_paths(self):
+        first_path, second_path = self.copy_readme('a.md'), self.copy_readme('b.md')
+        nested_path = self.copy_readme('nested', 'a.md')
+        self.copy_readme('a.cleaned_map.md')
+        self.copy_readme('a.detections.csv')
+        # outputs of single file scans
+        self.copy_readme('cleaned_map.md')
+        self.copy_readme('detections.jsonl')
+
+        self.assertEqual([first_path, second_path], BatchScanner.expand_file_paths([self.directory]))
+        self.assertEqual([first_path, nested_path, second_path], BatchScanner.expand_file_paths(
+            [first_path, os.path.join(self.directory, '*', '*.md'), os.path.join(self.directory, '*.md')]))
+
+    def test_get_output_file_paths(self):
+        file_paths = [os.path.join(self.directory, 'a.md'), os.path.join(self.directory, 'nested', 'a.md'),
+                      os.path.join(self.directory, 'a.txt')]
+
+        self.assertEqual([os.path.join(self.directory, 'a.cleaned_map.md'),
+                          os.path.join(self.directory, 'nested', 'a.cleaned_map.md'),
+                          os.path.join(self.directory, 'a.cleaned_map.txt')],
+                         BatchScanner(self.radar).get_output_file_paths(file_paths))
+        output_directory = os.path.join(self.directory, 'output')
+        self.assertEqual([os.path.join(output_directory, 'a.cleaned_map.md'),
+                          os.path.join(output_directory, 'a.1.cleaned_map.md'),
+                          os.path.join(output_directory, 'a.cleaned_map.txt')],
+                         BatchScanner(self.radar, output_directory=output_directory).get_output_file_paths(file_paths))
+        self.assertEqual([os.path.join(self.directory, 'a.detections.csv'),
+                          os.path.join(self.directory, 'nested', 'a.detections.csv'),
+                          os.path.join(self.directory, 'a.1.detections.csv')],
+                         BatchScanner(self.radar, output_format='csv').get_output_file_paths(file_paths))
+
+    def test_scan(self):
+        expected_radar = Radar(0.8)
+        expected_radar.init_from_file(README_PATH)
+        expected_radar.scan()
+        expected = expected_radar.get_printable_map()
+        file_paths = [self.copy_readme('a.md'), self.copy_readme('nested', 'a.md')]
+        binary_path = os.path.join(self.directory, 'c.bin')
+        BinaryOutputFileHandler(binary_path).dump_from_ascii_file(README_PATH)
+        file_paths.append(binary_path)
+
+        for worker_num in (1, 2):
+            output_directory = os.path.join(self.directory, f'output_{worker_num}')
+            summary = BatchScanner(self.radar, worker_num, output_directory).scan(file_paths)
+
+            self.assertEqual(3, summary['file_num'])
+            self.assertEqual(3 * expected_radar.radar_map.get_dimensions()[0]
+                             * expected_radar.radar_map.get_dimensions()[1], summary['cell_num'])
+            self.assertEqual(3 * len(expected_radar.scan_results), summary['detection_num'])
+            self.assertEqual(file_paths, [file['file_path'] for file in summary['files']])
+            for file in summary['files']:
+                self.assertEqual(expected, FileHandler(file['output_file_path']).get_file_content())
+        # inputs are left as they are
+        self.assertEqual(FileHandler(README_PATH).get_file_content(), FileHandler(file_paths[0]).get_file_content())
+
+    def test_scan_errors(self):
+        file_paths = [self.copy_readme('a.md'), os.path.join(self.directory, 'missing.md'),
+                      os.path.join(self.directory, 'empty.md')]
+        FileHandler(file_paths[2]).dump_file_content('no radar sample\n')
+
+        for worker_num in (1, 2):
+            summary = BatchScanner(self.radar, worker_num).scan(file_paths)
+
+            self.assertEqual(3, summary['file_num'])
+            self.assertEqual(2, summary['error_num'])
+            first_file, *failed_files = summary['files']
+            self.assertNotIn('error', first_file)
+            self.assertTrue(first_file['detection_num'])
+            self.assertEqual(first_file['detection_num'], summary['detection_num'])
+            for file in failed_files:
+                self.assertTrue(file['error'])
+                self.assertEqual(0, file['cell_num'])
+                self.assertFalse(os.path.exists(file['output_file_path']))
+
+    def test_scan_detections(self):
+        file_paths = [self.copy_readme('a.md'), self.copy_readme('b.md')]
+
+        summary = BatchScanner(self.radar, 2, output_format=DetectionHandler.FORMAT_JSONL).scan(file_paths)
+        self.assertEqual([os.path.join(self.directory, 'a.detections.jsonl'),
+                          os.path.join(self.directory, 'b.detections.jsonl')],
+                         [file['output_file_path'] for file in summary['files']])
+        for file in summary['files']:
+            lines = FileHandler(file['output_file_path']).get_file_content().splitlines()
+            self.assertTrue(lines)
+            self.assertEqual(file['detection_num'], len(lines))
@@ -0,0 +1,59 @@
+import json
+from unittest import TestCase
+
+import numpy as np
+
+from ascii_pattern_matcher.benchmark import Benchmark, RadarGenerator, clean_map_dimensions
+from ascii_pattern_matcher.models import Radar
+
+
+class TestRadarGenerator(TestCase):
+
+    def test_plant_invaders(self):
+        generator = RadarGenerator(1)
+        invaders = generator.generate_invaders(3)
+        radar_map = generator.generate_map(100, 120, 0.3)
+        self.assertEqual((100, 120), radar_map.shape)
+
+        planted_invaders = generator.plant_invaders(radar_map, invaders, 20, 0.0)
+        self.assertEqual(20, len(planted_invaders))
+        self.assertEqual(20, len(set((row_idx, col_idx) for row_idx, col_idx, _ in planted_invaders)))
+        for row_idx, col_idx, invader_index in planted_invaders:
+            invader = invaders[invader_index]
+            self.assertTrue(np.array_equal(
+                invader, radar_map[row_idx:row_idx + invader.shape[0], col_idx:col_idx + invader.shape[1]]))
+
+        # no more invaders than grid cells
+        self.assertEqual(1, len(generator.plant_invaders(generator.generate_map(12, 12, 0.3), invaders, 5, 0.0)))
+
+    def test_plant_corrupted_invaders(self):
+        generator = RadarGenerator(2)
+        invaders = generator.generate_invaders(1)
+        radar_map = generator.generate_map(50, 50, 0.0)
+        (row_idx, col_idx, _), = generator.plant_invaders(radar_map, invaders, 1, 0.25)
+        invader = invaders[0]
+        planted = radar_map[row_idx:row_idx + invader.shape[0], col_idx:col_idx + invader.shape[1]]
+        self.assertEqual(round(0.25 * invader.size), np.count_nonzero(planted != invader))
+
+
+class TestBenchmark(TestCase):
+
+    def test_init(self):
+        self.assertRaises(Exception, lambda: Benchmark(RadarGenerator(), noise_density=2.0))
+        self.assertRaises(Exception, lambda: Benchmark(RadarGenerator(), repeat_num=0))
+
+    def test_run(self):
+        benchmark = Benchmark(RadarGenerator(3), corruption=0.0, repeat_num=1)
+        report = benchmark.run([(64, 80), (130, 40)], [1, 4], [0.8, 1.0])
+        self.assertEqual(Radar.ENGINE_AUTO, report['engine'])
+        self.assertEqual(8, len(report['cases']))
+        for case in report['cases']:
+            # uncorrupted invaders are found at any accuracy
+            self.assertEqual(1.0, case['recall'])
+            self.assertGreaterEqual(case['detection_num'], case['planted_num'])
+            self.assertGreater(case['scan_seconds'], 0)
+        self.assertEqual([130, 40], report['cases'][-1]['map_dimensions'])
+        self.assertEqual(report, json.loads(json.dumps(report)))
+
+    def test_clean_map_dimensions(self):
+        self.assertEqual((512, 1024), clean_map_dimensions('512X1024'))
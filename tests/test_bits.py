@@ -0,0 +1,35 @@
+import numpy as np
+from unittest import TestCase
+
+from ascii_pattern_matcher.bits import pack_signals, popcount, shift_words, unpack_signals
+
+
+class TestBits(TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def generate_random_signals(self, row_num=7, column_num=150):
+        return (self.rng.random((row_num, column_num)) < 0.5).astype(np.uint8)
+
+    def test_pack_signals(self):
+        signals = self.generate_random_signals()
+
+        packed = pack_signals(signals)
+        self.assertEqual((7, 3), packed.shape)
+        self.assertTrue(np.all(unpack_signals(packed, 150) == signals))
+        self.assertEqual(int(signals[2][70]), int(packed[2][1] >> np.uint64(6)) & 1)
+
+    def test_popcount(self):
+        signals = self.generate_random_signals()
+
+        self.assertTrue(np.all(signals.sum(axis=1) == popcount(pack_signals(signals)).sum(axis=1)))
+        self.assertEqual(64, popcount(np.array([2 ** 64 - 1], dtype=np.uint64))[0])
+
+    def test_shift_words(self):
+        signals = self.generate_random_signals()
+        packed = pack_signals(signals)
+
+        for bit_num in (0, 1, 30, 63):
+            shifted = unpack_signals(shift_words(packed, bit_num), 150 - bit_num)
+            self.assertTrue(np.all(shifted == signals[:, bit_num:]))
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+import numpy as np
+
+from ascii_pattern_matcher.engines import (BitPackedCorrelationEngine, DirectCorrelationEngine, FFTCorrelationEngine,
+                                           get_fast_fft_length)
+from ascii_pattern_matcher.models import Invader, RadarMap
+
+
+class TestFastFFTLength(TestCase):
+
+    def test_get_fast_fft_length(self):
+        self.assertEqual(1, get_fast_fft_length(1))
+        self.assertEqual(100, get_fast_fft_length(100))
+        self.assertEqual(108, get_fast_fft_length(101))
+        self.assertEqual(2048, get_fast_fft_length(2047))
+
+
+class TestCorrelationEngines(TestCase):
+
+    def test_get_matched_area_maps(self):
+        rng = np.random.default_rng(0)
+        radar_map = RadarMap((rng.random((70, 90)) < 0.5).astype(int))
+        invaders = [Invader((rng.random((5, 7)) < 0.5).astype(int)) for _ in range(30)]
+        offset_dimensions = (65, 83)
+        expected = [DirectCorrelationEngine().get_matched_area_map(radar_map, invader, offset_dimensions)
+                    for invader in invaders]
+
+        for engine in (DirectCorrelationEngine(), FFTCorrelationEngine(), BitPackedCorrelationEngine()):
+            matched_area_maps = engine.get_matched_area_maps(radar_map, invaders, offset_dimensions)
+            self.assertTrue(np.array_equal(expected, matched_area_maps), engine.name)
+
+    def test_direct_engine_group_cost(self):
+        engine = DirectCorrelationEngine()
+        radar_map = RadarMap(np.ones((100, 100)))
+        invader = Invader(np.ones((4, 4)))
+        single_cost = engine.estimate_cost(radar_map, invader, (96, 96))
+        # a single invader is always added shift by shift
+        self.assertEqual(single_cost, engine.estimate_group_cost(radar_map, [invader], (96, 96)))
+        # many invaders are cheaper to multiply with the window view at once
+        self.assertLess(engine.estimate_group_cost(radar_map, [invader] * 100, (96, 96)), 100 * single_cost)
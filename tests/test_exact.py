@@ -0,0 +1,81 @@
+from unittest import TestCase
+
+import numpy as np
+
+from ascii_pattern_matcher.exact import ROW_HASH_BASE, ExactMatcher, get_window_hashes
+from ascii_pattern_matcher.models import Invader, Radar, RadarMap
+
+
+class TestWindowHashes(TestCase):
+
+    def test_get_window_hashes(self):
+        values = np.random.default_rng(0).integers(0, 3, size=(4, 30))
+        hashes = get_window_hashes(values, 7, ROW_HASH_BASE)
+        self.assertEqual((4, 24), hashes.shape)
+        self.assertEqual(hashes[0][0], get_window_hashes(values[0, :7], 7, ROW_HASH_BASE)[0])
+        self.assertEqual(hashes[3][17], get_window_hashes(values[3, 17:24], 7, ROW_HASH_BASE)[0])
+        values[2, 5:12] = values[1, 10:17]
+        self.assertEqual(hashes[1][10], get_window_hashes(values, 7, ROW_HASH_BASE)[2][5])
+        self.assertEqual((4, 0), get_window_hashes(values, 31, ROW_HASH_BASE).shape)
+
+
+class TestExactMatcher(TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def get_expected_matches(self, map_sample: np.ndarray, invader_samples: list) -> set:
+        expected = set()
+        for position, invader_sample in enumerate(invader_samples):
+            row_num, col_num = invader_sample.shape
+            for row_idx in range(map_sample.shape[0] - row_num + 1):
+                for col_idx in range(map_sample.shape[1] - col_num + 1):
+                    if np.array_equal(map_sample[row_idx:row_idx + row_num, col_idx:col_idx + col_num],
+                                      invader_sample):
+                        expected.add((row_idx, col_idx, position))
+        return expected
+
+    def test_find_matches(self):
+        map_sample = (self.rng.random((60, 70)) < 0.3).astype(np.uint8)
+        invader_samples = [(self.rng.random(dimensions) < 0.5).astype(np.uint8)
+                           for dimensions in ((3, 4), (5, 4), (3, 4), (6, 9), (2, 2))]
+        # a duplicate and an invader sharing rows with another
+        invader_samples.append(invader_samples[0].copy())
+        invader_samples.append(np.concatenate([invader_samples[1][:3], invader_samples[0][1:]]))
+        for position, (row_idx, col_idx) in enumerate(((0, 0), (10, 20), (40, 50), (50, 61), (57, 67), (20, 0),
+                                                       (30, 30))):
+            row_num, col_num = invader_samples[position].shape
+            map_sample[row_idx:row_idx + row_num, col_idx:col_idx + col_num] = invader_samples[position]
+
+        row_indices, col_indices, invader_positions = ExactMatcher().find_matches(
+            RadarMap(map_sample), [Invader(invader_sample) for invader_sample in invader_samples])
+        self.assertEqual(self.get_expected_matches(map_sample, invader_samples),
+                         set(zip(row_indices.tolist(), col_indices.tolist(), invader_positions.tolist())))
+        self.assertTrue(np.all(np.diff(invader_positions) >= 0))
+        self.assertIn((57, 67, 4), set(zip(row_indices.tolist(), col_indices.tolist(), invader_positions.tolist())))
+
+    def test_scan_with_exact_engine(self):
+        map_sample = (self.rng.random((40, 50)) < 0.5).astype(np.uint8)
+        radar = Radar(1.0, engine=Radar.ENGINE_EXACT)
+        for dimensions in ((3, 3), (4, 2)):
+            radar.add_known_invader((self.rng.random(dimensions) < 0.5).astype(np.uint8))
+        radar.add_known_invader(map_sample[5:8, 6:9])
+        radar.set_radar_map(map_sample)
+        radar.scan()
+
+        results = radar.scan_results.get_results()
+        self.assertIn((5, 6, 2), set(zip(results['row_index'].tolist(), results['column_index'].tolist(),
+                                         results['invader_index'].tolist())))
+        self.assertTrue(np.all(results['score'] == 1))
+        # other engines find the slices covering every positive invader signal, identical slices included
+        loop_radar = Radar(1.0, engine=Radar.ENGINE_LOOP)
+        loop_radar.known_invaders = radar.known_invaders
+        loop_radar.set_radar_map(map_sample)
+        loop_radar.scan()
+        loop_results = loop_radar.scan_results.get_results()
+        self.assertTrue(set(zip(results['row_index'].tolist(), results['column_index'].tolist(),
+                                results['invader_index'].tolist()))
+                        <= set(zip(loop_results['row_index'].tolist(), loop_results['column_index'].tolist(),
+                                   loop_results['invader_index'].tolist())))
+
+        self.assertRaises(Exception, lambda: Radar(0.9, engine=Radar.ENGINE_EXACT))
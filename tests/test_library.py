@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+
+from ascii_pattern_matcher.library import InvaderLibrary, InvaderLibraryCache
+from ascii_pattern_matcher.models import Radar
+from tests.test_utils import README_PATH
+
+
+class TestInvaderLibrary(TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def generate_invader_samples(self, invader_num: int = 3) -> list:
+        return [(self.rng.random((4, 70)) < 0.5).astype(np.uint8) for _ in range(invader_num)]
+
+    def create_cache_directory(self) -> str:
+        cache_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_directory)
+        return cache_directory
+
+    def test_get_content_hash(self):
+        invader_samples = self.generate_invader_samples()
+        content_hash = InvaderLibrary.get_content_hash(invader_samples)
+        self.assertEqual(content_hash, InvaderLibrary.get_content_hash([sample.copy() for sample in invader_samples]))
+        self.assertNotEqual(content_hash, InvaderLibrary.get_content_hash(invader_samples[:2]))
+        # same bytes in another shape
+        self.assertNotEqual(content_hash, InvaderLibrary.get_content_hash([sample.reshape(8, 35)
+                                                                          for sample in invader_samples]))
+
+    def test_save_and_load(self):
+        invader_samples = self.generate_invader_samples()
+        library = InvaderLibrary.compile(invader_samples)
+        file_path = os.path.join(self.create_cache_directory(), 'library.npz')
+        library.save(file_path)
+
+        loaded_library = InvaderLibrary.load(file_path, library.content_hash)
+        self.assertEqual(len(invader_samples), len(loaded_library.invaders))
+        for invader, loaded_invader in zip(library.invaders, loaded_library.invaders):
+            self.assertTrue(np.array_equal(invader.get_pattern(), loaded_invader.get_pattern()))
+            self.assertTrue(np.array_equal(invader.get_packed_pattern(), loaded_invader.get_packed_pattern()))
+            self.assertEqual(invader.get_covered_area(), loaded_invader.get_covered_area())
+
+    def test_get_library(self):
+        cache = InvaderLibraryCache(capacity=2)
+        invader_samples_list = [self.generate_invader_samples() for _ in range(3)]
+        library = cache.get_library(invader_samples_list[0])
+        self.assertIs(library, cache.get_library([sample.copy() for sample in invader_samples_list[0]]))
+
+        cache.get_library(invader_samples_list[1])
+        # the first library is used more recently than the second one
+        cache.get_library(invader_samples_list[0])
+        cache.get_library(invader_samples_list[2])
+        self.assertEqual(2, len(cache))
+        self.assertIn(library.content_hash, cache)
+        self.assertNotIn(InvaderLibrary.get_content_hash(invader_samples_list[1]), cache)
+        self.assertRaises(Exception, lambda: InvaderLibraryCache(capacity=0))
+
+    def test_get_library_from_cache_directory(self):
+        cache_directory = self.create_cache_directory()
+        invader_samples = self.generate_invader_samples()
+        library = InvaderLibraryCache(cache_directory=cache_directory).get_library(invader_samples)
+        self.assertTrue(os.path.isfile(InvaderLibraryCache(cache_directory=cache_directory)
+                                       .get_library_file_path(library.content_hash)))
+
+        with patch('ascii_pattern_matcher.library.InvaderLibrary.compile') as compile_library:
+            loaded_library = InvaderLibraryCache(cache_directory=cache_directory).get_library(invader_samples)
+        compile_library.assert_not_called()
+        self.assertEqual(library.content_hash, loaded_library.content_hash)
+        self.assertTrue(np.array_equal(library.invaders[2].get_packed_pattern(),
+                                       loaded_library.invaders[2].get_packed_pattern()))
+
+    def test_init_from_file_with_library_cache(self):
+        expected_radar = Radar(0.8)
+        expected_radar.init_from_file(README_PATH)
+        expected_radar.scan()
+
+        cache = InvaderLibraryCache(cache_directory=self.create_cache_directory())
+        radars = [Radar(0.8, invader_library_cache=cache) for _ in range(2)]
+        for radar in radars:
+            radar.init_from_file(README_PATH)
+            radar.scan()
+            self.assertTrue(np.array_equal(expected_radar.scan_results.get_results(),
+                                           radar.scan_results.get_results()))
+        self.assertIs(radars[0].known_invaders[1], radars[1].known_invaders[1])
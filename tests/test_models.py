@@ -1,12 +1,20 @@
 from unittest.mock import patch
 
+import csv
+import json
 import numpy as np
+import os
 import random
+import shutil
 import sys
+import tempfile
 from unittest import TestCase, skip
 
+from ascii_pattern_matcher.bits import pack_signals
 from ascii_pattern_matcher.models import (Invader, Pattern, Point, Radar, RadarMap,
-                                          RectanglePattern, ScanResult)
+                                          RectanglePattern, ScanResult, ScanResultStore)
+from ascii_pattern_matcher.utils import BinaryOutputFileHandler, FileHandler, SampleHandler, StreamInputFileHandler
+from tests.test_utils import README_PATH
 
 
 class BaseTestCase(TestCase):
@@ -69,10 +77,15 @@ class TestRectanglePattern(TestPattern):
     klass = RectanglePattern
     RANDOM_MIN = 5
     RANDOM_MAX = 10
+    SEED = 0
+
+    def setUp(self):
+        # random patterns are the same on every run
+        self.rng = np.random.default_rng(self.SEED)
 
     def generate_reasonable_random_dimensions(self):
-        random_row = random.randint(self.RANDOM_MIN, self.RANDOM_MAX)
-        random_column = random.randint(self.RANDOM_MIN, self.RANDOM_MAX)
+        random_row, random_column = self.rng.integers(self.RANDOM_MIN, self.RANDOM_MAX, endpoint=True,
+                                                      size=2).tolist()
         return random_row, random_column
 
     def test_get_area(self):
@@ -109,10 +122,113 @@ class TestRectanglePattern(TestPattern):
         self.assertEqual((half_row, half_column), sliced.get_dimensions())
         self.assertTrue(np.all(sliced.get_pattern() == random_arr[0:half_row, 0:half_column]))
 
+    def test_from_packed(self):
+        random_row, random_column = self.generate_reasonable_random_dimensions()
+        random_arr = (self.rng.random((random_row, random_column)) < 0.5).astype(np.uint8)
+
+        rectangle_p = self.klass.from_packed(pack_signals(random_arr), random_column)
+        self.assertTrue(rectangle_p.is_packed_only())
+        self.assertEqual((random_row, random_column), rectangle_p.get_dimensions())
+        sliced = rectangle_p.get_sliced_pattern(Point(1, 2), 3, 2)
+        self.assertTrue(np.all(sliced.get_pattern() == random_arr[1:4, 2:4]))
+        self.assertTrue(rectangle_p.is_packed_only())
+        self.assertTrue(np.all(rectangle_p.get_pattern() == random_arr))
+
+        # words do not match the column number
+        self.assertRaises(Exception, lambda: self.klass.from_packed(pack_signals(random_arr), 65))
+        self.assertRaises(Exception, lambda: self.klass.from_packed(random_arr, random_column))
+
+    def test_get_packed_pattern(self):
+        random_row, random_column = self.generate_reasonable_random_dimensions()
+        random_arr = self.rng.random((random_row, random_column)) + 0.1
+        random_arr[0][0] = 0
+
+        rectangle_p = self.klass(random_arr)
+        packed = rectangle_p.get_packed_pattern()
+        self.assertEqual((random_row, 1), packed.shape)
+        self.assertEqual(0, packed[0][0] & 1)
+        self.assertEqual(1, (packed[0][0] >> np.uint64(1)) & 1)
+
+    def test_get_window_signal_counts(self):
+        rng = np.random.default_rng(4)
+        # the smallest dimensions leave 3 x 2 windows
+        for random_row, random_column in ((self.RANDOM_MIN, self.RANDOM_MIN), (self.RANDOM_MAX, self.RANDOM_MIN),
+                                          (self.RANDOM_MIN + 2, self.RANDOM_MAX)):
+            random_arr = (rng.random((random_row, random_column)) < 0.5).astype(np.uint8)
+
+            for rectangle_p in (self.klass(random_arr),
+                                self.klass.from_packed(pack_signals(random_arr), random_column)):
+                self.assertEqual(random_arr.sum(), rectangle_p.get_integral_pattern()[-1][-1])
+                counts = rectangle_p.get_window_signal_counts(2, 3, (random_row - 2, random_column - 3))
+                self.assertEqual((random_row - 2, random_column - 3), counts.shape)
+                self.assertEqual(random_arr[1:3, 1:4].sum(), counts[1][1])
+                self.assertEqual(random_arr[-3:-1, -4:-1].sum(), counts[-1][-1])
+
+    def test_get_window_signal_counts_of_packed_pattern(self):
+        random_arr = (np.random.default_rng(5).random((23, 70)) < 0.5).astype(np.uint8)
+        expected = self.klass(random_arr).get_window_signal_counts(4, 9, (20, 62))
+
+        # bands of rows shorter than the windows
+        with patch.object(self.klass, 'INTEGRAL_ROW_BAND_SIZE', 3):
+            rectangle_p = self.klass.from_packed(pack_signals(random_arr), 70)
+            counts = rectangle_p.get_window_signal_counts(4, 9, (20, 62))
+        self.assertTrue(np.array_equal(expected, counts))
+        self.assertEqual(expected.dtype, counts.dtype)
+        # the summed-area table of the whole pattern is not kept
+        self.assertIsNone(rectangle_p._integral_pattern)
+        self.assertTrue(rectangle_p.is_packed_only())
+
+    def test_get_block_signal_counts(self):
+        random_arr = (self.rng.random((10, 7)) < 0.5).astype(np.uint8)
+        counts = self.klass(random_arr).get_block_signal_counts(4)
+        self.assertEqual((3, 2), counts.shape)
+        self.assertEqual(random_arr[4:8, :4].sum(), counts[1][0])
+        self.assertEqual(random_arr[8:, 4:].sum(), counts[2][1])
+        self.assertEqual(random_arr.sum(), counts.sum())
+
 
 class TestInvader(TestRectanglePattern):
     klass = Invader
 
+    def test_get_block_signal_caps(self):
+        random_arr = (self.rng.random((5, 6)) < 0.5).astype(np.uint8)
+        caps = self.klass(random_arr).get_block_signal_caps(3)
+        self.assertEqual((3, 3), caps.shape)
+        # every position of the invader within a block of a 3 x 3 grid
+        for row_idx in range(3):
+            for col_idx in range(3):
+                grid = np.zeros((9, 9), dtype=np.uint8)
+                grid[row_idx:row_idx + 5, col_idx:col_idx + 6] = random_arr
+                self.assertTrue(np.all(grid.reshape(3, 3, 3, 3).sum(axis=(1, 3)) <= caps))
+        self.assertEqual(random_arr[:3, :3].sum(), caps[0][0])
+
+    def test_get_visible_covered_areas(self):
+        random_arr = (self.rng.random((4, 5)) < 0.5).astype(np.uint8)
+        row_indices, col_indices = np.arange(-4, 9), np.arange(-5, 12)
+        visible_covered_areas = self.klass(random_arr).get_visible_covered_areas(row_indices, col_indices, (8, 11))
+        self.assertEqual((13, 17), visible_covered_areas.shape)
+        for row_position, row_idx in enumerate(row_indices):
+            for col_position, col_idx in enumerate(col_indices):
+                on_map = np.zeros((16, 21), dtype=np.uint8)
+                on_map[4:12, 5:16] = 1
+                window = on_map[row_idx + 4:row_idx + 8, col_idx + 5:col_idx + 10]
+                self.assertEqual(np.sum(random_arr * window), visible_covered_areas[row_position, col_position])
+
+    def test_get_variants(self):
+        pattern = np.array([[1, 1, 0], [1, 0, 0]])
+        invader = self.klass(pattern)
+        self.assertIs(invader, invader.get_variant(0))
+        self.assertTrue(np.array_equal(np.rot90(pattern, -1), invader.get_variant(1).get_pattern()))
+        self.assertTrue(np.array_equal(np.flipud(pattern), invader.get_variant(6).get_pattern()))
+        self.assertIs(invader.get_variant(5), invader.get_variant(5))
+        self.assertRaises(Exception, lambda: invader.get_variant(8))
+        self.assertEqual(list(range(8)), [variant for variant, _ in invader.get_variants(range(8))])
+
+        # symmetric variants are left out
+        symmetric_invader = self.klass(np.array([[1, 0, 1], [1, 1, 1]]))
+        self.assertEqual([0, 1, 2, 3], [variant for variant, _ in symmetric_invader.get_variants(range(8))])
+        self.assertEqual([0], [variant for variant, _ in self.klass(np.ones((3, 3))).get_variants(range(8))])
+
     def test_get_covered_area(self):
         random_row, random_column = self.generate_reasonable_random_dimensions()
 
@@ -162,6 +278,38 @@ class TestScanResult(BaseTestCase):
         self.assertRaises(Exception, lambda: ScanResult(random_float, random_int))
 
 
+class TestScanResultStore(BaseTestCase):
+
+    def test_append(self):
+        store = ScanResultStore()
+        for i in range(ScanResultStore.CHUNK_SIZE + 1):
+            store.append(i, i + 1, i % 3, 0.5)
+
+        self.assertEqual(ScanResultStore.CHUNK_SIZE + 1, len(store))
+        scan_result = store[-1]
+        self.assertIsInstance(scan_result, ScanResult)
+        self.assertEqual((ScanResultStore.CHUNK_SIZE, ScanResultStore.CHUNK_SIZE + 1),
+                         (scan_result.point.row_index, scan_result.point.column_index))
+        self.assertEqual(0.5, scan_result.score)
+
+    def test_extend(self):
+        store = ScanResultStore()
+        store.extend(np.arange(3), np.arange(3, 6), 1, np.array([0.7, 0.8, 0.9]))
+        store.extend(np.arange(2), np.arange(2), np.array([0, 2]))
+
+        self.assertEqual(5, len(store))
+        self.assertEqual([1, 1, 1, 0, 2], list(store.get_results()['invader_index']))
+        self.assertEqual([3, 4, 5], list(store.filter_by_invader(1)['column_index']))
+        self.assertEqual([0, 1, 2, 0, 1], [scan_result.point.row_index for scan_result in store])
+        self.assertTrue(np.isnan(store[3].score))
+        self.assertEqual(2, len(store[3:]))
+
+        store.remove(store.get_results()['invader_index'] == 1)
+        self.assertEqual([0, 2], list(store.get_results()['invader_index']))
+        store.clear()
+        self.assertEqual(0, len(store))
+
+
 class TestRadar(BaseTestCase):
     CREATE_FOR_INVADER = 'I'
     CREATE_FOR_MAP = 'M'
@@ -172,13 +320,17 @@ class TestRadar(BaseTestCase):
     RANDOM_INVADER_MAX = 10
 
     ACCURACY = 0.8
+    SEED = 0
+
+    def setUp(self):
+        # random maps and invaders are the same on every run
+        self.rng = np.random.default_rng(self.SEED)
 
     def generate_reasonable_random_dimensions(self, create_for=None):
         min_val, max_val = self.RANDOM_MAP_MIN, self.RANDOM_MAP_MAX
         if create_for == self.CREATE_FOR_INVADER:
             min_val, max_val = self.RANDOM_INVADER_MIN, self.RANDOM_INVADER_MAX
-        random_row = random.randint(min_val, max_val)
-        random_column = random.randint(min_val, max_val)
+        random_row, random_column = self.rng.integers(min_val, max_val, endpoint=True, size=2).tolist()
         return random_row, random_column
 
     def test_successful_init(self):
@@ -223,8 +375,8 @@ class TestRadar(BaseTestCase):
         self.assertRaises(Exception, lambda: radar.is_match(map_slice, map_slice))
         self.assertRaises(Exception, lambda: radar.is_match(invader, Pattern(smaller_arr)))
 
-    @patch('ascii_pattern_matcher.models.Radar.scan_for_invader')
-    def test_scan(self, _scan_for_invader):
+    @patch('ascii_pattern_matcher.models.Radar.scan_for_invaders')
+    def test_scan(self, _scan_for_invaders):
         radar = Radar(self.ACCURACY)
         random_arr = np.random.rand(2, 5)
 
@@ -233,11 +385,37 @@ class TestRadar(BaseTestCase):
             radar.add_known_invader(random_arr)
 
         radar.scan()
-        self.assertEqual(number_of_invaders, _scan_for_invader.call_count)
+        # invaders of the same dimensions are scanned together
+        _scan_for_invaders.assert_called_once_with(list(range(number_of_invaders)))
+
+    def test_get_invader_groups(self):
+        radar = Radar(self.ACCURACY)
+        for dimensions in ((2, 3), (3, 2), (2, 3), (4, 4), (3, 2)):
+            radar.add_known_invader(np.ones(dimensions))
+        self.assertEqual([[0, 2], [1, 4], [3]], radar.get_invader_groups())
+        self.assertEqual([[4, 1], [2]], radar.get_invader_groups([4, 2, 1]))
+
+    def test_scan_for_invaders(self):
+        map_sample = self.generate_random_signals(density=0.6)
+        invader_samples = [(self.rng.random((6, 8)) < 0.6).astype(int) for _ in range(40)]
+        invader_samples.append(self.generate_random_signals(self.CREATE_FOR_INVADER, 0.6))
+        for engine in (Radar.ENGINE_LOOP, Radar.ENGINE_AUTO) + tuple(Radar.ENGINES):
+            for prune in (True, False):
+                radar = Radar(0.6, engine=engine, prune=prune)
+                for invader_sample in invader_samples:
+                    radar.add_known_invader(invader_sample)
+                radar.set_radar_map(map_sample)
+                radar.scan()
+                results = radar.scan_results.get_results().copy()
+                # scanning the invaders one by one finds the same results in the same order
+                radar.scan_results.clear()
+                for invader_index in range(len(invader_samples)):
+                    radar.scan_for_invader(invader_index)
+                self.assertTrue(np.array_equal(results, radar.scan_results.get_results()), (engine, prune))
 
     @patch('ascii_pattern_matcher.models.Radar.is_match')
     def test_scan_for_invader(self, _is_match):
-        radar = Radar(self.ACCURACY)
+        radar = Radar(self.ACCURACY, engine=Radar.ENGINE_LOOP)
         invader_row_num = 2
         invader_col_num = 5
         random_arr = np.random.rand(invader_row_num, invader_col_num)
@@ -253,12 +431,320 @@ class TestRadar(BaseTestCase):
         random_arr = np.random.rand(map_row_num, map_col_num)
         radar.set_radar_map(random_arr)
 
-        area_to_be_scanned = (map_row_num - invader_row_num) * (map_col_num - invader_col_num)
+        area_to_be_scanned = (map_row_num - invader_row_num + 1) * (map_col_num - invader_col_num + 1)
 
         for i in range(number_of_invaders):
             radar.scan_for_invader(i)
             self.assertEqual(area_to_be_scanned * (i + 1), _is_match.call_count)
 
+    def generate_random_signals(self, create_for=None, density=0.5):
+        random_row, random_column = self.generate_reasonable_random_dimensions(create_for)
+        return (self.rng.random((random_row, random_column)) < density).astype(int)
+
+    def get_detections(self, radar: Radar, invader_index: int) -> set:
+        result_num = len(radar.scan_results)
+        radar.scan_for_invader(invader_index)
+        return {(scan_result.point.row_index, scan_result.point.column_index, scan_result.invader_index)
+                for scan_result in radar.scan_results[result_num:]}
+
+    def assert_same_detections_as_loop(self, engine: str, accuracy: float = ACCURACY, density: float = 0.7):
+        radar = Radar(accuracy, engine=Radar.ENGINE_LOOP)
+        radar.add_known_invader(self.generate_random_signals(self.CREATE_FOR_INVADER, density))
+        radar.set_radar_map(self.generate_random_signals(density=density))
+        invader_index = len(radar.known_invaders) - 1
+
+        expected = self.get_detections(radar, invader_index)
+        expected_scores = radar.scan_results.get_results()['score']
+        radar.scan_results.clear()
+        radar.engine = engine
+        self.assertEqual(expected, self.get_detections(radar, invader_index))
+        self.assertTrue(np.array_equal(expected_scores, radar.scan_results.get_results()['score']))
+        return expected
+
+    def test_scan_for_invader_with_direct_engine(self):
+        self.assertTrue(self.assert_same_detections_as_loop(Radar.ENGINE_DIRECT, accuracy=0.6))
+        self.assert_same_detections_as_loop(Radar.ENGINE_DIRECT)
+
+    def test_scan_for_invader_with_fft_engine(self):
+        self.assertTrue(self.assert_same_detections_as_loop(Radar.ENGINE_FFT, accuracy=0.6))
+        self.assert_same_detections_as_loop(Radar.ENGINE_FFT)
+
+    def test_scan_for_invader_with_bitpacked_engine(self):
+        self.assertTrue(self.assert_same_detections_as_loop(Radar.ENGINE_BITPACKED, accuracy=0.6))
+        self.assert_same_detections_as_loop(Radar.ENGINE_BITPACKED)
+
+    def test_scan_for_invader_on_packed_map(self):
+        radar = Radar(self.ACCURACY)
+        radar.add_known_invader(self.generate_random_signals(self.CREATE_FOR_INVADER, 0.7))
+        map_sample = self.generate_random_signals(density=0.7)
+        radar.set_radar_map(map_sample)
+        invader_index = len(radar.known_invaders) - 1
+        expected = self.get_detections(radar, invader_index)
+
+        radar.set_packed_radar_map(pack_signals(map_sample), map_sample.shape[1])
+        self.assertEqual(expected, self.get_detections(radar, invader_index))
+        self.assertTrue(radar.radar_map.is_packed_only())
+
+    def test_scan_for_invader_with_pruning(self):
+        radar = Radar(self.ACCURACY, engine=Radar.ENGINE_LOOP)
+        radar.add_known_invader(self.generate_random_signals(self.CREATE_FOR_INVADER, 0.7))
+        invader_index = len(radar.known_invaders) - 1
+        # sparse noise with a few planted invaders
+        map_sample = self.generate_random_signals(density=0.05)
+        invader_row_num, invader_col_num = radar.known_invaders[invader_index].get_dimensions()
+        for row_idx, col_idx in ((0, 0), (20, 30)):
+            map_sample[row_idx:row_idx + invader_row_num, col_idx:col_idx + invader_col_num] = \
+                radar.known_invaders[invader_index].get_pattern()
+        radar.set_radar_map(map_sample)
+        expected = self.get_detections(radar, invader_index)
+        self.assertIn((20, 30, invader_index), expected)
+
+        for engine in Radar.ENGINES:
+            radar.engine = engine
+            radar.window_num = radar.pruned_window_num = 0
+            self.assertEqual(expected, self.get_detections(radar, invader_index))
+            self.assertEqual(np.prod(radar.get_offset_dimensions(radar.known_invaders[invader_index])),
+                             radar.window_num)
+            self.assertGreater(radar.pruned_window_num, radar.window_num / 2)
+
+    def test_scan_with_pyramid(self):
+        invader_samples = [self.generate_random_signals(self.CREATE_FOR_INVADER, 0.7) for _ in range(3)]
+        # sparse noise with a few planted invaders
+        map_sample = (self.rng.random((300, 400)) < 0.03).astype(int)
+        for invader_sample, (row_idx, col_idx) in zip(invader_samples, ((0, 0), (101, 57), (250, 333))):
+            invader_row_num, invader_col_num = invader_sample.shape
+            map_sample[row_idx:row_idx + invader_row_num, col_idx:col_idx + invader_col_num] = invader_sample
+
+        expected_radar = Radar(0.6, prune=False)
+        for invader_sample in invader_samples:
+            expected_radar.add_known_invader(invader_sample)
+        expected_radar.set_radar_map(map_sample)
+        expected_radar.scan()
+        self.assertGreaterEqual(len(expected_radar.scan_results), 3)
+        for engine in (Radar.ENGINE_AUTO,) + tuple(Radar.ENGINES):
+            for block_size in (2, 5, 8):
+                radar = Radar(0.6, engine=engine, pyramid_block_size=block_size)
+                radar.known_invaders = expected_radar.known_invaders
+                radar.set_radar_map(map_sample)
+                radar.scan()
+                self.assertTrue(np.array_equal(expected_radar.scan_results.get_results(),
+                                               radar.scan_results.get_results()), (engine, block_size))
+                self.assertGreater(radar.get_pruned_ratio(), 0.9)
+
+        radar = Radar(0.6, pyramid_block_size=4)
+        radar.known_invaders = expected_radar.known_invaders
+        radar.set_packed_radar_map(pack_signals(map_sample), map_sample.shape[1])
+        radar.scan()
+        self.assertTrue(np.array_equal(expected_radar.scan_results.get_results(), radar.scan_results.get_results()))
+        self.assertTrue(radar.radar_map.is_packed_only())
+        self.assertRaises(Exception, lambda: Radar(0.6, pyramid_block_size=1))
+
+    def test_scan_for_invader_with_auto_engine(self):
+        self.assertTrue(self.assert_same_detections_as_loop(Radar.ENGINE_AUTO, accuracy=0.6))
+
+    def test_get_engine(self):
+        radar = Radar(self.ACCURACY)
+        radar.set_radar_map(np.ones((500, 500)))
+
+        small_invader = Invader(np.ones((2, 2)))
+        self.assertEqual(Radar.ENGINE_DIRECT, radar.get_engine(small_invader, (498, 498)).name)
+        large_invader = Invader(np.ones((100, 100)))
+        self.assertEqual(Radar.ENGINE_FFT, radar.get_engine(large_invader, (400, 400)).name)
+
+        # caller overrides the automatic selection
+        radar = Radar(self.ACCURACY, engine=Radar.ENGINE_DIRECT)
+        radar.set_radar_map(np.ones((500, 500)))
+        self.assertEqual(Radar.ENGINE_DIRECT, radar.get_engine(large_invader, (400, 400)).name)
+
+    def test_scan_with_variants(self):
+        invader_sample = (self.rng.random((5, 7)) < 0.6).astype(np.uint8)
+        invader_sample[0] = 1
+        invader_sample[:, 0] = 0
+        map_sample = (self.rng.random((60, 70)) < 0.2).astype(np.uint8)
+        planted_variants = {(3, 4): 0, (20, 30): 1, (40, 10): 6, (45, 50): 7}
+        for (row_idx, col_idx), variant in planted_variants.items():
+            variant_sample = Invader(invader_sample).get_variant(variant).get_pattern()
+            map_sample[row_idx:row_idx + variant_sample.shape[0], col_idx:col_idx + variant_sample.shape[1]] = \
+                variant_sample
+
+        for engine in (Radar.ENGINE_LOOP, Radar.ENGINE_AUTO, Radar.ENGINE_EXACT) + tuple(Radar.ENGINES):
+            accuracy = 1.0 if engine == Radar.ENGINE_EXACT else 0.9
+            # every variant added as a known invader of its own
+            expected_radar = Radar(accuracy, engine=engine)
+            # symmetric, so it has no other variant
+            expected_radar.add_known_invader(np.eye(4, dtype=np.uint8) | np.eye(4, dtype=np.uint8)[::-1])
+            expected_radar.add_known_invader(invader_sample)
+            expected_radar.known_invaders.extend(expected_radar.known_invaders[1].get_variant(variant)
+                                                 for variant in range(1, 8))
+            expected_radar.set_radar_map(map_sample)
+            expected_radar.scan()
+            # results of the variant invaders belong to the second invader
+            expected_results = ScanResultStore()
+            expected_results.extend_results(expected_radar.scan_results.get_results())
+            invader_indices = expected_results.get_results()['invader_index']
+            expected_results.get_results()['variant'] = np.maximum(invader_indices - 1, 0)
+            expected_results.get_results()['invader_index'] = np.minimum(invader_indices, 1)
+            expected_results.sort()
+
+            radar = Radar(accuracy, engine=engine, variants=Radar.VARIANTS_ALL)
+            radar.known_invaders = expected_radar.known_invaders[:2]
+            radar.set_radar_map(map_sample)
+            radar.scan()
+            results = radar.scan_results.get_results()
+            self.assertTrue(np.array_equal(expected_results.get_results(), results), engine)
+            for (row_idx, col_idx), variant in planted_variants.items():
+                self.assertIn((row_idx, col_idx, 1, variant), results[['row_index', 'column_index', 'invader_index',
+                                                                       'variant']].tolist(), engine)
+            self.assertTrue(np.array_equal(expected_radar.get_cleaned_map(), radar.get_cleaned_map()), engine)
+
+        # rotations only
+        radar = Radar(0.9, variants=Radar.VARIANTS_ROTATIONS)
+        radar.add_known_invader(invader_sample)
+        radar.set_radar_map(map_sample)
+        radar.scan()
+        self.assertEqual({0, 1}, set(radar.scan_results.get_results()['variant'].tolist()) & {0, 1, 6, 7})
+        self.assertTrue(all(result.variant in (0, 1, 2, 3) for result in radar.scan_results))
+
+        # variants are kept by frames and parallel scans
+        frame_results, = radar.scan_frames([map_sample])
+        self.assertTrue(np.array_equal(radar.scan_results.get_results(), frame_results.get_results()))
+        expected_results = radar.scan_results.get_results().copy()
+        radar.scan_results.clear()
+        radar.scan(worker_num=2)
+        self.assertTrue(np.array_equal(expected_results, radar.scan_results.get_results()))
+        self.assertRaises(Exception, lambda: radar.update_radar_map(map_sample))
+        self.assertRaises(Exception, lambda: Radar(0.9, variants='some'))
+
+    def scan_edges_one_by_one(self, radar: Radar, map_sample: np.ndarray) -> set:
+        detections = set()
+        for invader_index, invader in enumerate(radar.known_invaders):
+            invader_sample = invader.get_signal_pattern()
+            row_num, col_num = invader_sample.shape
+            padded_map = np.pad(map_sample, ((row_num - 1,) * 2, (col_num - 1,) * 2))
+            on_map = np.pad(np.ones_like(map_sample), ((row_num - 1,) * 2, (col_num - 1,) * 2))
+            for row_idx in range(padded_map.shape[0] - row_num + 1):
+                for col_idx in range(padded_map.shape[1] - col_num + 1):
+                    window = (slice(row_idx, row_idx + row_num), slice(col_idx, col_idx + col_num))
+                    visible_area = np.sum(invader_sample & on_map[window])
+                    matched_area = np.sum(invader_sample & padded_map[window])
+                    if visible_area and visible_area >= radar.edge_visible_fraction * invader_sample.sum() \
+                            and matched_area / visible_area >= radar.accuracy:
+                        detections.add((row_idx - row_num + 1, col_idx - col_num + 1, invader_index))
+        return detections
+
+    def test_scan_with_edges(self):
+        map_sample = (self.rng.random((30, 40)) < 0.5).astype(np.uint8)
+        for engine in (Radar.ENGINE_LOOP, Radar.ENGINE_AUTO) + tuple(Radar.ENGINES):
+            radar = Radar(0.7, engine=engine, edge_visible_fraction=0.5)
+            for dimensions in ((6, 8), (3, 4), (35, 5), (1, 1)):
+                invader_sample = (self.rng.random(dimensions) < 0.6).astype(np.uint8)
+                # an invader without positive signals has no match probability
+                invader_sample[-1, -1] = 1
+                radar.add_known_invader(invader_sample)
+            radar.set_radar_map(map_sample)
+            radar.scan()
+            detections = [(result.point.row_index, result.point.column_index, result.invader_index)
+                          for result in radar.scan_results]
+            self.assertEqual(sorted(detections, key=lambda detection: (detection[2],) + detection[:2]), detections)
+            expected = self.scan_edges_one_by_one(radar, map_sample)
+            self.assertEqual(expected, set(detections), engine)
+            self.assertTrue(any(row_idx < 0 or col_idx < 0 for row_idx, col_idx, _ in detections))
+            # visible parts of the invaders off the map are painted
+            self.assertEqual(map_sample.shape, radar.get_cleaned_map().shape)
+
+        scores = radar.scan_results.get_results()['score']
+        self.assertTrue(np.all((scores >= 0.7) & (scores <= 1)))
+        expected_results = radar.scan_results.get_results().copy()
+        radar.scan_results.clear()
+        radar.scan(worker_num=2)
+        self.assertTrue(np.array_equal(expected_results, radar.scan_results.get_results()))
+
+        self.assertRaises(Exception, lambda: Radar(1.0, engine=Radar.ENGINE_EXACT, edge_visible_fraction=0.5))
+        self.assertRaises(Exception, lambda: Radar(0.7, edge_visible_fraction=0.0))
+        self.assertRaises(Exception, lambda: list(radar.scan_frames([map_sample])))
+
+    def test_fail_init_with_unknown_engine(self):
+        self.assertRaises(Exception, lambda: Radar(self.ACCURACY, engine='unknown'))
+
+    def test_scan_stream(self):
+        radar = Radar(self.ACCURACY)
+        radar.init_from_file(README_PATH)
+        radar.scan()
+        expected = sorted((scan_result.point.row_index, scan_result.point.column_index, scan_result.invader_index)
+                          for scan_result in radar.scan_results)
+        self.assertTrue(expected)
+
+        for band_row_num in (1, 5, Radar.STREAM_BAND_ROW_NUM):
+            radar = Radar(self.ACCURACY)
+            detections = [(scan_result.point.row_index, scan_result.point.column_index, scan_result.invader_index)
+                          for scan_result in radar.scan_stream(README_PATH, band_row_num=band_row_num)]
+            self.assertEqual(expected, sorted(detections))
+            self.assertEqual(2, len(radar.known_invaders))
+            self.assertIsNone(radar.radar_map)
+
+    def test_init_from_binary_file(self):
+        radar = Radar(self.ACCURACY)
+        radar.init_from_file(README_PATH)
+        radar.scan()
+        expected = [(scan_result.point.row_index, scan_result.point.column_index, scan_result.invader_index)
+                    for scan_result in radar.scan_results]
+
+        binary_file_path = os.path.join(tempfile.mkdtemp(), 'radar.apmb')
+        self.addCleanup(shutil.rmtree, os.path.dirname(binary_file_path))
+        BinaryOutputFileHandler(binary_file_path).dump_from_ascii_file(README_PATH)
+        radar = Radar(self.ACCURACY)
+        radar.init_from_file(binary_file_path)
+        self.assertTrue(radar.radar_map.is_packed_only())
+        radar.scan()
+        self.assertEqual(expected, [(scan_result.point.row_index, scan_result.point.column_index,
+                                     scan_result.invader_index) for scan_result in radar.scan_results])
+
+    def scan_frames_one_by_one(self, radar: Radar, frames) -> list:
+        frame_results = []
+        for frame in frames:
+            frame_radar = Radar(radar.accuracy, engine=radar.engine)
+            frame_radar.known_invaders = radar.known_invaders
+            frame_radar.set_radar_map(frame)
+            frame_radar.scan()
+            frame_results.append(frame_radar.scan_results.get_results())
+        return frame_results
+
+    def test_scan_frames(self):
+        frames = (self.rng.random((7, 30, 40)) < 0.6).astype(int)
+        for engine in (Radar.ENGINE_LOOP, Radar.ENGINE_AUTO) + tuple(Radar.ENGINES):
+            radar = Radar(0.6, engine=engine)
+            for dimensions in ((6, 8), (3, 4), (6, 8), (31, 2)):
+                radar.add_known_invader((self.rng.random(dimensions) < 0.6).astype(int))
+            expected = self.scan_frames_one_by_one(radar, frames)
+
+            frame_results = list(radar.scan_frames(frames))
+            self.assertEqual(len(frames), len(frame_results))
+            for expected_results, results in zip(expected, frame_results):
+                self.assertTrue(np.array_equal(expected_results, results.get_results()), engine)
+            # any iterable of frames in batches of any size
+            frame_results = list(radar.scan_frames((frame for frame in frames), batch_frame_num=3))
+            for expected_results, results in zip(expected, frame_results):
+                self.assertTrue(np.array_equal(expected_results, results.get_results()), engine)
+            self.assertEqual(0, len(radar.scan_results))
+
+        self.assertRaises(Exception, lambda: list(radar.scan_frames([frames[0], frames[1][:, :-1]])))
+        self.assertRaises(Exception, lambda: list(radar.scan_frames(frames, batch_frame_num=0)))
+
+    def test_scan_frame_files(self):
+        radar = Radar(self.ACCURACY)
+        radar.init_from_file(README_PATH)
+        directory_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory_path)
+        shutil.copy(README_PATH, os.path.join(directory_path, 'frame_0.md'))
+        BinaryOutputFileHandler(os.path.join(directory_path, 'frame_1.apmb')).dump_from_ascii_file(README_PATH)
+
+        file_paths = FileHandler.get_directory_file_paths(directory_path)
+        frame_results = list(radar.scan_frame_files(file_paths))
+        radar.scan()
+        self.assertEqual(2, len(frame_results))
+        for results in frame_results:
+            self.assertTrue(np.array_equal(radar.scan_results.get_results(), results.get_results()))
+
     @skip
     def test_add_known_invader(self):
         # no need to test
@@ -273,15 +759,216 @@ class TestRadar(BaseTestCase):
         # TODO write InputFileHandler and reuse
         pass
 
+    def create_radar_from_readme(self, accuracy: float = ACCURACY) -> Radar:
+        radar = Radar(accuracy)
+        radar.init_from_file(README_PATH)
+        return radar
+
+    def test_query(self):
+        radar = self.create_radar_from_readme()
+        self.assertEqual(np.float32, radar.get_score_map(0).dtype)
+        self.assertEqual(radar.get_offset_dimensions(radar.known_invaders[0]), radar.get_score_map(0).shape)
+
+        for accuracy in (0.6, 0.7, 0.8, 0.9):
+            scanned_radar = self.create_radar_from_readme(accuracy)
+            scanned_radar.scan()
+            results = radar.query(accuracy)
+            self.assertTrue(np.array_equal(scanned_radar.scan_results.get_results()[['row_index', 'column_index',
+                                                                                    'invader_index']],
+                                           results.get_results()[['row_index', 'column_index', 'invader_index']]))
+        self.assertEqual(len(radar.query(0.8, invader_index=1)), len(radar.query(0.8).filter_by_invader(1)))
+        self.assertRaises(Exception, lambda: radar.query(80))
+
+    def test_query_top(self):
+        radar = self.create_radar_from_readme()
+
+        results = radar.query_top(5).get_results()
+        self.assertEqual(5, len(results))
+        self.assertTrue(np.all(np.diff(results['score']) <= 0))
+        best_scores = [radar.get_score_map(invader_index).max() for invader_index in range(2)]
+        self.assertEqual(max(best_scores), results['score'][0])
+        self.assertEqual(best_scores[1], radar.query_top(1, invader_index=1)[0].score)
+        self.assertRaises(Exception, lambda: radar.query_top(0))
+
+    def test_query_best_per_region(self):
+        radar = self.create_radar_from_readme()
+
+        results = radar.query_best_per_region((10, 10), accuracy=0.6, invader_index=0).get_results()
+        score_map = radar.get_score_map(0)
+        regions = {(result['row_index'] // 10, result['column_index'] // 10) for result in results}
+        self.assertEqual(len(results), len(regions))
+        for result in results:
+            row_idx, col_idx = result['row_index'] // 10 * 10, result['column_index'] // 10 * 10
+            self.assertEqual(score_map[row_idx:row_idx + 10, col_idx:col_idx + 10].max(), result['score'])
+            self.assertEqual(score_map[result['row_index'], result['column_index']], result['score'])
+            self.assertGreaterEqual(result['score'], np.float32(0.6))
+
+    def create_radar_with_results(self) -> Radar:
+        radar = Radar(self.ACCURACY)
+        radar.add_known_invader(np.array([[1, 0], [1, 1]]))
+        radar.set_radar_map(np.zeros((4, 5)))
+        radar.add_scan_result(Point(0, 0), 0)
+        radar.add_scan_result(Point(2, 3), 0)
+        return radar
+
+    def create_scanned_radar(self, map_sample: np.ndarray, engine: str = Radar.ENGINE_AUTO) -> Radar:
+        radar = Radar(0.6, engine=engine)
+        for dimensions in ((6, 8), (6, 8), (3, 4)):
+            radar.add_known_invader((self.rng.random(dimensions) < 0.6).astype(int))
+        radar.set_radar_map(map_sample)
+        radar.scan()
+        return radar
+
+    def test_update_radar_map(self):
+        map_sample = (self.rng.random((80, 90)) < 0.6).astype(int)
+        for engine in (Radar.ENGINE_LOOP, Radar.ENGINE_AUTO) + tuple(Radar.ENGINES):
+            radar = self.create_scanned_radar(map_sample, engine)
+            score_map = radar.get_score_map(0)
+            frame_sample = map_sample.copy()
+            frame_sample[0:3, 10:20] = 1 - frame_sample[0:3, 10:20]
+            frame_sample[50, 85:] = 1 - frame_sample[50, 85:]
+            radar.update_radar_map(frame_sample)
+
+            expected_radar = self.create_scanned_radar(frame_sample, engine)
+            expected_radar.known_invaders = radar.known_invaders
+            expected_radar.scan_results.clear()
+            expected_radar.scan()
+            # only the windows around the changes are rescanned
+            self.assertLessEqual(radar.window_num, expected_radar.window_num / 4)
+            self.assertTrue(np.array_equal(expected_radar.scan_results.get_results(),
+                                           radar.scan_results.get_results()), engine)
+            self.assertIs(score_map, radar.get_score_map(0))
+            self.assertTrue(np.array_equal(expected_radar.get_score_map(0), radar.get_score_map(0)))
+
+    def test_update_radar_map_with_score_maps(self):
+        map_sample = (self.rng.random((80, 90)) < 0.6).astype(int)
+        radar = self.create_scanned_radar(map_sample)
+        radar.get_score_map(1)
+        frame_sample = map_sample.copy()
+        frame_sample[30:40, 30:40] = 1 - frame_sample[30:40, 30:40]
+
+        # matched area maps of each region are computed once per invader, for its results and its score map
+        with patch.object(Radar, '_iter_matched_area_maps', side_effect=Radar._iter_matched_area_maps,
+                          autospec=True) as iter_matched_area_maps:
+            radar.update_radar_map(frame_sample)
+        matched_invader_indices = [invader_index for call in iter_matched_area_maps.call_args_list
+                                   for invader_index in call.args[1]]
+        self.assertIn(1, matched_invader_indices)
+        self.assertEqual(len(set(matched_invader_indices)), len(matched_invader_indices))
+        expected_radar = self.create_scanned_radar(frame_sample)
+        expected_radar.known_invaders = radar.known_invaders
+        expected_radar.scan_results.clear()
+        expected_radar.scan()
+        self.assertTrue(np.array_equal(expected_radar.scan_results.get_results(), radar.scan_results.get_results()))
+        self.assertTrue(np.array_equal(expected_radar.get_score_map(1), radar.get_score_map(1)))
+
+    def test_update_radar_map_with_dirty_region(self):
+        map_sample = (self.rng.random((60, 60)) < 0.6).astype(int)
+        radar = self.create_scanned_radar(map_sample)
+        frame_sample = map_sample.copy()
+        frame_sample[20:30, 20:30] = 1
+        # changes out of the dirty region are not diffed
+        frame_sample[0, 0] = 1 - frame_sample[0, 0]
+        radar.update_radar_map(frame_sample, dirty_region=(15, 15, 20, 20))
+
+        expected_radar = self.create_scanned_radar(map_sample)
+        expected_radar.known_invaders = radar.known_invaders
+        expected_radar.set_radar_map(np.where(np.arange(60)[:, np.newaxis] < 15, map_sample, frame_sample))
+        expected_radar.scan_results.clear()
+        expected_radar.scan()
+        self.assertTrue(np.array_equal(expected_radar.scan_results.get_results(), radar.scan_results.get_results()))
+        self.assertRaises(Exception, lambda: radar.update_radar_map(np.ones((60, 61))))
+
+    def test_get_changed_regions(self):
+        radar = Radar(self.ACCURACY)
+        radar.add_known_invader(np.ones((3, 3)))
+        previous_map = RadarMap(np.zeros((20, 20)))
+        map_sample = np.zeros((20, 20))
+        self.assertEqual([], radar.get_changed_regions(previous_map, RadarMap(map_sample), (0, 0, 20, 20)))
+
+        map_sample[2, 5] = map_sample[4, 7] = map_sample[10, 1] = 1
+        self.assertEqual([(2, 5, 3, 3), (10, 1, 1, 1)],
+                         radar.get_changed_regions(previous_map, RadarMap(map_sample), (0, 0, 20, 20)))
+        # rows closer than the invader height are in the same region
+        map_sample[6, 3] = 1
+        self.assertEqual([(2, 3, 5, 5), (10, 1, 1, 1)],
+                         radar.get_changed_regions(previous_map, RadarMap(map_sample), (0, 0, 20, 20)))
+        self.assertEqual([(4, 3, 3, 5)], radar.get_changed_regions(previous_map, RadarMap(map_sample), (3, 3, 5, 5)))
+
     def test_get_cleaned_map(self):
-        # TODO
-        pass
+        cleaned_map = self.create_radar_with_results().get_cleaned_map()
+
+        self.assertEqual(np.uint8, cleaned_map.dtype)
+        self.assertTrue(np.array_equal(np.array([[1, 0, 0, 0, 0],
+                                                 [1, 1, 0, 0, 0],
+                                                 [0, 0, 0, 1, 0],
+                                                 [0, 0, 0, 1, 1]]), cleaned_map))
+
+    def test_get_cleaned_map_with_overlaps(self):
+        radar = self.create_radar_with_results()
+        radar.add_scan_result(Point(1, 0), 0)
+
+        # negative signals of an invader do not erase the other detections
+        self.assertTrue(np.array_equal(np.array([[1, 0], [1, 1], [1, 1]]), radar.get_cleaned_map()[:3, :2]))
+
+    def test_scan_results_per_instance(self):
+        radar = self.create_radar_with_results()
+        other_radar = Radar(self.ACCURACY)
+
+        self.assertEqual(2, len(radar.scan_results))
+        self.assertEqual(0, len(other_radar.scan_results))
+        self.assertEqual(0, len(other_radar.known_invaders))
 
     def test_get_printable_map(self):
-        # TODO write test_get_cleaned_map first
-        pass
+        self.assertEqual('o----\noo---\n---o-\n---oo\n', self.create_radar_with_results().get_printable_map())
+
+    def test_get_printable_map_in_bands(self):
+        radar = Radar(0.5, edge_visible_fraction=0.5)
+        radar.init_known_invaders_from_file(README_PATH)
+        map_sample = np.zeros((120, 60), dtype=np.uint8)
+        map_sample[:40] = self.rng.random((40, 60)) < 0.5
+        map_sample[100:] = self.rng.random((20, 60)) < 0.5
+        radar.set_radar_map(map_sample)
+        radar.scan()
+
+        # detections partially off the map and rows without detections between the bands
+        self.assertTrue((radar.scan_results.get_results()['row_index'] < 0).any())
+        self.assertFalse(radar.get_cleaned_map()[60:80].any())
+        with patch.object(SampleHandler, 'CHARACTERIZE_ROW_BAND_SIZE', 7):
+            self.assertEqual(SampleHandler().characterize_sample(radar.get_cleaned_map()),
+                             radar.get_printable_map())
 
     def test_dump_to_file(self):
-        # TODO write OutputFileHandler and reuse
-        pass
+        radar = self.create_radar_with_results()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
 
+        radar.dump_to_file(os.path.join(directory, 'radar.txt'))
+        with open(os.path.join(directory, 'cleaned_map.txt')) as file:
+            self.assertEqual(radar.get_printable_map(), file.read())
+
+    def test_dump_detections_to_file(self):
+        radar = Radar(self.ACCURACY)
+        radar.init_from_file(README_PATH)
+        radar.scan()
+        expected = [[int(result['row_index']), int(result['column_index']), int(result['invader_index'])]
+                    for result in radar.scan_results.get_results()]
+        self.assertTrue(expected)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        radar.dump_detections_to_file(os.path.join(directory, 'radar.txt'))
+        with open(os.path.join(directory, 'detections.jsonl')) as file:
+            self.assertEqual(expected, [[detection['row_index'], detection['column_index'],
+                                         detection['invader_index']] for detection in map(json.loads, file)])
+
+        # detections of each band are written while the next bands are scanned
+        stream_radar = Radar(self.ACCURACY)
+        handler = StreamInputFileHandler(README_PATH)
+        stream_radar.add_known_invaders(handler.get_known_invader_samples())
+        output_file_path = os.path.join(directory, 'stream.csv')
+        stream_radar.dump_detections_to_file(README_PATH, 'csv', output_file_path,
+                                             stream_radar.scan_row_bands(handler.iter_radar_rows(), band_row_num=5))
+        with open(output_file_path) as file:
+            self.assertEqual(sorted(expected), sorted([int(row['row_index']), int(row['column_index']),
+                                                       int(row['invader_index'])] for row in csv.DictReader(file)))
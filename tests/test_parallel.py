@@ -0,0 +1,66 @@
+import numpy as np
+from unittest import TestCase
+
+from ascii_pattern_matcher.bits import pack_signals
+from ascii_pattern_matcher.models import Radar
+from ascii_pattern_matcher.parallel import ParallelScanner
+
+
+class TestParallelScanner(TestCase):
+    ACCURACY = 0.7
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.radar = Radar(self.ACCURACY)
+        for row_num, col_num in ((3, 4), (6, 5)):
+            self.radar.add_known_invader((rng.random((row_num, col_num)) < 0.6).astype(np.uint8))
+        self.map_sample = (rng.random((70, 90)) < 0.6).astype(np.uint8)
+        self.radar.set_radar_map(self.map_sample)
+
+    def get_detections(self, radar: Radar) -> list:
+        return [(scan_result.point.row_index, scan_result.point.column_index, scan_result.invader_index)
+                for scan_result in radar.scan_results]
+
+    def test_init(self):
+        self.assertRaises(Exception, lambda: ParallelScanner(self.radar, 0))
+        self.assertRaises(Exception, lambda: ParallelScanner(self.radar, 2, tile_size=0))
+
+    def test_get_tiles(self):
+        scanner = ParallelScanner(self.radar, 2, tile_size=32)
+
+        tiles = scanner.get_tiles()
+        self.assertEqual(3 * 3, len(tiles))
+        self.assertEqual((64, 64, 6, 26, 6, 5), tiles[-1])
+        self.assertEqual(70 * 90, sum(tile[2] * tile[3] for tile in tiles))
+
+    def test_scan(self):
+        self.radar.scan()
+        expected = self.get_detections(self.radar)
+        self.assertTrue(expected)
+
+        # small tiles put many matches on the seams
+        self.radar.scan_results.clear()
+        ParallelScanner(self.radar, 2, tile_size=16).scan()
+        self.assertEqual(expected, self.get_detections(self.radar))
+
+        self.radar.scan_results.clear()
+        self.radar.set_packed_radar_map(pack_signals(self.map_sample), self.map_sample.shape[1])
+        ParallelScanner(self.radar, 2, tile_size=20).scan()
+        self.assertEqual(expected, self.get_detections(self.radar))
+
+    def test_scan_window_counts(self):
+        for accuracy, kwargs in ((0.9, {}), (0.9, {'pyramid_block_size': 4}), (1.0, {'engine': Radar.ENGINE_EXACT})):
+            expected_radar = Radar(accuracy, **kwargs)
+            expected_radar.known_invaders = self.radar.known_invaders
+            expected_radar.set_radar_map(self.map_sample)
+            expected_radar.scan()
+            self.assertTrue(expected_radar.window_num, kwargs)
+            if not kwargs:
+                self.assertTrue(expected_radar.pruned_window_num)
+
+            # windows in the halos of the tiles are counted once
+            radar = expected_radar.create_sub_radar()
+            radar.set_radar_map(self.map_sample)
+            ParallelScanner(radar, 2, tile_size=16).scan()
+            self.assertEqual(expected_radar.window_num, radar.window_num, kwargs)
+            self.assertEqual(expected_radar.pruned_window_num, radar.pruned_window_num, kwargs)
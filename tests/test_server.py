@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from ascii_pattern_matcher.client import ScanClient
+from ascii_pattern_matcher.models import Radar
+from ascii_pattern_matcher.server import ScanServer
+from ascii_pattern_matcher.utils import FileHandler
+from tests.test_utils import README_PATH
+
+
+class TestScanServer(TestCase):
+
+    def setUp(self):
+        self.radar = Radar(0.8)
+        self.radar.init_from_file(README_PATH)
+        socket_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, socket_directory)
+        self.unix_socket_path = os.path.join(socket_directory, 'scan.sock')
+
+    def get_expected_results(self) -> list:
+        self.radar.scan()
+        return [[int(result['row_index']), int(result['column_index']), int(result['invader_index']),
+                 float(result['score']), int(result['variant'])] for result in self.radar.scan_results.get_results()]
+
+    def run_with_server(self, coroutine_function, **server_kwargs):
+        async def run():
+            server = ScanServer(self.radar, **server_kwargs)
+            await server.start(unix_socket_path=self.unix_socket_path)
+            try:
+                return await coroutine_function()
+            finally:
+                await server.close()
+        return asyncio.run(run())
+
+    async def scan(self, *samples, cleaned_map: bool = False) -> list:
+        client = ScanClient(unix_socket_path=self.unix_socket_path)
+        await client.connect()
+        try:
+            return [await client.scan(sample, cleaned_map) for sample in samples]
+        finally:
+            await client.close()
+
+    def test_init(self):
+        self.assertRaises(Exception, lambda: ScanServer(self.radar, worker_num=0))
+        self.assertRaises(Exception, lambda: ScanServer(self.radar, queue_size=0))
+
+    def test_scan(self):
+        expected = self.get_expected_results()
+        content = FileHandler(README_PATH).get_file_content()
+
+        response, = self.run_with_server(lambda: self.scan(content, cleaned_map=True))
+        self.assertTrue(expected)
+        self.assertTrue(np.allclose(expected, response['results']))
+        self.assertEqual(self.radar.get_printable_map(), response['cleaned_map'])
+
+    def test_scan_edges(self):
+        inner_result_num = len(self.get_expected_results())
+        self.radar = Radar(0.8, edge_visible_fraction=0.5)
+        self.radar.init_from_file(README_PATH)
+        expected = self.get_expected_results()
+        content = FileHandler(README_PATH).get_file_content()
+
+        response, = self.run_with_server(lambda: self.scan(content, cleaned_map=True), worker_num=2)
+        self.assertGreater(len(expected), inner_result_num)
+        self.assertTrue(np.allclose(expected, response['results']))
+        self.assertEqual(self.radar.get_printable_map(), response['cleaned_map'])
+
+    def test_scan_concurrently(self):
+        expected = self.get_expected_results()
+        content = FileHandler(README_PATH).get_file_content()
+
+        async def scan_concurrently():
+            return await asyncio.gather(*(self.scan(content, content) for _ in range(4)))
+
+        # more requests than the queue holds
+        client_responses = self.run_with_server(scan_concurrently, worker_num=2, queue_size=1)
+        for responses in client_responses:
+            for response in responses:
+                self.assertTrue(np.allclose(expected, response['results']))
+
+    def test_scan_invalid_requests(self):
+        async def scan_invalid_requests():
+            client = ScanClient(unix_socket_path=self.unix_socket_path)
+            await client.connect()
+            try:
+                client._writer.write(b'not json\n{"cleaned_map": true}\n')
+                invalid_responses = [json.loads(await client._reader.readline()) for _ in range(2)]
+                ragged_response = await client.scan('-o\no\n')
+                # connection is still usable after errors
+                return invalid_responses, ragged_response, await client.scan('-o\noo\n')
+            finally:
+                await client.close()
+
+        invalid_responses, ragged_response, response = self.run_with_server(scan_invalid_requests)
+        self.assertEqual([{'error': 'invalid request'}] * 2, invalid_responses)
+        self.assertIn('Row 1', ragged_response['error'])
+        self.assertEqual({'results': []}, response)
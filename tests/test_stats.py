@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import tracemalloc
+from unittest import TestCase
+
+import numpy as np
+
+from ascii_pattern_matcher.models import Radar
+from ascii_pattern_matcher.stats import Instrumentation, ScanHook, ScanStats
+from tests.test_utils import README_PATH
+
+
+class PhaseRecorder(ScanHook):
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.phases = []
+
+    def on_phase(self, phase: str, seconds: float, peak_byte_num: int = None):
+        self.phases.append((phase, seconds, peak_byte_num))
+
+
+class TestInstrumentation(TestCase):
+
+    def test_measure_phase(self):
+        recorder = PhaseRecorder(trace_memory=True)
+        instrumentation = Instrumentation([recorder])
+        with instrumentation.measure_phase('outer'):
+            with instrumentation.measure_phase('inner'):
+                array = np.ones(1 << 20, dtype=np.uint8)
+                del array
+            small_array = np.ones(1 << 10, dtype=np.uint8)
+        del small_array
+
+        (inner_phase, _, inner_peak_byte_num), (outer_phase, outer_seconds, outer_peak_byte_num) = recorder.phases
+        self.assertEqual(('inner', 'outer'), (inner_phase, outer_phase))
+        self.assertGreaterEqual(inner_peak_byte_num, 1 << 20)
+        # the peak of the inner phase is kept by the outer phase
+        self.assertGreaterEqual(outer_peak_byte_num, inner_peak_byte_num)
+        self.assertGreater(outer_seconds, 0)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_measure_phase_without_memory(self):
+        recorder = PhaseRecorder()
+        with Instrumentation([recorder]).measure_phase('phase'):
+            pass
+        self.assertEqual('phase', recorder.phases[0][0])
+        self.assertIsNone(recorder.phases[0][2])
+
+        # without hooks nothing is measured
+        self.assertFalse(Instrumentation())
+        with Instrumentation().measure_phase('phase'):
+            pass
+
+
+class TestScanStats(TestCase):
+
+    def test_get_report(self):
+        scan_stats = ScanStats()
+        scan_stats.on_phase('scan', 1.0, 10)
+        scan_stats.on_phase('scan', 2.0, 5)
+        scan_stats.on_invader_scan(1, 0.5, 100, 10, 2)
+        scan_stats.on_invader_scan(0, 0.5, 50, 50, 1)
+        scan_stats.on_invader_scan(1, 0.5, 100, 20, 0)
+
+        report = scan_stats.get_report()
+        self.assertEqual({'scan': {'count': 2, 'seconds': 3.0, 'peak_byte_num': 10}}, report['phases'])
+        self.assertEqual([0, 1], [invader['invader_index'] for invader in report['invaders']])
+        self.assertEqual({'invader_index': 1, 'seconds': 1.0, 'window_num': 200, 'evaluated_window_num': 30,
+                          'match_num': 2}, report['invaders'][1])
+
+    def test_radar_hooks(self):
+        output_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_directory)
+        file_path = os.path.join(output_directory, 'radar.md')
+        shutil.copy(README_PATH, file_path)
+
+        for engine in (Radar.ENGINE_LOOP, Radar.ENGINE_AUTO):
+            scan_stats = ScanStats()
+            radar = Radar(0.8, engine=engine, hooks=[scan_stats])
+            radar.init_from_file(file_path)
+            radar.scan()
+            radar.dump_to_file(file_path)
+
+            report = scan_stats.get_report()
+            self.assertEqual({'read_file', 'parse_samples', 'prepare_invaders', 'init', 'scan', 'clean_map', 'render',
+                              'write_file'}, set(report['phases']))
+            self.assertTrue(all(phase['count'] == 1 and phase['peak_byte_num'] is not None
+                                for phase in report['phases'].values()))
+            self.assertEqual(len(radar.known_invaders), len(report['invaders']))
+            self.assertEqual(len(radar.scan_results), sum(invader['match_num'] for invader in report['invaders']))
+            for invader, invader_stats in zip(radar.known_invaders, report['invaders']):
+                self.assertEqual(np.prod(radar.get_offset_dimensions(invader)), invader_stats['window_num'])
+                self.assertLessEqual(invader_stats['match_num'], invader_stats['evaluated_window_num'])
+                self.assertLessEqual(invader_stats['evaluated_window_num'], invader_stats['window_num'])
+        # windows are pruned by the batched engines only
+        self.assertLess(report['invaders'][0]['evaluated_window_num'], report['invaders'][0]['window_num'])
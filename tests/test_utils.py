@@ -1 +1,171 @@
-# TODO write all tests
+import csv
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from ascii_pattern_matcher.bits import unpack_signals
+from ascii_pattern_matcher.utils import (BinaryFileHandler, BinaryInputFileHandler, BinaryOutputFileHandler,
+                                         DetectionHandler, InputFileHandler, SampleHandler, StreamInputFileHandler)
+
+README_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'README.md')
+
+
+class BaseFileTestCase(TestCase):
+
+    def create_file(self, content: str) -> str:
+        file_descriptor, file_path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(file_descriptor, 'w') as file:
+            file.write(content)
+        self.addCleanup(os.remove, file_path)
+        return file_path
+
+    def create_file_path(self, suffix: str) -> str:
+        file_descriptor, file_path = tempfile.mkstemp(suffix=suffix)
+        os.close(file_descriptor)
+        self.addCleanup(os.remove, file_path)
+        return file_path
+
+
+class TestSampleHandler(TestCase):
+
+    def test_extract_samples(self):
+        samples = SampleHandler().extract_samples('text ~~~~\n-oO\nx-\u2126\n~~~~ text ~~~~--~~~~ ~~~~unclosed')
+
+        self.assertEqual(2, len(samples))
+        self.assertEqual(np.uint8, samples[0].dtype)
+        self.assertTrue(np.array_equal(np.array([[0, 1, 1], [1, 0, 1]]), samples[0]))
+        self.assertTrue(np.array_equal(np.array([[0, 0]]), samples[1]))
+        self.assertEqual([], SampleHandler().extract_samples('no ~~~~ samples'))
+
+    def test_compose_samples(self):
+        rng = np.random.default_rng(0)
+        samples = [(rng.random(dimensions) < 0.5).astype(np.uint8) for dimensions in ((3, 4), (1, 1), (9, 7))]
+        extracted_samples = SampleHandler().extract_samples(SampleHandler().compose_samples(samples))
+        self.assertEqual(len(samples), len(extracted_samples))
+        for sample, extracted_sample in zip(samples, extracted_samples):
+            self.assertTrue(np.array_equal(sample, extracted_sample))
+
+    def test_extract_radar_sample(self):
+        expected = np.array([[0, 1], [1, 1]])
+        content = '~~~~\no\n~~~~\n~~~~\n-o\noo\n~~~~'
+        self.assertTrue(np.array_equal(expected, SampleHandler().extract_radar_sample(content)))
+        self.assertTrue(np.array_equal(expected, SampleHandler().extract_radar_sample('-o\noo\n')))
+
+    def test_extract_samples_with_ragged_rows(self):
+        with self.assertRaises(Exception) as context:
+            SampleHandler().extract_samples('~~~~\n-o-\no-o\n-o\n-o-\n~~~~')
+        self.assertIn('Row 2', str(context.exception))
+
+    def test_characterize_sample(self):
+        sample = np.array([[0, 1, 0.5], [0, 0, -1]])
+
+        self.assertEqual('-oo\n--o\n', SampleHandler().characterize_sample(sample))
+        self.assertEqual('', SampleHandler().characterize_sample(np.zeros((0, 3))))
+
+    def test_iter_characterized_sample(self):
+        sample = (np.random.default_rng(0).random((600, 20)) < 0.5).astype(np.uint8)
+        handler = SampleHandler()
+
+        parts = list(handler.iter_characterized_sample(sample))
+        self.assertEqual(3, len(parts))
+        self.assertEqual(handler.characterize_sample(sample), ''.join(parts))
+        self.assertTrue(np.array_equal(sample, handler.extract_samples(f'~~~~{"".join(parts)}~~~~')[0]))
+
+    def test_iter_characterized_bands(self):
+        sample = np.zeros((600, 20), dtype=np.uint8)
+        sample[[3, 4, 5, 300, 599], [0, 1, 19, 7, 2]] = 1
+        handler = SampleHandler()
+
+        parts = list(handler.iter_characterized_bands([(3, sample[3:6]), (300, sample[300:301]),
+                                                       (599, sample[599:])], *sample.shape))
+        self.assertEqual(handler.characterize_sample(sample), ''.join(parts))
+        # blank rows are copied in bands, each band is rendered on its own
+        self.assertEqual(['-' * 20 + '\n'] * 3, parts[0].splitlines(keepends=True))
+        self.assertEqual(3, parts[1].count('\n'))
+        self.assertEqual('', ''.join(handler.iter_characterized_bands([], 0, 20)))
+
+    def test_numeralize_line(self):
+        self.assertTrue(np.array_equal(np.array([0, 1, 1, 1]), SampleHandler().numeralize_line('-oO ')))
+
+
+class TestStreamInputFileHandler(BaseFileTestCase):
+
+    def assert_same_samples(self, file_path: str):
+        handler = InputFileHandler(file_path)
+        stream_handler = StreamInputFileHandler(file_path)
+
+        invader_samples = stream_handler.get_known_invader_samples()
+        self.assertEqual(len(handler.get_known_invader_samples()), len(invader_samples))
+        for expected, invader_sample in zip(handler.get_known_invader_samples(), invader_samples):
+            self.assertTrue(np.array_equal(expected, invader_sample))
+        self.assertTrue(np.array_equal(handler.get_radar_sample(), np.array(list(stream_handler.iter_radar_rows()))))
+
+    def test_readme(self):
+        self.assert_same_samples(README_PATH)
+
+    def test_whitespace_and_separators(self):
+        content = 'text ~~~~\n\n  -o-\no--\n\n~~~~ text\n~~~~ o-\n  \n-o \n~~~~ ~~~~-o~~~~ ~~~~unclosed\n--\n'
+        self.assert_same_samples(self.create_file(content))
+        self.assertEqual(3, StreamInputFileHandler(self.create_file(content)).sample_num)
+
+    def test_ragged_rows(self):
+        handler = StreamInputFileHandler(self.create_file('~~~~\n-o\n--\n~~~~\n~~~~\n-o-\n-o\n~~~~'))
+
+        self.assertEqual(1, len(handler.get_known_invader_samples()))
+        self.assertRaises(Exception, lambda: list(handler.iter_radar_rows()))
+
+
+class TestBinaryFileHandler(BaseFileTestCase):
+
+    def test_dump_from_ascii_file(self):
+        binary_file_path = self.create_file_path('.apmb')
+        BinaryOutputFileHandler(binary_file_path).dump_from_ascii_file(README_PATH)
+        self.assertTrue(BinaryFileHandler.is_binary_file(binary_file_path))
+        self.assertFalse(BinaryFileHandler.is_binary_file(README_PATH))
+
+        handler = InputFileHandler(README_PATH)
+        binary_handler = BinaryInputFileHandler(binary_file_path)
+        invader_samples = binary_handler.get_known_invader_samples()
+        self.assertEqual(2, len(invader_samples))
+        for expected, invader_sample in zip(handler.get_known_invader_samples(), invader_samples):
+            self.assertTrue(np.array_equal(expected, invader_sample))
+
+        packed_radar_sample, column_num = binary_handler.get_packed_radar_sample()
+        self.assertIsInstance(packed_radar_sample, np.memmap)
+        self.assertEqual((50, 2), packed_radar_sample.shape)
+        self.assertEqual(100, column_num)
+        radar_sample = handler.get_radar_sample()
+        self.assertTrue(np.array_equal(radar_sample, unpack_signals(packed_radar_sample, column_num)))
+
+    def test_fail_read(self):
+        self.assertRaises(Exception, lambda: BinaryInputFileHandler(README_PATH))
+
+
+class TestDetectionHandler(TestCase):
+
+    def setUp(self):
+        self.detections = np.array([(2, 3, 1, 0.75, 4), (10, 0, 0, np.nan, 0)],
+                                   dtype=[('row_index', np.int64), ('column_index', np.int64),
+                                          ('invader_index', np.int32), ('score', np.float32), ('variant', np.int8)])
+
+    def test_init(self):
+        self.assertRaises(Exception, lambda: DetectionHandler('txt'))
+
+    def test_characterize_detections(self):
+        handler = DetectionHandler(DetectionHandler.FORMAT_JSONL)
+        lines = handler.characterize_detections(self.detections).splitlines()
+
+        self.assertEqual('', handler.get_header())
+        self.assertEqual([{'row_index': 2, 'column_index': 3, 'invader_index': 1, 'score': 0.75, 'variant': 4},
+                          {'row_index': 10, 'column_index': 0, 'invader_index': 0, 'score': None, 'variant': 0}],
+                         [json.loads(line) for line in lines])
+
+        handler = DetectionHandler(DetectionHandler.FORMAT_CSV)
+        content = handler.get_header() + handler.characterize_detections(self.detections)
+        self.assertEqual([['row_index', 'column_index', 'invader_index', 'score', 'variant'],
+                          ['2', '3', '1', '0.75', '4'],
+                          ['10', '0', '0', '', '0']], list(csv.reader(io.StringIO(content))))